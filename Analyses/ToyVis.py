@@ -0,0 +1,6 @@
+# Minimal visualization for the benchmarks and tests: prints a one-line summary instead of plotting
+
+import numpy as np
+
+def ToyVis(screen, sf, S, T, A, G, P, D, runid, SP, V, logo, **options):
+    print('[ToyVis] n=%d mean S=%.3f probes=%d' % (len(S), np.nanmean(S), len(SP)))
@@ -0,0 +1,52 @@
+# Synthetic habitat for the benchmarks and tests: closed-form priors and a leaky greenhouse, no data files
+
+import numpy as np
+import keyparams
+from mcmodules import Module
+
+class AlbedoPrior(Module):
+    def __init__(self):
+        super().__init__()
+        self.name = 'Albedo Prior'
+        self.output_parameters = ['Bond_Albedo']
+    def execute(self):
+        keyparams.Bond_Albedo = np.random.uniform(0.1, 0.5)
+
+class StellarProps(Module):
+    def __init__(self):
+        super().__init__()
+        self.name = 'Stellar \n Properties'
+        self.output_parameters = ['Luminosity']
+    def execute(self):
+        keyparams.Luminosity = np.random.uniform(0.8, 1.2)
+
+class PressurePrior(Module):
+    def __init__(self):
+        super().__init__()
+        self.name = 'Surface \n Pressure Prior'
+        self.output_parameters = ['Pressure', 'Depth']
+    def execute(self):
+        keyparams.Pressure = np.random.lognormal(0, 1)
+        keyparams.Depth = np.random.uniform(0, 10)
+
+class EqTemp(Module):
+    def __init__(self):
+        super().__init__()
+        self.name = 'Equilibrium \n Temperature'
+        self.input_parameters = ['Bond_Albedo', 'Luminosity']
+        self.output_parameters = ['Teq']
+    def execute(self):
+        keyparams.Teq = 255.0 * ((1 - keyparams.Bond_Albedo) * keyparams.Luminosity / 0.7) ** 0.25
+
+class Greenhouse(Module):
+    def __init__(self):
+        super().__init__()
+        self.name = 'Leaky Greenhouse'
+        self.input_parameters = ['Teq', 'Pressure']
+        self.output_parameters = ['Temperature', 'GreenhouseWarming']
+    def execute(self):
+        keyparams.GreenhouseWarming = 10.0 * np.log1p(keyparams.Pressure)
+        keyparams.Temperature = keyparams.Teq + keyparams.GreenhouseWarming
+
+def SyntheticHabitat():
+    return [AlbedoPrior(), StellarProps(), PressurePrior(), EqTemp(), Greenhouse()]
@@ -0,0 +1,11 @@
+# Shared parameter namespace: every module reads its inputs from and writes its outputs to these attributes
+# Parameters a habitat adds (e.g. Luminosity, Teq of the synthetic habitat) are set on first use
+
+runid = ''
+ProbeIndex = 0
+Suitability = None
+Temperature = None
+Bond_Albedo = None
+GreenhouseWarming = None
+Pressure = None
+Depth = None
@@ -0,0 +1,9 @@
+# Base class of QHF modules: a name, the keyparams it reads and writes, and execute() for one sample
+
+class Module:
+    def __init__(self):
+        self.name = 'Module'
+        self.input_parameters = []
+        self.output_parameters = []
+    def execute(self):
+        pass
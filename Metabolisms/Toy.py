@@ -0,0 +1,16 @@
+# Toy metabolism for the benchmarks and tests: Gaussian temperature window above a minimum pressure
+
+import numpy as np
+import keyparams
+from mcmodules import Module
+
+class ToyMetabolism(Module):
+    def __init__(self):
+        super().__init__()
+        self.name = 'Toy AE v1.0'
+        self.input_parameters = ['Temperature', 'Pressure']
+        self.output_parameters = ['Suitability']
+    def execute(self):
+        T = keyparams.Temperature
+        keyparams.Suitability = float(np.exp(-((T - 290.0) / 30.0) ** 2)) if keyparams.Pressure > 0.1 else 0.0
+        keyparams.runid = 'toy'
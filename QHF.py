@@ -4,9 +4,10 @@
 
 import sys
 import os
-sys.path.append('./Habitats')
-sys.path.append('./Metabolisms')
-sys.path.append('./Analyses')
+import argparse
+import signal
+import time
+import inspect
 
 from collections import defaultdict
 import math
@@ -15,13 +16,25 @@ import networkx as nx
 import matplotlib.pyplot as plt
 from matplotlib import style
 import matplotlib.patches as patches
-import importlib
-import configparser  # For handling configuration files
 import pdb           # Python debugger
+from modules.qhf_engine import (REPO_ROOT, RESULTS_DIR, read_run_config, load_modules, build_graph, prepare_sampling,
+                                open_incremental_run, run_monte_carlo, save_results)
+from modules.run_manager import emit_event, listen_for_cancel
+from modules.module_registry import get_registry
+from modules.preflight import preflight, print_preflight
+from modules.cost_estimator import read_resource_options, calibrate, estimate_run, check_budget, print_estimate
+from modules.memory_budget import start_memory_monitor
+from modules.module_cache import read_cache_options, clear_cache
+from modules.level_executor import LevelExecutor, read_execution_options
+from modules.probe_pool import run_probe_pool
+from modules.surrogate import surrogate_spec
+from modules.diagnostics import (read_diagnostics_options, convergence_report, print_convergence,
+                                 convergence_summary, save_convergence)
+from modules.importance import (ImportanceSampler, read_importance_options, weighted_summary,
+                                print_weighted_summary, resample)
 import keyparams
 from mcmodules import Module as Module
 from layout_presets import presets, label_offsets
-import importlib.util
 
 # ======================================
 # Program Flow
@@ -141,227 +154,341 @@ class GraphVisualization:
 # Load Configuration File
 # ======================================
 
-cl_args = sys.argv
-config_file_path = str(cl_args[1])
-config = configparser.ConfigParser()
-config.read(config_file_path)
-
-ConfigID = config['Configuration']['ConfigID']
-HabitatFile = config['Habitat']['HabitatFile']
-HabitatModule = config['Habitat']['HabitatModule']
-HabitatLogo = os.path.join(os.path.dirname(__file__), config['Habitat']['HabitatLogo'])
-HabitatShortName = config['Habitat']['HabitatShortname']
-
-MetabolismFile = os.path.splitext(config['Metabolism']['MetabolismFile'])[0]
-MetabolismModule = config['Metabolism']['MetabolismModule']
-
-VisualizationFile = os.path.splitext(config['Visualization']['VisualizationFile'])[0]
-VisualizationModule = config['Visualization']['VisualizationModule']
-
-NumProbes = config['Sampling']['NumProbes']
-if float(NumProbes) > 1e8:
-    print('### Warning: Number of Probes limited -- change QHF code if you need more probes.')
-NumProbes = np.clip(float(NumProbes), 1, 1e8)
+parser = argparse.ArgumentParser(description="Run the Quantitative Habitability Framework for one config.")
+parser.add_argument("config", help="path to the .cfg file")
+parser.add_argument("--progress-events", action="store_true",
+                    help="emit machine-readable progress events and accept 'cancel' on stdin")
+parser.add_argument("--incremental", action="store_true",
+                    help="reuse cached outputs of unchanged modules (same as [Cache] Incremental = true)")
+parser.add_argument("--clear-cache", action="store_true",
+                    help="delete the cached module outputs of the incremental cache before running")
+parser.add_argument("--check", action="store_true",
+                    help="only run the static pre-flight check of the Habitat/Metabolism pairing")
+parser.add_argument("--estimate", action="store_true",
+                    help="only run the calibration batch and print the predicted run time and memory")
+parser.add_argument("--workers", type=int, default=None,
+                    help="worker processes sampling probes in parallel (default: [Resources] Workers or 1)")
+parser.add_argument("--force", action="store_true",
+                    help="run even if the prediction exceeds [Resources] MaxRunMinutes")
+parser.add_argument("--execution", choices=["serial", "levels"], default=None,
+                    help="sample by sample (serial) or level by level over each probe batch (default: [Execution] Mode)")
+parser.add_argument("--watch", action="store_true",
+                    help="stay alive and rerun (quick preview, then full run) whenever the config or its modules change")
+cl_args = parser.parse_args()
+
+if cl_args.watch:
+    from modules.watch import watch
+    sys.exit(watch(cl_args.config))
+
+config_file_path = cl_args.config
+progress_events = cl_args.progress_events
+try:
+    settings = read_run_config(config_file_path)
+except ValueError as e:
+    # Missing Extends bases, or a template with {a, b} alternatives (those run through qhf_batch.py)
+    print('❌ ' + str(e))
+    sys.exit(1)
+
+ConfigID = settings['ConfigID']
+HabitatLogo = settings['HabitatLogo']
+HabitatShortName = settings['HabitatShortName']
+NumProbes = settings['NumProbes']
 
 print(' [ Configuration file: ]', ConfigID)
-print(' [ Habitat Module: ]', HabitatModule)
-print(' [ Metabolism Module: ]', MetabolismModule)
-print(' [ Visualization Module: ]', VisualizationModule)
-
-
-# ======================================
-# Dynamic Import Function
-# ======================================
+print(' [ Habitat Module: ]', settings['HabitatModule'])
+print(' [ Metabolism Module: ]', settings['MetabolismModule'])
+print(' [ Visualization Module: ]', settings['VisualizationModule'])
 
-def dynamic_import(module_path, module_name):
-    spec = importlib.util.spec_from_file_location(module_name, module_path)
-    module = importlib.util.module_from_spec(spec)
-    spec.loader.exec_module(module)
-    return module
+# Static pre-flight from the module index: fails before anything is instantiated or sampled
+preflight_report = preflight(settings)
+if cl_args.check or preflight_report['errors']:
+    print_preflight(preflight_report)
+    sys.exit(1 if preflight_report['errors'] else 0)
 
 
 # ======================================
 # Import Modules Dynamically
 # ======================================
 
-# Habitat module
-habitat_path = os.path.join(os.path.dirname(__file__), "Habitats", HabitatFile + ".py")
-habitat_module = dynamic_import(habitat_path, HabitatModule)
-Modules = getattr(habitat_module, HabitatModule)()
-
-# Metabolism module
-metabolism_path = os.path.join(os.path.dirname(__file__), "Metabolisms", MetabolismFile + ".py")
-metabolism_module = dynamic_import(metabolism_path, MetabolismModule)
-ModuleHabitability = getattr(metabolism_module, MetabolismModule)()
-Modules.append(ModuleHabitability)
-
-nmods = len(Modules)
-
-# Visualization module
-visual_path = os.path.join(os.path.dirname(__file__), "Analyses", VisualizationFile + ".py")
-visual_module = dynamic_import(visual_path, VisualizationModule)
-VisualizationModule = getattr(visual_module, VisualizationModule)
-
-print('[Modules Loaded]')
-for mi in np.arange(nmods):
-    print(mi, ' : ', Modules[mi].name)
-
-
-# ======================================
-# Plotting Mode Configuration
-# ======================================
-
-screen = False  # True for dark theme, False for light theme
-
-if screen:
-    sf = 1.0
-    bkgcolor = '#030810'
-    selected_edgecolor = 'white'
-    prior_node_color = 'blue'
-    other_node_color = 'lightblue'
-    metabolism_node_color = 'green'
-    labelcolor = 'lightblue'
-    labeloffset = 0.0
-else:
-    sf = 1.3
-    bkgcolor = 'white'
-    selected_edgecolor = 'darkblue'
-    prior_node_color = 'red'
-    other_node_color = 'blue'
-    metabolism_node_color = 'green'
-    labelcolor = 'black'
-    labeloffset = -0.05
-
-
-# ======================================
-# Build Graph from Modules
-# ======================================
-
-G = GraphVisualization()
-edge_labels = {}
-mod_labels = {}
-
-for jj in np.arange(nmods):
-    mod_labels[int(jj)] = Modules[jj].name
-    print('--------------------------------------------------------------------------------')
-    print('Identifying input connections for module ', Modules[jj].name)
-
-    for ip in Modules[jj].input_parameters:
-        print('......................................................................')
-        print('Scanning for output parameters matching the input parameter:', ip)
-
-        for module_scanned in np.arange(nmods):
-            if any(x == ip for x in Modules[module_scanned].output_parameters):
-                print(' + Input/output Match found in module: ', Modules[module_scanned].name)
-                G.addEdge(module_scanned, jj, label=ip.replace('_', ' '))
-                edge_labels[(module_scanned, jj)] = ip.replace('_', ' ')
-
-
-# ======================================
-# Topological Sorting
-# ======================================
-
-print("The Topological Sort Of The Graph Is: ")
-DG = nx.DiGraph()
-DG.add_edges_from(G.visual)
-topsorted = list(nx.topological_sort(DG))
-print(topsorted)
-
-
-# ======================================
-# Monte Carlo Simulation
-# ======================================
-
-N_iter = int(config['Sampling']['Niterations'])
-
-Suitability_Distribution = []
-Temperature_Distribution = []
-Pressure_Distribution = []
-BondAlbedo_Distribution = []
-GreenHouse_Distribution = []
-Depth_Distribution = []
-SavedParameters = []
-
-N_probes = 100
-Suitability_Plot = []
-Variable = []
-
-for keyparams.ProbeIndex in np.arange(float(NumProbes)):
-    print('Probing location ', keyparams.ProbeIndex)
-
-    for ii in np.arange(N_iter):
-        keyparams.runid = ''
-        for mi in np.arange(len(topsorted)):
-            print('Executing ', Modules[topsorted[mi]].name)
-            Modules[topsorted[mi]].execute()
-
-        def _as_float(x, fallback=np.nan):
-            try:
-                if x is None:
-                    return fallback
-                xf = float(x)
-                return xf
-            except Exception:
-                return fallback
-
-        # If Suitability wasn’t set by the metabolism, create a very simple proxy
-        _suit = keyparams.Suitability
-        if _suit is None or (isinstance(_suit, float) and not np.isfinite(_suit)):
-            T = _as_float(keyparams.Temperature, np.nan)
-            # toy proxy: favor temps near 273 K
-            _suit = 1.0 - min(1.0, abs(T - 273.15) / 200.0) if np.isfinite(T) else np.nan
-
-        Suitability_Distribution.append(_as_float(_suit, np.nan))
-        Temperature_Distribution.append(_as_float(keyparams.Temperature, np.nan))
-        BondAlbedo_Distribution.append(_as_float(keyparams.Bond_Albedo, np.nan))
-        GreenHouse_Distribution.append(_as_float(keyparams.GreenhouseWarming, np.nan))
-        Pressure_Distribution.append(_as_float(keyparams.Pressure, np.nan))
-        Depth_Distribution.append(_as_float(keyparams.Depth, np.nan))
-
-
-        runid = keyparams.runid
-
-    print('Monte Carlo loop completed')
-    print('Runid: ' + keyparams.runid)
-
-    This_Suitability = np.mean(Suitability_Distribution)
-    print('Average Suitability %.2f' % This_Suitability)
-
-    Suitability_Plot.append(This_Suitability)
-    Variable.append(keyparams.Depth)
-    SavedParameters.append(keyparams)
-
-
-# ======================================
-# Visualize Graph
-# ======================================
-
-fig = plt.figure(figsize=(12.00, 8.00), dpi=300)
-fig.set_facecolor(bkgcolor)
-fig.set_edgecolor(selected_edgecolor)
-
-ax = G.visualize()
-
-# Add habitat logo
-logo_path = os.path.join(os.path.dirname(__file__), HabitatLogo)
-im = plt.imread(logo_path)
-newax = fig.add_axes([0.75, 0.75, 0.10, 0.10], anchor='NE')
-newax.set_axis_off()
-newax.imshow(im)
-
-figures_dir = os.path.join(os.path.dirname(__file__), "Figures")
-os.makedirs("Figures", exist_ok=True)
-
-fig.savefig(os.path.join(figures_dir, HabitatShortName + '_Connections.png'))
-fig.savefig(os.path.join(figures_dir, HabitatShortName + '_Connections.svg'))
-plt.show()
-
-# ======================================
-# Visualization of Results
-# ======================================
-
-VisualizationModule(
-    screen, sf, Suitability_Distribution, Temperature_Distribution,
-    BondAlbedo_Distribution, GreenHouse_Distribution, Pressure_Distribution,
-    Depth_Distribution, keyparams.runid, Suitability_Plot, Variable, HabitatLogo
-)
+# Peak memory is reported per stage; MaxMemoryMB makes the sampling loop stream its results to disk
+resource_options = read_resource_options(settings['Resources'])
+memory = start_memory_monitor(resource_options)
+# The monitor thread samples until the run ends, however it ends
+try:
+    memory.set_stage('module loading')
+
+    load_start = time.perf_counter()
+    Modules, VisualizationModule = load_modules(settings)
+    load_seconds = time.perf_counter() - load_start
+    nmods = len(Modules)
+
+    print('[Modules Loaded]')
+    for mi in np.arange(nmods):
+        print(mi, ' : ', Modules[mi].name)
+
+
+    # ======================================
+    # Plotting Mode Configuration
+    # ======================================
+
+    screen = False  # True for dark theme, False for light theme
+
+    if screen:
+        sf = 1.0
+        bkgcolor = '#030810'
+        selected_edgecolor = 'white'
+        prior_node_color = 'blue'
+        other_node_color = 'lightblue'
+        metabolism_node_color = 'green'
+        labelcolor = 'lightblue'
+        labeloffset = 0.0
+    else:
+        sf = 1.3
+        bkgcolor = 'white'
+        selected_edgecolor = 'darkblue'
+        prior_node_color = 'red'
+        other_node_color = 'blue'
+        metabolism_node_color = 'green'
+        labelcolor = 'black'
+        labeloffset = -0.05
+
+
+    # ======================================
+    # Build Graph from Modules
+    # ======================================
+
+    G = GraphVisualization()
+    G.visual, edge_labels, mod_labels, topsorted = build_graph(Modules)
+
+
+    # ======================================
+    # Topological Sorting
+    # ======================================
+
+    print("The Topological Sort Of The Graph Is: ")
+    print(topsorted)
+
+
+    # ======================================
+    # Monte Carlo Simulation
+    # ======================================
+
+    N_iter = settings['Niterations']
+    memory.set_stage('sampling')
+
+    # Optional surrogate substitution; the exact chain is still what the connection graph shows
+    SampleModules, sample_order = prepare_sampling(Modules, topsorted, settings)
+
+    # Optional process pool over probes; workers write their samples straight into shared memory
+    # The shared block holds every sample up front, so a memory budget keeps the run in this process
+    workers = cl_args.workers or resource_options['workers']
+    if workers > 1 and resource_options['max_memory_mb'] is not None:
+        print('[Execution] MaxMemoryMB is enforced in this process only -- ignoring %d workers' % workers)
+        workers = 1
+
+    # Short calibration batch: per-module cost, predicted wall time and memory, budget enforcement
+    # Only paid for when something uses the prediction: --estimate or a [Resources] budget
+    if cl_args.estimate or resource_options['max_run_minutes'] is not None or resource_options['max_memory_mb'] is not None:
+        calibration = calibrate(SampleModules, sample_order)
+        get_registry().record_profiles(SampleModules, calibration['timings'])
+        run_estimate = estimate_run(calibration, NumProbes, N_iter, workers=workers,
+                                    load_seconds=load_seconds, requested_probes=settings['RequestedProbes'])
+        print_estimate(run_estimate)
+        if progress_events:
+            emit_event('estimate', **run_estimate)
+        if cl_args.estimate:
+            sys.exit(0)
+        over_budget = check_budget(run_estimate, resource_options)
+        if over_budget and not cl_args.force:
+            print('❌ ' + over_budget + ' -- rerun with --force to start anyway.')
+            if progress_events:
+                emit_event('refused', reason=over_budget)
+            sys.exit(2)
+        memory_warning = memory.check_estimate(run_estimate['memory_mb'])
+        if memory_warning:
+            print('[Memory] ⚠️ ' + memory_warning)
+
+    # Optional importance sampling: prior outputs come from a proposal tuned towards the habitable tail
+    importance_options = read_importance_options(settings['Importance'], REPO_ROOT)
+    importance = None
+    if importance_options['enabled']:
+        importance = ImportanceSampler(SampleModules, sample_order, importance_options)
+        if importance_options['proposal']:
+            importance.load(importance_options['proposal'])
+            print('[Importance] Proposal loaded from', importance_options['proposal'])
+        else:
+            importance.tune()
+            print('[Importance] Proposal saved to',
+                  importance.save(os.path.join(RESULTS_DIR, HabitatShortName + '_proposal.npz')))
+        print(importance.describe())
+
+    # Optional incremental recomputation: unchanged modules replay their cached output columns
+    if cl_args.clear_cache:
+        cache_dir = read_cache_options(settings['Cache'], REPO_ROOT)['directory']
+        print('[Incremental] Removed %d cached module outputs from %s' % (clear_cache(cache_dir), cache_dir))
+    incremental = open_incremental_run(SampleModules, sample_order, settings, force=cl_args.incremental)
+    if incremental is not None and importance is not None:
+        print('[Importance] Cached prior columns would bypass the proposal -- running without the incremental cache')
+        incremental = None
+    if incremental is not None:
+        incremental.report()
+        SampleModules, sample_order = incremental.Modules, incremental.order
+
+    # Optional level-scheduled execution; replayed cache columns are indexed per sample, so it needs the serial order
+    execution_options = read_execution_options(settings['Execution'])
+    execution_mode = cl_args.execution or execution_options['mode']
+    executor = None
+    if execution_mode == 'levels' and incremental is not None:
+        print('[Execution] Incremental runs replay cached columns sample by sample -- using serial order')
+    elif execution_mode == 'levels' and importance is not None:
+        print('[Execution] Importance sampling draws prior values sample by sample -- using serial order')
+    elif execution_mode == 'levels':
+        executor = LevelExecutor(SampleModules, sample_order, threads=execution_options['threads'],
+                                 jit=execution_options['jit'])
+        print('[Execution] Level-scheduled batches on %d thread(s)' % execution_options['threads'])
+        print(executor.describe())
+
+    if workers > 1 and (incremental is not None or executor is not None or importance is not None):
+        print('[Execution] Incremental, level-scheduled and importance-sampled runs stay in this process '
+              '-- ignoring %d workers' % workers)
+        workers = 1
+
+    module_timings = {}
+    run_options = dict(profile=module_timings, saved_parameters=settings['SavedParameters'])
+    if progress_events:
+        # Managed by the launcher/GUI: stream progress instead of per-module chatter
+        # The parent owns Ctrl+C and forwards it as a 'cancel' line, so partial results get flushed
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        cancel_event = listen_for_cancel()
+        emit_event('start', config=ConfigID, probes_total=int(NumProbes), iterations=N_iter)
+        run_options.update(progress=lambda p: emit_event('progress', **p), should_stop=cancel_event.is_set)
+    if workers > 1:
+        print('[Execution] Sampling %d probes on %d worker processes' % (int(NumProbes), workers))
+        results = run_probe_pool(settings, NumProbes, N_iter, workers, surrogate=surrogate_spec(SampleModules),
+                                 **run_options)
+    else:
+        results = run_monte_carlo(SampleModules, sample_order, NumProbes, N_iter, verbose=not progress_events,
+                                  executor=executor, importance=importance, memory=memory,
+                                  streams=read_diagnostics_options(settings['Diagnostics'])['streams'], **run_options)
+    if executor is not None:
+        executor.close()
+
+    # Per-module timings feed the pre-flight cost estimate of later runs
+    get_registry().record_profiles(SampleModules, module_timings)
+
+    memory.set_stage('aggregation')
+    Suitability_Distribution = results['Suitability_Distribution']
+    Temperature_Distribution = results['Temperature_Distribution']
+    Pressure_Distribution = results['Pressure_Distribution']
+    BondAlbedo_Distribution = results['BondAlbedo_Distribution']
+    GreenHouse_Distribution = results['GreenHouse_Distribution']
+    Depth_Distribution = results['Depth_Distribution']
+    SavedParameters = results['SavedParameters']
+    Suitability_Plot = results['Suitability_Plot']
+    Variable = results['Variable']
+
+    results['Collector'].report()
+
+    # Weighted estimates: the plain mean of an importance-sampled run is biased towards the tail
+    visualization_options = {}
+    if importance is not None:
+        # Tuning samples are weighted samples of their round's proposal and count towards the estimate
+        tuning_suitability, tuning_weights = importance.tuning_samples()
+        if len(tuning_weights):
+            print('[Importance] Including %d tuning samples' % len(tuning_weights))
+        print_weighted_summary(weighted_summary(np.concatenate([np.asarray(Suitability_Distribution, dtype=float),
+                                                                tuning_suitability]),
+                                                np.concatenate([np.asarray(results['Weights'], dtype=float),
+                                                                tuning_weights]),
+                                                importance_options['target']),
+                               importance_options['target'])
+
+    # Convergence: per-probe errors, effective sample sizes and stream agreement, and a suggested Niterations
+    convergence = convergence_report(results, N_iter, read_diagnostics_options(settings['Diagnostics']))
+    print_convergence(convergence)
+    if convergence['probes']:
+        print('[Convergence] Per-probe table saved to',
+              save_convergence(convergence, os.path.join(RESULTS_DIR, HabitatShortName + '_convergence.npy')))
+    if progress_events:
+        emit_event('convergence', **convergence_summary(convergence))
+
+    if incremental is not None and not results['cancelled']:
+        print('[Incremental] Cached outputs of %d modules' % incremental.save())
+
+    if results['cancelled']:
+        # Flush what was sampled so far and skip plotting
+        partial_path = save_results(results, os.path.join(RESULTS_DIR, HabitatShortName + '_partial.npz'))
+        print('Run cancelled -- partial results saved to', partial_path)
+        memory.set_stage(None)
+        memory.report()
+        if progress_events:
+            emit_event('done', partial=True, result_path=partial_path,
+                       samples=len(Suitability_Distribution), probes_done=len(Suitability_Plot))
+        sys.exit(0)
+
+    if progress_events:
+        emit_event('done', partial=False, samples=len(Suitability_Distribution), probes_done=len(Suitability_Plot))
+
+
+    # ======================================
+    # Visualize Graph
+    # ======================================
+
+    memory.set_stage('plotting')
+    fig = plt.figure(figsize=(12.00, 8.00), dpi=300)
+    fig.set_facecolor(bkgcolor)
+    fig.set_edgecolor(selected_edgecolor)
+
+    ax = G.visualize()
+
+    # Add habitat logo
+    logo_path = os.path.join(os.path.dirname(__file__), HabitatLogo)
+    im = plt.imread(logo_path)
+    newax = fig.add_axes([0.75, 0.75, 0.10, 0.10], anchor='NE')
+    newax.set_axis_off()
+    newax.imshow(im)
+
+    figures_dir = os.path.join(os.path.dirname(__file__), "Figures")
+    os.makedirs("Figures", exist_ok=True)
+
+    fig.savefig(os.path.join(figures_dir, HabitatShortName + '_Connections.png'))
+    fig.savefig(os.path.join(figures_dir, HabitatShortName + '_Connections.svg'))
+    plt.show()
+
+    # ======================================
+    # Visualization of Results
+    # ======================================
+
+    # Analyses accepting a weights argument get the sample weights; others get an equal-weight resample
+    if importance is not None:
+        if 'weights' in inspect.signature(VisualizationModule).parameters:
+            visualization_options['weights'] = np.asarray(results['Weights'], dtype=float)
+        else:
+            print('[Importance] %s takes no weights -- plotting a resampled copy of the distributions'
+                  % settings['VisualizationModule'])
+            resampled = resample(results)
+            Suitability_Distribution = resampled['Suitability_Distribution']
+            Temperature_Distribution = resampled['Temperature_Distribution']
+            Pressure_Distribution = resampled['Pressure_Distribution']
+            BondAlbedo_Distribution = resampled['BondAlbedo_Distribution']
+            GreenHouse_Distribution = resampled['GreenHouse_Distribution']
+            Depth_Distribution = resampled['Depth_Distribution']
+
+    # Analyses always receive the distributions as 1-D float arrays: lists from a serial run, shared-memory
+    # views from worker processes and, under MaxMemoryMB, read-only arrays mapped from the spill files (not
+    # copied into memory; an analysis must not modify them in place)
+    (Suitability_Distribution, Temperature_Distribution, BondAlbedo_Distribution, GreenHouse_Distribution,
+     Pressure_Distribution, Depth_Distribution) = (
+        np.asarray(d, dtype=float) for d in (Suitability_Distribution, Temperature_Distribution,
+                                             BondAlbedo_Distribution, GreenHouse_Distribution,
+                                             Pressure_Distribution, Depth_Distribution))
+
+    VisualizationModule(
+        screen, sf, Suitability_Distribution, Temperature_Distribution,
+        BondAlbedo_Distribution, GreenHouse_Distribution, Pressure_Distribution,
+        Depth_Distribution, keyparams.runid, Suitability_Plot, Variable, HabitatLogo, **visualization_options
+    )
+    memory.set_stage(None)
+    memory.report()
+finally:
+    memory.stop()
@@ -1,11 +1,14 @@
 # Entry point script for launching the QHF Tool.
 # Adds "Edit/Create config using GUI" and auto-runs QHF.py with the last saved config from the GUI.
 
-from modules.version_checker import check_for_update      # Checks if user has the latest version
+from modules.version_checker import start_update_check    # Checks for a newer version in the background
 from modules.user_login import get_user_info              # Manages user info and session
 from modules.logout_user import logout_user               # Allows users to logout
+from modules.run_manager import QHFRun, format_progress_bar  # Runs QHF.py with live progress
 import os
 import sys
+import time
+import subprocess
 
 def run_qhf_with_config(config_path: str):
     script_path = os.path.join(os.path.dirname(__file__), "QHF.py")
@@ -15,8 +18,47 @@ def run_qhf_with_config(config_path: str):
     if not os.path.isfile(config_path):
         print(f"❌ Config not found: {config_path}")
         return
-    print(f"\n🚀 Running QHF with: {config_path}\n")
-    os.system(f'python "{script_path}" "{config_path}"')
+    print(f"\n🚀 Running QHF with: {config_path}")
+    print("   (Ctrl+C cancels and keeps a partial result)\n")
+
+    run = QHFRun(config_path).start()
+    while True:
+        try:
+            _stream_run(run)
+            break
+        except KeyboardInterrupt:
+            if run.cancel_requested:
+                continue
+            print("\n⏹  Cancelling -- waiting for partial results...")
+            run.cancel()
+
+    code = run.wait()
+    if code != 0:
+        print(f"❌ QHF exited with code {code}")
+
+def _stream_run(run):
+    # Shows output lines and redraws a single progress line until the child exits
+    progress_shown = False
+    while True:
+        for kind, payload in run.poll():
+            if kind == "event" and payload["event"] == "progress":
+                sys.stdout.write("\r" + format_progress_bar(payload))
+                sys.stdout.flush()
+                progress_shown = True
+                continue
+            if progress_shown:
+                print()
+                progress_shown = False
+            if kind == "output":
+                print(payload)
+            elif payload["event"] == "done":
+                if payload.get("partial"):
+                    print(f"💾 Partial result ({payload['samples']} samples) saved to {payload['result_path']}")
+                else:
+                    print(f"✅ Sampling finished ({payload['samples']} samples)")
+        if not run.is_running():
+            return
+        time.sleep(0.2)
 
 def show_config_list(config_dir):
     configs = [f for f in os.listdir(config_dir) if f.endswith(".cfg")]
@@ -34,11 +76,8 @@ def main():
     print("        QHF TOOL LAUNCHER")
     print("="*50)
 
-    # Step 1: Check for latest version (non-fatal)
-    try:
-        check_for_update()
-    except Exception as e:
-        print(f"[Warning] Update check failed: {e}")
+    # Step 1: Check for latest version in the background (non-fatal, skipped with --offline)
+    update_check = start_update_check(offline="--offline" in sys.argv)
 
     # Step 2: Get user name and email (from cache or prompt)
     try:
@@ -47,25 +86,53 @@ def main():
         name, email = ("anonymous", "anonymous")
 
     # Step 3: Menu
-    repo_root = os.path.dirname(__file__)
+    repo_root = os.path.dirname(os.path.abspath(__file__))
     config_dir = os.path.join(repo_root, "Configs")
     last_handoff = os.path.join(repo_root, ".last_saved_cfg.txt")
     os.makedirs(config_dir, exist_ok=True)
 
+    # Show the update check result if it is already in (never waits for it)
+    if update_check is not None:
+        update_check.report()
+
     # Show configs and choices
     configs = show_config_list(config_dir)
     print("\nOptions:")
     print("  [number]  Run that config")
     print("  [E]       Edit/Create config using GUI (auto-run on save)")
+    print("  [B]       Batch-run all configs (no plots, summary table)")
+    print("  [W]       Watch a config: rerun whenever it or its modules change")
     print("  [logout]  Sign out")
 
-    choice = input("\nEnter number / 'E' / 'logout': ").strip().lower()
+    choice = input("\nEnter number / 'E' / 'B' / 'W' / 'logout': ").strip().lower()
+    if update_check is not None:
+        update_check.report()
 
     if choice == "logout":
         logout_user()
         print("✅ You have been logged out.")
         return
 
+    if choice == "b":
+        # Imported lazily so the menu does not pay for numpy/networkx
+        from qhf_batch import run_batch
+        run_batch([os.path.join(config_dir, "*.cfg")])
+        return
+
+    if choice == "w":
+        try:
+            config_path = os.path.join(config_dir, configs[int(input("Config number to watch: ").strip()) - 1])
+        except (ValueError, IndexError):
+            print("❌ Invalid selection.")
+            return
+        # Runs in the foreground until Ctrl+C, with this interpreter and no shell quoting of the path
+        try:
+            subprocess.run([sys.executable, os.path.join(repo_root, "QHF.py"), config_path, "--watch"],
+                           cwd=repo_root)
+        except KeyboardInterrupt:
+            pass
+        return
+
     if choice == "e":
         # Launch GUI
         gui_path = os.path.join(repo_root, "qhf_config_gui.py")
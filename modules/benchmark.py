@@ -0,0 +1,241 @@
+# Performance regression tracking across QHF versions
+# The reference configs ship in benchmarks/ and run on the synthetic modules shipped with the repo
+# (Habitats/Synthetic.py, Metabolisms/Toy.py, Analyses/ToyVis.py): synthetic samples the exact chain,
+# synthetic_surrogate the chain with a fitted surrogate. A config whose module files are not installed is
+# skipped. Each is run with a fixed seed and a small budget (probes x iterations), repeated within the run until
+# sampling took at least MIN_SAMPLING_SECONDS so throughput is not timed over a few milliseconds. Every run
+# happens in a fresh interpreter (the benchmark script relaunched with --measure), so startup (interpreter,
+# imports, module loading, graph) and peak memory are measured from a cold start; the median over the repeats
+# is kept. Each benchmark appends one record to the history file and is compared with the stored baseline: a
+# metric worse than the baseline by more than the threshold is a regression.
+#
+#   throughput        samples per second of run_monte_carlo (higher is better)
+#   startup_seconds   process start to the first sample (lower is better)
+#   peak_memory_mb    largest footprint over loading and sampling (lower is better)
+#
+# Mean Suitability (of the first probes x iterations budget) is recorded too: with the fixed seed it only
+# changes when results change, which is reported but is not a performance regression.
+
+import os
+import sys
+import glob
+import json
+import time
+import random
+import platform
+import contextlib
+import subprocess
+
+import numpy as np
+
+HISTORY_FILE = "benchmark_history.jsonl"
+BASELINE_FILE = "benchmark_baseline.json"
+BENCHMARKS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks")
+MIN_SAMPLING_SECONDS = 1.0
+
+# Metric name -> +1 when higher is better, -1 when lower is better
+METRICS = {"throughput": 1, "startup_seconds": -1, "peak_memory_mb": -1}
+
+
+def reference_configs(benchmarks_dir=BENCHMARKS_DIR):
+    # {name: config path}: every config shipped in benchmarks/, synthetic first
+    paths = sorted(glob.glob(os.path.join(benchmarks_dir, "*.cfg")))
+    refs = {os.path.splitext(os.path.basename(p))[0]: p for p in paths}
+    return dict(sorted(refs.items(), key=lambda item: item[0] != "synthetic"))
+
+
+def missing_module_files(config_path):
+    # Module files a config names that are not installed, as 'Habitats/Mars.py' etc.
+    from modules.qhf_engine import read_run_config, HABITATS_DIR, METABOLISMS_DIR, ANALYSES_DIR
+
+    settings = read_run_config(config_path)
+    files = [(HABITATS_DIR, settings["HabitatFile"]), (METABOLISMS_DIR, settings["MetabolismFile"]),
+             (ANALYSES_DIR, settings["VisualizationFile"])]
+    return ["%s/%s.py" % (os.path.basename(d), f) for d, f in files if not os.path.isfile(os.path.join(d, f + ".py"))]
+
+
+def measure_config(config_path, probes, iterations, seed, min_seconds=MIN_SAMPLING_SECONDS):
+    # Runs one reference config in the current (freshly started) process and returns its metrics
+    # 'ready' is the wall-clock time of the first sample; the launching process turns it into startup_seconds
+    # The probes x iterations budget is sampled again until min_seconds have passed; throughput counts every
+    # pass, mean_suitability and samples only the first, so they do not depend on the machine's speed
+    from modules.qhf_engine import read_run_config, load_modules, build_graph, prepare_sampling, run_monte_carlo
+    from modules.memory_budget import MemoryMonitor
+
+    memory = MemoryMonitor().start()
+    settings = read_run_config(config_path)
+    with memory.stage("module loading"):
+        Modules, _ = load_modules(settings)
+        _, _, _, topsorted = build_graph(Modules, verbose=False)
+        Modules, topsorted = prepare_sampling(Modules, topsorted, settings, verbose=False)
+    ready = time.time()
+
+    np.random.seed(seed)
+    random.seed(seed)
+    with memory.stage("sampling"):
+        t0 = time.perf_counter()
+        results = run_monte_carlo(Modules, topsorted, probes, iterations, verbose=False)
+        suitability = np.asarray(results["Suitability_Distribution"], dtype=float)
+        sampled = len(suitability)
+        while time.perf_counter() - t0 < min_seconds and sampled:
+            sampled += len(run_monte_carlo(Modules, topsorted, probes, iterations,
+                                           verbose=False)["Suitability_Distribution"])
+        seconds = time.perf_counter() - t0
+    memory.stop()
+
+    return {
+        "throughput": sampled / seconds if seconds > 0 else float("nan"),
+        "ready": ready,
+        "peak_memory_mb": max(memory.stages.values()),
+        "mean_suitability": float(np.nanmean(suitability)) if len(suitability) else float("nan"),
+        "samples": len(suitability),
+        "sampled": sampled,
+    }
+
+
+def print_measurement(config_path, probes, iterations, seed, min_seconds=MIN_SAMPLING_SECONDS):
+    # Entry point of the relaunched script: module output is silenced, the metrics are the last stdout line
+    with open(os.devnull, "w") as sink, contextlib.redirect_stdout(sink):
+        metrics = measure_config(config_path, probes, iterations, seed, min_seconds)
+    print(json.dumps(metrics))
+
+
+def run_reference(script, config_path, probes, iterations, seed, repeats=3, min_seconds=MIN_SAMPLING_SECONDS):
+    # Median metrics over repeats, each in a new interpreter running script --measure
+    runs = []
+    for _ in range(repeats):
+        launched = time.time()
+        done = subprocess.run([sys.executable, script, "--measure", config_path, "--probes", str(probes),
+                               "--iterations", str(iterations), "--seed", str(seed),
+                               "--min-seconds", str(min_seconds)],
+                              capture_output=True, text=True)
+        if done.returncode != 0:
+            raise RuntimeError((done.stderr.strip().splitlines() or ["exit code %d" % done.returncode])[-1])
+        run = json.loads(done.stdout.strip().splitlines()[-1])
+        run["startup_seconds"] = run.pop("ready") - launched
+        runs.append(run)
+    metrics = {key: float(np.median([r[key] for r in runs])) for key in runs[0] if key not in ("samples", "sampled")}
+    metrics["samples"] = runs[0]["samples"]
+    metrics["sampled"] = int(np.median([r["sampled"] for r in runs]))
+    metrics["results_stable"] = len({r["mean_suitability"] for r in runs}) == 1
+    return metrics
+
+
+def _commit(repo_root):
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=repo_root, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def run_benchmark(script, config_paths, probes=4, iterations=500, seed=12345, repeats=3, repo_root=None,
+                  min_seconds=MIN_SAMPLING_SECONDS):
+    # Measures every reference config with script --measure; returns one history record
+    from modules.version_checker import CURRENT_VERSION
+
+    record = {
+        "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "version": CURRENT_VERSION,
+        "commit": _commit(repo_root) if repo_root else None,
+        "python": platform.python_version(),
+        "machine": platform.node(),
+        "budget": {"probes": probes, "iterations": iterations, "seed": seed, "repeats": repeats,
+                   "min_seconds": min_seconds},
+        "configs": {},
+    }
+    for name, path in config_paths.items():
+        try:
+            missing = missing_module_files(path)
+        except Exception as e:
+            missing = [f"unreadable config ({e})"]
+        if missing:
+            print(f"⚠️  {name}: {', '.join(missing)} not installed -- skipped")
+            continue
+        print(f"⏱️  {name} ({os.path.basename(path)}) ...", flush=True)
+        try:
+            record["configs"][name] = dict(run_reference(script, path, probes, iterations, seed, repeats, min_seconds),
+                                           config=os.path.basename(path))
+            if not record["configs"][name]["results_stable"]:
+                print(f"⚠️  {name}: results differ between repeats with the same seed (unseeded random source?)")
+        except Exception as e:
+            print(f"❌ {name} failed: {e}")
+            record["configs"][name] = {"config": os.path.basename(path), "error": f"{type(e).__name__}: {e}"}
+    return record
+
+
+# ======================================
+# History and baseline
+# ======================================
+
+def append_history(record, path):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "a") as f:
+        f.write(json.dumps(record) + "\n")
+    return path
+
+
+def load_baseline(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_baseline(record, path):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(record, f, indent=2)
+    return path
+
+
+def compare(record, baseline, threshold=0.2):
+    # One row per config and metric: baseline, current, relative change and whether it regressed
+    rows = []
+    for name, current in record["configs"].items():
+        before = baseline["configs"].get(name)
+        if "error" in current or before is None or "error" in before:
+            rows.append({"config": name, "metric": "-", "baseline": None, "current": None, "change": None,
+                         "status": "failed" if "error" in current else "new"})
+            continue
+        for metric, sign in METRICS.items():
+            b, c = before.get(metric), current.get(metric)
+            change = (c - b) / b if b else float("nan")
+            worse = -sign * change
+            status = "regressed" if worse > threshold else "improved" if worse < -threshold else "ok"
+            rows.append({"config": name, "metric": metric, "baseline": b, "current": c, "change": change,
+                         "status": status})
+        if before.get("mean_suitability") != current.get("mean_suitability"):
+            rows.append({"config": name, "metric": "mean_suitability", "baseline": before.get("mean_suitability"),
+                         "current": current.get("mean_suitability"), "change": None, "status": "changed"})
+    for name in baseline["configs"]:
+        if name not in record["configs"]:
+            rows.append({"config": name, "metric": "-", "baseline": None, "current": None, "change": None,
+                         "status": "missing"})
+    return rows
+
+
+def print_comparison(rows, record, baseline, threshold):
+    marks = {"ok": "✅", "improved": "🚀", "regressed": "❌", "changed": "ℹ️ ", "new": "➕", "missing": "⚠️ ",
+             "failed": "❌"}
+    print("\n" + "=" * 96)
+    print(f"Benchmark {record.get('version')} ({record.get('commit') or '?'}) vs baseline "
+          f"{baseline.get('version')} ({baseline.get('commit') or '?'}, {baseline.get('timestamp')}), "
+          f"threshold {threshold:.0%}")
+    if record["budget"] != baseline.get("budget"):
+        print(f"⚠️  Budget differs from the baseline: {record['budget']} vs {baseline.get('budget')}")
+    print("-" * 96)
+    print(f"{'Config':<20} {'Metric':<18} {'Baseline':>14} {'Current':>14} {'Change':>9}  Status")
+    for r in rows:
+        b = f"{r['baseline']:14.5g}" if isinstance(r["baseline"], float) else f"{'-':>14}"
+        c = f"{r['current']:14.5g}" if isinstance(r["current"], float) else f"{'-':>14}"
+        change = f"{r['change']:+9.1%}" if isinstance(r["change"], float) and np.isfinite(r["change"]) else f"{'-':>9}"
+        print(f"{r['config'][:20]:<20} {r['metric']:<18} {b} {c} {change}  {marks.get(r['status'], '')} {r['status']}")
+    print("=" * 96)
+    regressions = [r for r in rows if r["status"] in ("regressed", "failed")]
+    if regressions:
+        print(f"❌ {len(regressions)} regressed metric(s) or failed config(s) (threshold {threshold:.0%})")
+    else:
+        print("✅ No regression beyond the threshold")
+    return regressions
@@ -0,0 +1,188 @@
+# Config templates: inheritance and matrix expansion
+#
+#   [Configuration]
+#   ConfigID = Metabolism study
+#   Extends = base.cfg                          (every section and key of base.cfg, overridden by this file)
+#
+#   [Habitat]
+#   HabitatFile = {Mars, Europa}
+#   HabitatModule = {MarsHabitat, EuropaHabitat}
+#
+#   [Metabolism]
+#   MetabolismFile = {Cyanobacteria, Methanogens}
+#   MetabolismModule = {CyanoMetabolism, MethanogenMetabolism}
+#
+# Extends is looked up next to the extending file, then in Configs/; bases may extend further. A value in
+# braces lists alternatives: the alternatives of one section vary together (equal-length lists, so a file
+# keeps its class name), and sections multiply. The example expands into four jobs. qhf_batch.py expands
+# templates into jobs, drops jobs whose settings are identical, and groups jobs sharing a Habitat file so
+# the habitat chain is loaded once; with --shared-cache, jobs of equal run shape also reuse the habitat outputs
+# sampled by the first of them (see qhf_batch.py).
+# A single run (QHF.py) accepts inheritance but not alternatives.
+
+import io
+import os
+import re
+import itertools
+import configparser
+
+ALTERNATIVES = re.compile(r'^\{(.*)\}$', re.DOTALL)
+
+
+def config_chain(config_path, search_dirs=()):
+    # The config and every base it extends, most basic first
+    chain = []
+    path = os.path.abspath(config_path)
+    while path is not None:
+        if path in chain:
+            raise ValueError('%s extends itself through %s' % (os.path.basename(config_path), os.path.basename(path)))
+        if not os.path.isfile(path):
+            raise ValueError('Config not found: %s' % path)
+        chain.append(path)
+        config = configparser.ConfigParser()
+        config.read(path)
+        base = config.get('Configuration', 'Extends', fallback='').strip()
+        path = None
+        if base:
+            for directory in [os.path.dirname(chain[-1])] + list(search_dirs):
+                candidate = base if os.path.isabs(base) else os.path.join(directory, base)
+                if os.path.isfile(candidate):
+                    path = os.path.abspath(candidate)
+                    break
+            else:
+                raise ValueError('%s extends %s, which was not found' % (os.path.basename(chain[-1]), base))
+    return chain[::-1]
+
+
+def alternatives(value):
+    # The listed alternatives of a '{a, b}' value, else None
+    match = ALTERNATIVES.match(value.strip())
+    return [v.strip() for v in match.group(1).split(',')] if match else None
+
+
+def resolve_config(config_path, overrides=None, search_dirs=()):
+    # ConfigParser with the Extends chain applied and then overrides ({section: {key: value}})
+    config = configparser.ConfigParser()
+    config.read(config_chain(config_path, search_dirs))
+    if config.has_section('Configuration'):
+        config.remove_option('Configuration', 'Extends')
+    for section, values in (overrides or {}).items():
+        if not config.has_section(section):
+            config.add_section(section)
+        for key, value in values.items():
+            config.set(section, key, value)
+    return config
+
+
+def load_config(config_path, overrides=None, search_dirs=()):
+    # Resolved config of one run; a template with alternatives left has to be expanded into jobs first
+    config = resolve_config(config_path, overrides, search_dirs)
+    axes = matrix_axes(config)
+    if axes:
+        raise ValueError('%s is a template expanding into %d jobs -- run it with qhf_batch.py'
+                         % (os.path.basename(config_path), _job_count(axes)))
+    return config
+
+
+def config_text(config):
+    # The config as .cfg text, e.g. to ship a resolved config without its bases
+    text = io.StringIO()
+    config.write(text)
+    return text.getvalue()
+
+
+def matrix_axes(config):
+    # One axis per section with alternatives: (section, keys, combinations), in file order
+    axes = []
+    for section in config.sections():
+        listed = {k: alternatives(v) for k, v in config.items(section, raw=True)}
+        listed = {k: v for k, v in listed.items() if v is not None}
+        if not listed:
+            continue
+        lengths = {len(v) for v in listed.values()}
+        if len(lengths) > 1:
+            raise ValueError('[%s] lists different numbers of alternatives (%s); alternatives of one section '
+                             'vary together' % (section, ', '.join('%s: %d' % (k, len(v)) for k, v in listed.items())))
+        axes.append((section, list(listed), list(zip(*listed.values()))))
+    return axes
+
+
+def _job_count(axes):
+    count = 1
+    for _, _, combinations in axes:
+        count *= len(combinations)
+    return count
+
+
+def expand_config(config_path, search_dirs=()):
+    # Jobs of one config: {'name', 'path', 'overrides'}; a plain config is a single job without overrides
+    config = resolve_config(config_path, search_dirs=search_dirs)
+    axes = matrix_axes(config)
+    stem = os.path.splitext(os.path.basename(config_path))[0]
+    if not axes:
+        return [{'name': os.path.basename(config_path), 'path': os.path.abspath(config_path), 'overrides': {}}]
+    config_id = config.get('Configuration', 'ConfigID', fallback=stem)
+    jobs = []
+    for choices in itertools.product(*(range(len(combinations)) for _, _, combinations in axes)):
+        overrides = {}
+        picks = [combinations[c] for (_, _, combinations), c in zip(axes, choices)]
+        for (section, keys, _), values in zip(axes, picks):
+            overrides[section] = dict(zip(keys, values))
+        # Jobs are labelled by the first key of every varying section
+        label = ', '.join(values[0] for values in picks)
+        overrides.setdefault('Configuration', {})['ConfigID'] = '%s [%s]' % (config_id, label)
+        # expansion (1-based) and choices (alternative index per section) tell same-named jobs apart
+        jobs.append({'name': '%s[%s]' % (stem, label.replace(', ', ',')), 'path': os.path.abspath(config_path),
+                     'overrides': overrides, 'expansion': len(jobs) + 1,
+                     'choices': {section: c + 1 for (section, _, _), c in zip(axes, choices)}})
+    return jobs
+
+
+def job_label(job):
+    # Name of a job plus its expansion number for template jobs
+    return job['name'] + (' (expansion %d)' % job['expansion'] if 'expansion' in job else '')
+
+
+def duplicate_reason(job, kept):
+    # Why job has the settings of kept: a template listing one alternative twice, or different
+    # choices (or configs) that resolve to the same settings
+    if job['path'] == kept['path'] and 'choices' in job and 'choices' in kept:
+        repeated = [section for section in job['choices']
+                    if job['choices'][section] != kept['choices'][section]
+                    and job['overrides'][section] == kept['overrides'][section]]
+        differing = [section for section in job['choices'] if job['overrides'][section] != kept['overrides'][section]]
+        if repeated and not differing:
+            return '; '.join('[%s] lists %s as alternatives %d and %d'
+                             % (section, ', '.join('%s = %s' % kv for kv in job['overrides'][section].items()),
+                                kept['choices'][section], job['choices'][section])
+                             for section in repeated)
+        return 'its alternatives resolve to the same settings (an alternative equals the inherited value)'
+    if job['path'] == kept['path']:
+        return 'the config is listed twice'
+    return 'both configs resolve to the same settings'
+
+
+def job_signature(job, search_dirs=()):
+    # Everything that affects a job's results (the ConfigID does not), to spot duplicate jobs
+    config = resolve_config(job['path'], job['overrides'], search_dirs)
+    return tuple((section, tuple(sorted((k, v.strip()) for k, v in config.items(section, raw=True)
+                                        if (section, k) != ('Configuration', 'configid'))))
+                 for section in sorted(config.sections()))
+
+
+def dedupe_jobs(jobs, search_dirs=()):
+    # Drops jobs with the settings of an earlier one; returns (jobs, [(dropped job, kept job)])
+    # Jobs that cannot be resolved are kept, so they fail with their own message
+    kept, duplicates, seen = [], [], {}
+    for job in jobs:
+        try:
+            signature = job_signature(job, search_dirs)
+        except (ValueError, configparser.Error):
+            kept.append(job)
+            continue
+        if signature in seen:
+            duplicates.append((job, seen[signature]))
+            continue
+        seen[signature] = job
+        kept.append(job)
+    return kept, duplicates
@@ -0,0 +1,104 @@
+# Run-time and memory prediction from a short calibration batch
+# The calibration executes the sorted chain for a few hundred samples (fewer if that would take longer than
+# CALIBRATION_SECONDS), timing every module, and measures the memory the collected results take per sample.
+# QHF.py only calibrates for --estimate or when a budget is set. Budgets can be enforced per config:
+#
+#   [Resources]
+#   MaxRunMinutes = 120   (refuse runs predicted to take longer; QHF.py --force overrides)
+#   Workers = 1           (worker processes sampling probes, also used for the prediction)
+#   MaxMemoryMB = 4000    (stream results to disk near this footprint, see memory_budget.py)
+
+import time
+import tracemalloc
+
+from modules.qhf_engine import MAX_PROBES, run_monte_carlo
+from modules.preflight import format_seconds
+
+CALIBRATION_SAMPLES = 200
+MEMORY_SAMPLES = 100
+# Samples timed first to size the rest of the calibration for slow modules
+PILOT_SAMPLES = 10
+CALIBRATION_SECONDS = 2.0
+
+
+def read_resource_options(section):
+    raw = {k.lower(): v for k, v in (section or {}).items()}
+    max_minutes = raw.get('maxrunminutes', '').strip()
+    max_memory = raw.get('maxmemorymb', '').strip()
+    return {
+        'max_run_minutes': float(max_minutes) if max_minutes else None,
+        'max_memory_mb': float(max_memory) if max_memory else None,
+        'workers': max(1, int(raw.get('workers', '1') or 1)),
+    }
+
+
+def calibrate(Modules, topsorted, n=CALIBRATION_SAMPLES, max_seconds=CALIBRATION_SECONDS):
+    # Times up to n samples module by module (about max_seconds at most), then measures result memory on a
+    # smaller traced batch
+    timings = {}
+    start = time.perf_counter()
+    run_monte_carlo(Modules, topsorted, 1, PILOT_SAMPLES, verbose=False, profile=timings)
+    pilot = (time.perf_counter() - start) / PILOT_SAMPLES
+    n = int(min(n, max(PILOT_SAMPLES, max_seconds / 2 / pilot))) if pilot > 0 else n
+    if n > PILOT_SAMPLES:
+        run_monte_carlo(Modules, topsorted, 1, n - PILOT_SAMPLES, verbose=False, profile=timings)
+    seconds_per_sample = (time.perf_counter() - start) / n
+
+    memory_samples = min(MEMORY_SAMPLES, n)
+    tracemalloc.start()
+    try:
+        baseline = tracemalloc.get_traced_memory()[0]
+        results = run_monte_carlo(Modules, topsorted, 1, memory_samples, verbose=False)
+        retained = tracemalloc.get_traced_memory()[0] - baseline
+    finally:
+        tracemalloc.stop()
+    del results
+
+    return {
+        'timings': timings,
+        'samples': n,
+        'seconds_per_sample': seconds_per_sample,
+        'bytes_per_sample': max(retained, 0) / memory_samples,
+        'module_seconds': {' '.join(str(Modules[m].name).split()): s / c for m, (s, c) in timings.items() if c},
+    }
+
+
+def estimate_run(calibration, NumProbes, N_iter, workers=1, load_seconds=0.0, requested_probes=None):
+    # Predicts wall time and result memory for the requested budget
+    total_samples = int(NumProbes) * int(N_iter)
+    sampling_seconds = calibration['seconds_per_sample'] * total_samples / max(1, workers)
+    return {
+        'probes': int(NumProbes),
+        'iterations': int(N_iter),
+        'total_samples': total_samples,
+        'workers': workers,
+        'seconds_per_sample': calibration['seconds_per_sample'],
+        'load_seconds': load_seconds,
+        'wall_seconds': load_seconds + sampling_seconds,
+        'memory_mb': calibration['bytes_per_sample'] * total_samples / 2 ** 20,
+        'clipped': requested_probes is not None and requested_probes > MAX_PROBES,
+        'module_seconds': calibration['module_seconds'],
+    }
+
+
+def check_budget(estimate, options):
+    # Returns a refusal message if the prediction exceeds the configured budget, else None
+    limit = options.get('max_run_minutes')
+    if limit is not None and estimate['wall_seconds'] > limit * 60:
+        return ('Predicted run time %.1f min exceeds [Resources] MaxRunMinutes = %g'
+                % (estimate['wall_seconds'] / 60, limit))
+    return None
+
+
+def print_estimate(estimate):
+    print('[Run estimate]')
+    print('  %d probes x %d iterations = %d samples on %d worker(s)'
+          % (estimate['probes'], estimate['iterations'], estimate['total_samples'], estimate['workers']))
+    if estimate['clipped']:
+        print('  ⚠️  NumProbes was clipped to %g' % MAX_PROBES)
+    slowest = sorted(estimate['module_seconds'].items(), key=lambda kv: -kv[1])[:3]
+    if slowest:
+        print('  Slowest modules: ' + ', '.join('%s (%s)' % (name, format_seconds(s)) for name, s in slowest))
+    print('  Per sample: %s   Predicted wall time: %s   Result memory: %.1f MB'
+          % (format_seconds(estimate['seconds_per_sample']), format_seconds(estimate['wall_seconds']),
+             estimate['memory_mb']))
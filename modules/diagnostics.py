@@ -0,0 +1,206 @@
+# Convergence diagnostics for a finished (or cancelled) run
+# Every probe's Niterations samples are split into Streams consecutive segments, which are independent
+# draws of the same chain. Per probe and parameter the report gives the batch-means standard error of the
+# mean, the effective sample size it implies and the between-stream agreement (Gelman-Rubin R-hat; close
+# to 1 when the streams agree). The run-level line combines the probes, and the worst probe's error tells
+# how many iterations would reach TargetSE, so Niterations can be sized from data instead of guesswork.
+# Works on the collected distributions only, so every execution mode (serial, levels, pool) is covered;
+# importance-sampled runs are diagnosed with their weights, and their ESS is the plain Monte Carlo sample
+# size that would give the same error (it can exceed the number of samples).
+#
+#   [Diagnostics]
+#   Streams = 4
+#   TargetSE = 0.01       (standard error of a probe's Average Suitability to size Niterations for)
+#   RHatLimit = 1.05      (probes above it are listed as disagreeing)
+
+import os
+
+import numpy as np
+
+# Distribution keys of the run results and the parameter names they hold
+DIAGNOSED_PARAMETERS = [
+    ('Suitability', 'Suitability_Distribution'),
+    ('Temperature', 'Temperature_Distribution'),
+    ('Bond_Albedo', 'BondAlbedo_Distribution'),
+    ('GreenhouseWarming', 'GreenHouse_Distribution'),
+    ('Pressure', 'Pressure_Distribution'),
+    ('Depth', 'Depth_Distribution'),
+]
+
+
+def read_diagnostics_options(section):
+    raw = {k.lower(): v for k, v in (section or {}).items()}
+    return {
+        'streams': max(2, int(raw.get('streams', '4'))),
+        'target_se': float(raw.get('targetse', '0.01')),
+        'rhat_limit': float(raw.get('rhatlimit', '1.05')),
+    }
+
+
+def _weighted_means(x, w, axis):
+    total = w.sum(axis=axis)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(total > 0, (w * x).sum(axis=axis) / np.where(total > 0, total, 1.0), np.nan), total
+
+
+def diagnose(x, w=None, streams=4):
+    # x: (rows, n) samples, one row per probe; w: matching weights (None: equal weights)
+    # Returns {'n', 'mean', 'std', 'se', 'ess', 'rhat'} with one value per row; NaN samples are ignored
+    x = np.atleast_2d(np.asarray(x, dtype=float))
+    weighted = w is not None
+    w = np.ones_like(x) if w is None else np.atleast_2d(np.asarray(w, dtype=float))
+    valid = np.isfinite(x)
+    w = np.where(valid, w, 0.0)
+    x = np.where(valid, x, 0.0)
+    rows, n = x.shape
+
+    mean, total = _weighted_means(x, w, axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        var = (w * (x - mean[:, None]) ** 2).sum(axis=1) / np.where(total > 0, total, np.nan)
+        # Weighted rows are linearized (mean + w (x - mean) / mean weight), so the batch and stream means
+        # below are plain averages whose spread is that of the self-normalized estimate
+        w_bar = total / np.maximum(valid.sum(axis=1), 1)
+        x = np.where(valid, mean[:, None] + w * (x - mean[:, None]) / np.where(w_bar > 0, w_bar, 1.0)[:, None], 0.0)
+    w = valid.astype(float)
+
+    # Batch means: about sqrt(n) consecutive batches
+    batches = max(2, int(np.sqrt(n)))
+    size = n // batches
+    if size >= 1:
+        bm, _ = _weighted_means(x[:, :batches * size].reshape(rows, batches, size),
+                                w[:, :batches * size].reshape(rows, batches, size), axis=2)
+        with np.errstate(invalid='ignore'):
+            se = np.sqrt(np.nanvar(bm, axis=1, ddof=1) / np.sum(np.isfinite(bm), axis=1))
+    else:
+        se = np.full(rows, np.nan)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        ess = np.where(se > 0, var / se ** 2, valid.sum(axis=1).astype(float))
+    if not weighted:
+        # Plain samples cannot beat independent ones; importance-sampled ones can (plain-MC equivalent size)
+        ess = np.minimum(ess, valid.sum(axis=1))
+
+    # Between-stream agreement (Gelman-Rubin) over consecutive segments
+    length = n // streams
+    rhat = np.full(rows, np.nan)
+    if length >= 2:
+        xs = x[:, :streams * length].reshape(rows, streams, length)
+        ws = w[:, :streams * length].reshape(rows, streams, length)
+        sm, st = _weighted_means(xs, ws, axis=2)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            within = np.nanmean((ws * (xs - sm[..., None]) ** 2).sum(axis=2) / np.where(st > 0, st, np.nan), axis=1)
+            between = length * np.nanvar(sm, axis=1, ddof=1)
+            pooled = (length - 1) / length * within + between / length
+            rhat = np.where(within > 0, np.sqrt(pooled / within), np.where(between > 0, np.inf, 1.0))
+
+    return {'n': valid.sum(axis=1), 'mean': mean, 'std': np.sqrt(var), 'se': se, 'ess': ess, 'rhat': rhat}
+
+
+def _probe_rows(values, N_iter):
+    # (probes, N_iter) view of the complete probes; a cancelled run's partial probe is left out
+    probes = len(values) // N_iter
+    return values[:probes * N_iter].reshape(probes, N_iter)
+
+
+def convergence_report(results, N_iter, options=None):
+    # Diagnoses every collected parameter per probe and for the whole run
+    options = options or read_diagnostics_options(None)
+    streams = options['streams']
+    N_iter = int(N_iter)
+    weights = np.asarray(results.get('Weights', []), dtype=float)
+    per_probe = {}
+    run = {}
+    for name, key in DIAGNOSED_PARAMETERS:
+        values = np.asarray(results[key], dtype=float)
+        w = _probe_rows(weights, N_iter) if len(weights) else None
+        x = _probe_rows(values, N_iter)
+        if not len(x):
+            continue
+        d = diagnose(x, w, streams)
+        per_probe[name] = d
+
+        # Run level: the probes are strata, so their errors combine; stream k gathers segment k of every probe
+        n = int(d['n'].sum())
+        se = float(np.sqrt(np.nansum((d['n'] / max(1, n) * d['se']) ** 2)))
+        whole = diagnose(x.reshape(1, -1), None if w is None else w.reshape(1, -1), streams)
+        length = N_iter // streams
+        rhat = np.nan
+        if length >= 2:
+            def by_stream(a):
+                return a[:, :streams * length].reshape(len(a), streams, length).transpose(1, 0, 2).reshape(1, -1)
+            rhat = float(diagnose(by_stream(x), None if w is None else by_stream(w), streams)['rhat'][0])
+        run[name] = {
+            'n': n,
+            'mean': float(whole['mean'][0]),
+            'se': se,
+            'ess': float(whole['std'][0] ** 2 / se ** 2 if w is not None else min(n, whole['std'][0] ** 2 / se ** 2))
+                   if se > 0 else float(n),
+            'rhat': rhat,
+        }
+
+    suitability = per_probe.get('Suitability')
+    suggestion = None
+    if suitability is not None and options['target_se'] > 0 and np.isfinite(suitability['se']).any():
+        worst = float(np.nanmax(suitability['se']))
+        suggestion = int(np.ceil(N_iter * (worst / options['target_se']) ** 2)) if worst > 0 else None
+    return {'per_probe': per_probe, 'run': run, 'streams': streams, 'iterations': N_iter,
+            'probes': len(next(iter(per_probe.values()))['n']) if per_probe else 0,
+            'options': options, 'suggested_iterations': suggestion}
+
+
+def print_convergence(report, max_listed=10):
+    if not report['per_probe']:
+        print('[Convergence] No complete probe to diagnose')
+        return
+    options = report['options']
+    print('[Convergence] %d probes x %d iterations, %d streams per probe'
+          % (report['probes'], report['iterations'], report['streams']))
+    print('  %-18s %12s %10s %10s %7s %9s' % ('Parameter', 'Mean', 'Std.err', 'ESS', 'R-hat', 'max R-hat'))
+    for name, r in report['run'].items():
+        worst = np.nanmax(report['per_probe'][name]['rhat']) if np.isfinite(report['per_probe'][name]['rhat']).any() else np.nan
+        print('  %-18s %12.5g %10.3g %10.0f %7.3f %9.3f' % (name, r['mean'], r['se'], r['ess'], r['rhat'], worst))
+
+    suitability = report['per_probe'].get('Suitability')
+    if suitability is None:
+        return
+    flagged = np.flatnonzero(suitability['rhat'] > options['rhat_limit'])
+    if len(flagged):
+        print('  ⚠️ %d probe(s) with Suitability streams disagreeing (R-hat > %.3g):' % (len(flagged), options['rhat_limit']))
+        for p in flagged[np.argsort(-suitability['rhat'][flagged])][:max_listed]:
+            print('     probe %d: mean %.4g ± %.2g, R-hat %.3f, ESS %.0f'
+                  % (p, suitability['mean'][p], suitability['se'][p], suitability['rhat'][p], suitability['ess'][p]))
+    worst = np.nanmax(suitability['se']) if np.isfinite(suitability['se']).any() else np.nan
+    suggestion = report['suggested_iterations']
+    if suggestion is None:
+        print('  ✅ Suitability is constant within every probe')
+    elif suggestion <= report['iterations']:
+        print('  ✅ Worst probe Suitability error %.3g <= TargetSE %.3g; about %d iterations would suffice'
+              % (worst, options['target_se'], suggestion))
+    else:
+        print('  ⚠️ Worst probe Suitability error %.3g > TargetSE %.3g; Niterations ≈ %d would reach it'
+              % (worst, options['target_se'], suggestion))
+
+
+def convergence_summary(report):
+    # Flat numbers for progress events and batch summaries
+    run = report['run'].get('Suitability', {})
+    return {
+        'suitability_se': run.get('se', np.nan),
+        'suitability_ess': run.get('ess', np.nan),
+        'suitability_rhat': run.get('rhat', np.nan),
+        'suggested_iterations': report['suggested_iterations'],
+    }
+
+
+def save_convergence(report, path):
+    # One structured row per probe: <parameter>_mean/_se/_ess/_rhat
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    fields = [('Probe', 'i8')]
+    for name in report['per_probe']:
+        fields += [(name + '_' + s, 'f8') for s in ('mean', 'se', 'ess', 'rhat')]
+    table = np.zeros(report['probes'], dtype=fields)
+    table['Probe'] = np.arange(report['probes'])
+    for name, d in report['per_probe'].items():
+        for s in ('mean', 'se', 'ess', 'rhat'):
+            table[name + '_' + s] = d[s]
+    np.save(path, table)
+    return path
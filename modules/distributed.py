@@ -0,0 +1,332 @@
+# Distributed QHF runs: a coordinator splits the probe range into tasks, workers pull them over TCP
+# Workers (on this machine or other hosts with the same checkout) load the modules named in the config
+# from their own Habitats/Metabolisms folders, run their probe range and send back compact per-probe
+# summaries (count, sum, sum of squares, min, max per collected parameter) instead of raw samples.
+# Tasks held by a worker that disconnects, or that exceeds the task timeout, go back into the queue.
+#
+# Protocol: one JSON object per line in both directions
+#   worker -> {"type": "hello", "worker": name}          coordinator -> {"type": "config", ...}
+#     (the config carries the coordinator's surrogate fit as design points, see surrogate.surrogate_spec)
+#   worker -> {"type": "request"}                         coordinator -> {"type": "task" | "wait" | "done", ...}
+#   worker -> {"type": "result", "task": id, "probes": [...]}   (answered like a request)
+#   worker -> {"type": "error", "task": id, "message": ...}     (the task is retried elsewhere)
+# There is no authentication: only bind to other interfaces than localhost on a trusted network.
+
+import os
+import sys
+import json
+import time
+import socket
+import tempfile
+import threading
+import contextlib
+import socketserver
+from collections import deque
+
+import numpy as np
+
+from modules.sample_collector import COLLECTED_PARAMETERS
+from modules.config_templates import load_config, config_text
+from modules.qhf_engine import (RESULTS_DIR, CONFIGS_DIR, safe_filename, read_run_config, load_modules, build_graph,
+                                prepare_sampling, run_monte_carlo)
+from modules.surrogate import read_surrogate_options, surrogate_spec
+
+DEFAULT_PORT = 5757
+WAIT_SECONDS = 0.5
+MAX_TASK_ATTEMPTS = 3
+
+
+# ======================================
+# Wire format
+# ======================================
+
+def _send(stream, message):
+    stream.write(json.dumps(message) + "\n")
+    stream.flush()
+
+
+def _receive(stream):
+    line = stream.readline()
+    if not line:
+        raise ConnectionError("connection closed")
+    return json.loads(line)
+
+
+def _number(x):
+    return float(x) if np.isfinite(x) else None
+
+
+def summarize_probes(results, first_probe, N_iter):
+    # Compact statistics per probe from the distributions of a run_monte_carlo() call
+    columns = {
+        "Suitability": results["Suitability_Distribution"],
+        "Temperature": results["Temperature_Distribution"],
+        "Bond_Albedo": results["BondAlbedo_Distribution"],
+        "GreenhouseWarming": results["GreenHouse_Distribution"],
+        "Pressure": results["Pressure_Distribution"],
+        "Depth": results["Depth_Distribution"],
+    }
+    summaries = []
+    for k, variable in enumerate(results["Variable"]):
+        probe = {"probe": first_probe + k, "variable": None, "stats": {}}
+        try:
+            probe["variable"] = _number(float(variable))
+        except (TypeError, ValueError):
+            pass
+        for p in COLLECTED_PARAMETERS:
+            chunk = np.asarray(columns[p][k * N_iter:(k + 1) * N_iter], dtype=float)
+            valid = chunk[np.isfinite(chunk)]
+            probe["stats"][p] = {
+                "n": int(valid.size),
+                "invalid": int(chunk.size - valid.size),
+                "sum": float(valid.sum()),
+                "sumsq": float(np.square(valid).sum()),
+                "min": float(valid.min()) if valid.size else None,
+                "max": float(valid.max()) if valid.size else None,
+            }
+        summaries.append(probe)
+    return summaries
+
+
+# ======================================
+# Coordinator
+# ======================================
+
+class Coordinator:
+    # Serves the tasks of one config; wait() blocks until every probe has a summary
+
+    def __init__(self, config_path, host="127.0.0.1", port=DEFAULT_PORT, task_probes=10, seed=None,
+                 task_timeout=None):
+        self.settings = read_run_config(config_path)
+        # Shipped resolved, so workers need none of the bases it extends
+        self.config_text = config_text(load_config(config_path, search_dirs=[CONFIGS_DIR]))
+        self.config_name = os.path.basename(config_path)
+        # A surrogate is fitted once here and shipped as its design points, so every worker samples one fit
+        self.surrogate = {}
+        if read_surrogate_options(self.settings["Surrogate"])["enabled"]:
+            Modules, _ = load_modules(self.settings)
+            _, _, _, topsorted = build_graph(Modules, verbose=False)
+            self.surrogate = surrogate_spec(prepare_sampling(Modules, topsorted, self.settings, verbose=False)[0])
+        self.iterations = int(self.settings["Niterations"])
+        self.seed = seed
+        self.task_timeout = task_timeout
+
+        probes = int(self.settings["NumProbes"])
+        self.tasks = {i: {"start": s, "count": min(task_probes, probes - s)}
+                      for i, s in enumerate(range(0, probes, max(1, task_probes)))}
+        self.pending = deque(self.tasks)
+        self.leases = {}
+        self.attempts = {i: 0 for i in self.tasks}
+        self.results = {}
+        self.workers = set()
+        self.failure = None
+        self.lock = threading.Lock()
+        self.changed = threading.Condition(self.lock)
+
+        coordinator = self
+
+        class _Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                coordinator._serve(self)
+
+        class _Server(socketserver.ThreadingTCPServer):
+            daemon_threads = True
+            allow_reuse_address = True
+
+        self.server = _Server((host, port), _Handler)
+        self.address = self.server.server_address
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    # ---------- task bookkeeping (lock held) ----------
+
+    def _next_message(self, connection):
+        if self.failure is not None or len(self.results) == len(self.tasks):
+            return {"type": "done"}
+        while self.pending:
+            task = self.pending.popleft()
+            if task not in self.results:
+                self.leases[task] = (connection, time.monotonic())
+                self.attempts[task] += 1
+                return dict(self.tasks[task], type="task", task=task)
+        return {"type": "wait", "seconds": WAIT_SECONDS}
+
+    def _requeue(self, task, reason):
+        self.leases.pop(task, None)
+        if task in self.results:
+            return
+        if self.attempts[task] >= MAX_TASK_ATTEMPTS:
+            self.failure = f"task {task} failed {self.attempts[task]} times (last: {reason})"
+        else:
+            print(f"  ↩️  Reassigning task {task}: {reason}")
+            self.pending.appendleft(task)
+        self.changed.notify_all()
+
+    def _release_connection(self, connection, reason):
+        for task, (holder, _) in list(self.leases.items()):
+            if holder is connection:
+                self._requeue(task, reason)
+
+    # ---------- connection handling ----------
+
+    def _serve(self, handler):
+        connection = object()
+        name = "?"
+
+        def reply(message):
+            handler.wfile.write((json.dumps(message) + "\n").encode())
+
+        try:
+            stream = handler.rfile
+            hello = json.loads(stream.readline() or "{}")
+            name = str(hello.get("worker", handler.client_address[0]))
+            with self.lock:
+                self.workers.add(name)
+            print(f"  🔌 Worker connected: {name}")
+            reply({"type": "config", "config_name": self.config_name, "config_text": self.config_text,
+                   "iterations": self.iterations, "seed": self.seed, "surrogate": self.surrogate})
+
+            for line in stream:
+                message = json.loads(line)
+                with self.lock:
+                    task = message.get("task")
+                    if message.get("type") == "result" and task in self.tasks:
+                        if task not in self.results:
+                            self.results[task] = message["probes"]
+                            done = len(self.results)
+                            print(f"  ✅ Task {task} ({self.tasks[task]['count']} probes) from {name} "
+                                  f"[{done}/{len(self.tasks)}]")
+                        self.leases.pop(task, None)
+                        self.changed.notify_all()
+                    elif message.get("type") == "error" and task in self.tasks:
+                        print(f"  ❌ Task {task} failed on {name}: {message.get('message')}")
+                        self._requeue(task, message.get("message"))
+                    answer = self._next_message(connection)
+                reply(answer)
+                if answer["type"] == "done":
+                    break
+        except (OSError, ValueError) as e:
+            print(f"  ⚠️  Lost worker {name}: {e}")
+        finally:
+            with self.lock:
+                self._release_connection(connection, f"worker {name} disconnected")
+                self.workers.discard(name)
+
+    def wait(self, timeout=None):
+        # Blocks until all tasks have results (True) or the run failed/timed out (False)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.lock:
+            while len(self.results) < len(self.tasks) and self.failure is None:
+                if deadline is not None and time.monotonic() > deadline:
+                    self.failure = "timed out waiting for workers"
+                    break
+                if self.task_timeout is not None:
+                    now = time.monotonic()
+                    for task, (_, started) in list(self.leases.items()):
+                        if now - started > self.task_timeout:
+                            self._requeue(task, f"no result after {self.task_timeout:g} s")
+                self.changed.wait(WAIT_SECONDS)
+        return self.failure is None
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def probe_summaries(self):
+        return sorted((p for probes in self.results.values() for p in probes), key=lambda p: p["probe"])
+
+
+def assemble(summaries):
+    # Per-probe arrays from the worker summaries; Suitability_Plot is the running mean over all samples so far
+    n = len(summaries)
+    arrays = {"Probe": np.array([s["probe"] for s in summaries], dtype=float),
+              "Variable": np.array([np.nan if s["variable"] is None else s["variable"] for s in summaries])}
+    for p in COLLECTED_PARAMETERS:
+        stats = [s["stats"][p] for s in summaries]
+        count = np.array([st["n"] for st in stats], dtype=float)
+        total = np.array([st["sum"] for st in stats])
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = total / count
+            var = np.array([st["sumsq"] for st in stats]) / count - mean ** 2
+        arrays[p + "_N"] = count
+        arrays[p + "_Invalid"] = np.array([st["invalid"] for st in stats], dtype=float)
+        arrays[p + "_Mean"] = mean
+        arrays[p + "_Std"] = np.sqrt(np.maximum(var, 0.0))
+        arrays[p + "_Min"] = np.array([np.nan if st["min"] is None else st["min"] for st in stats])
+        arrays[p + "_Max"] = np.array([np.nan if st["max"] is None else st["max"] for st in stats])
+        if p == "Suitability":
+            with np.errstate(invalid="ignore", divide="ignore"):
+                arrays["Suitability_Plot"] = np.cumsum(total) / np.cumsum(count) if n else np.array([])
+    return arrays
+
+
+def save_summary(arrays, config_id):
+    path = os.path.join(RESULTS_DIR, f"{safe_filename(config_id)}_distributed.npz")
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    np.savez_compressed(path, **arrays)
+    return path
+
+
+# ======================================
+# Worker
+# ======================================
+
+def run_worker(host, port, name=None, quiet=True):
+    # Connects to a coordinator and runs tasks until it says done; returns the number of tasks run
+    # A lost or refused connection (e.g. a worker started after the run finished) raises ConnectionError
+    name = name or f"{socket.gethostname()}:{os.getpid()}"
+    try:
+        sock = socket.create_connection((host, port))
+    except OSError as e:
+        raise ConnectionError(f"cannot reach the coordinator at {host}:{port} ({e})") from e
+    stream = sock.makefile("rw")
+    tasks_run = 0
+    try:
+        _send(stream, {"type": "hello", "worker": name})
+        config = _receive(stream)
+
+        # Modules are resolved from this checkout; only the config text travels
+        with tempfile.NamedTemporaryFile("w", suffix="_" + config["config_name"], delete=False) as f:
+            f.write(config["config_text"])
+        try:
+            settings = read_run_config(f.name)
+        finally:
+            os.remove(f.name)
+        N_iter = int(config["iterations"])
+
+        with open(os.devnull, "w") as sink, contextlib.redirect_stdout(sink if quiet else sys.stdout):
+            Modules, _ = load_modules(settings)
+            _, _, _, topsorted = build_graph(Modules, verbose=False)
+            Modules, topsorted = prepare_sampling(Modules, topsorted, settings, verbose=False,
+                                                  surrogate=config.get("surrogate"))
+
+        _send(stream, {"type": "request"})
+        while True:
+            message = _receive(stream)
+            if message["type"] == "done":
+                break
+            if message["type"] == "wait":
+                time.sleep(message.get("seconds", WAIT_SECONDS))
+                _send(stream, {"type": "request"})
+                continue
+            task, start, count = message["task"], message["start"], message["count"]
+            try:
+                if config.get("seed") is not None:
+                    # Seeded per probe range, so results do not depend on which worker ran the task
+                    np.random.seed((int(config["seed"]) + start) % 2 ** 32)
+                with open(os.devnull, "w") as sink, contextlib.redirect_stdout(sink if quiet else sys.stdout):
+                    results = run_monte_carlo(Modules, topsorted, count, N_iter, verbose=False, first_probe=start)
+                reply = {"type": "result", "task": task, "probes": summarize_probes(results, start, N_iter)}
+            except Exception as e:
+                reply = {"type": "error", "task": task, "message": f"{type(e).__name__}: {e}"}
+            _send(stream, reply)
+            tasks_run += 1
+    except ConnectionError as e:
+        # Reset, broken pipe or closed by the coordinator; other errors (e.g. a missing module file) pass through
+        raise ConnectionError(f"lost the connection to the coordinator at {host}:{port} after {tasks_run} tasks "
+                              f"({e}) -- the run may already be finished") from e
+    finally:
+        # Closing flushes the stream, which fails as well once the coordinator is gone
+        with contextlib.suppress(OSError):
+            stream.close()
+        sock.close()
+    return tasks_run
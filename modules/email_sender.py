@@ -4,6 +4,9 @@ import smtplib
 from email.message import EmailMessage
 import os
 import ssl
+import time
+import queue
+import threading
 from dotenv import load_dotenv # Used to load secure credentials from a .env file
 
 # Load sender email and password from environment variables
@@ -12,6 +15,11 @@ load_dotenv()
 SENDER_EMAIL = os.getenv("EMAIL_ADDRESS")
 APP_PASSWORD = os.getenv("EMAIL_PASSWORD")
 
+# SMTP server; override for a local stand-in, e.g. SMTP_HOST=localhost SMTP_PORT=1025 SMTP_SSL=0
+SMTP_HOST = os.getenv("SMTP_HOST", "smtp.gmail.com")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "465"))
+SMTP_SSL = os.getenv("SMTP_SSL", "1").lower() not in ("0", "false", "no")
+
 
 def send_welcome_email(to_email, name):
     """
@@ -34,15 +42,13 @@ def send_welcome_email(to_email, name):
     msg.set_content(body)
 
     try:
-        context = ssl.create_default_context()
-        with smtplib.SMTP_SSL('smtp.gmail.com', 465, context=context) as smtp:
-            smtp.login(SENDER_EMAIL, APP_PASSWORD)
+        with open_smtp() as smtp:
             smtp.send_message(msg)
         print(f"📧 Welcome email sent to {to_email}")
     except Exception as e:
         print(f"⚠️ Failed to send email to {to_email}: {e}")
 
-def send_update_email(to_email, name):
+def build_update_email(to_email, name):
     subject = "🚀 QHF Tool Update Available!"
     body = (
         f"Hi {name},\n\n"
@@ -59,13 +65,139 @@ def send_update_email(to_email, name):
     msg["To"] = to_email
     msg["Subject"] = subject
     msg.set_content(body)
+    return msg
+
+
+def send_update_email(to_email, name):
+    msg = build_update_email(to_email, name)
 
     try:
-        context = ssl.create_default_context()
-        with smtplib.SMTP_SSL("smtp.gmail.com", 465, context=context) as smtp:
-            smtp.login(SENDER_EMAIL, APP_PASSWORD)
+        with open_smtp() as smtp:
             smtp.send_message(msg)
         print(f"✅ Update email sent to {to_email}")
     except Exception as e:
         print(f"⚠️ Could not send update email to {to_email}: {e}")
 
+
+def open_smtp(host=None, port=None, use_ssl=None):
+    """
+    Opens an SMTP connection and logs in when credentials are configured.
+    """
+    host = host or SMTP_HOST
+    port = port or SMTP_PORT
+    use_ssl = SMTP_SSL if use_ssl is None else use_ssl
+    if use_ssl:
+        smtp = smtplib.SMTP_SSL(host, port, context=ssl.create_default_context(), timeout=30)
+    else:
+        smtp = smtplib.SMTP(host, port, timeout=30)
+    try:
+        if SENDER_EMAIL and APP_PASSWORD:
+            smtp.login(SENDER_EMAIL, APP_PASSWORD)
+    except Exception:
+        smtp.close()
+        raise
+    return smtp
+
+
+# ======================================
+# Bulk sending
+# ======================================
+
+# Errors worth retrying on a fresh connection; anything else (e.g. 5xx recipient refused) fails right away
+TRANSIENT_ERRORS = (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, ConnectionError, TimeoutError)
+
+
+def _is_transient(error):
+    if isinstance(error, TRANSIENT_ERRORS):
+        return True
+    code = getattr(error, "smtp_code", None)
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        codes = [c for c, _ in error.recipients.values()]
+        return bool(codes) and all(400 <= c < 500 for c in codes)
+    return code is not None and 400 <= code < 500
+
+
+class _RateLimiter:
+    # Spaces sends evenly across all workers (messages per second)
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0.0
+        self.next_slot = time.monotonic()
+        self.lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot)
+            self.next_slot = slot + self.interval
+        time.sleep(max(0.0, slot - now))
+
+
+def send_bulk(recipients, build_message=build_update_email, workers=4, rate=5.0, retries=3, backoff=2.0,
+              host=None, port=None, use_ssl=None):
+    """
+    Sends one message per (email, name) pair through a small pool of worker threads.
+    Each worker keeps one authenticated connection open and reconnects only after errors.
+    Sends are rate limited across the pool; transient failures are retried with exponential backoff.
+    Returns one outcome dict per recipient, in input order: email, name, status ("sent"/"failed"), attempts, error.
+    """
+    recipients = list(recipients)
+    outcomes = [None] * len(recipients)
+    jobs = queue.Queue()
+    for i, recipient in enumerate(recipients):
+        jobs.put((i, recipient))
+    limiter = _RateLimiter(rate)
+    abort = threading.Event()
+
+    def _worker():
+        smtp = None
+        while True:
+            try:
+                i, (email, name) = jobs.get_nowait()
+            except queue.Empty:
+                break
+            outcome = {"email": email, "name": name, "status": "failed", "attempts": 0, "error": ""}
+            if abort.is_set():
+                outcome["error"] = "not attempted: SMTP login failed"
+                outcomes[i] = outcome
+                continue
+            for attempt in range(1, retries + 2):
+                outcome["attempts"] = attempt
+                try:
+                    if smtp is None:
+                        smtp = open_smtp(host, port, use_ssl)
+                    limiter.wait()
+                    smtp.send_message(build_message(email, name))
+                    outcome["status"], outcome["error"] = "sent", ""
+                    break
+                except Exception as e:
+                    outcome["error"] = f"{type(e).__name__}: {e}"
+                    if isinstance(e, smtplib.SMTPAuthenticationError):
+                        # Wrong credentials fail for everyone; stop before the provider locks the account
+                        abort.set()
+                        break
+                    broken = isinstance(e, (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError)) or \
+                        not isinstance(e, smtplib.SMTPException)
+                    if broken and smtp is not None:
+                        # The connection is unusable; open a new one on the next attempt
+                        try:
+                            smtp.close()
+                        finally:
+                            smtp = None
+                    if not _is_transient(e) or attempt > retries:
+                        break
+                    time.sleep(backoff * 2 ** (attempt - 1))
+            outcomes[i] = outcome
+        if smtp is not None:
+            try:
+                smtp.quit()
+            except Exception:
+                smtp.close()
+
+    threads = [threading.Thread(target=_worker, daemon=True) for _ in range(max(1, min(workers, len(recipients))))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return outcomes
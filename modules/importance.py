@@ -0,0 +1,276 @@
+# Importance sampling of the prior modules for rare-habitability regimes
+# In hostile habitats most samples have zero Suitability, so plain Monte Carlo needs a huge Niterations to
+# resolve the habitable tail. Here every prior module (no input_parameters, see sensitivity.find_factors) is
+# run into a pool of draws once; each factor's pool is cut into quantile cells of its outputs, and samples
+# pick cells from a proposal tilted towards the tail by adaptive cross-entropy. Every sample carries the
+# likelihood ratio p(cell) / q(cell), so weighted statistics stay estimates under the original priors.
+# Cross-entropy ranks the tuning samples by Score. A 0/1 Suitability ties almost everywhere and leaves no elite
+# to refit to, so such chains should rank by a continuous output that grows towards the tail (e.g. Temperature
+# when only warm samples are habitable; -Temperature ranks lower values first). Once at least EliteFraction of
+# a round reaches Target, the proposal is refitted to those samples and tuning stops. Tuning samples are valid
+# weighted samples of their round's proposal, so they count towards the weighted estimates of the run.
+#
+#   [Importance]
+#   Enabled = true
+#   Target = 0.5            (Suitability level of the tail to resolve)
+#   Score = Temperature     (output the tuning ranks samples by; default Suitability)
+#   EliteFraction = 0.1     (share of tuning samples the proposal is refitted to each round)
+#   TuningRounds = 5
+#   TuningSamples = 2000
+#   Bins = 10               (quantile cells per prior output)
+#   PoolSize = 20000        (prior draws per factor shared by the whole run)
+#   Smoothing = 0.7
+#   Defensive = 0.1         (share of samples drawn from the priors; weights never exceed 1 / Defensive)
+#   Proposal = Results/mars_proposal.npz   (optional: reuse a saved proposal instead of tuning)
+#
+# Prior modules emitting several outputs are binned on their first MAX_BINNED_OUTPUTS outputs.
+
+import os
+
+import numpy as np
+
+import keyparams
+from modules.sensitivity import find_factors, draw_prior_pool, evaluate_rows
+
+MAX_BINNED_OUTPUTS = 3
+
+
+def read_importance_options(section, repo_root=None):
+    raw = {k.lower(): v for k, v in (section or {}).items()}
+    proposal = raw.get('proposal', '').strip()
+    if proposal and repo_root and not os.path.isabs(proposal):
+        proposal = os.path.join(repo_root, proposal)
+    return {
+        'enabled': str(raw.get('enabled', 'false')).strip().lower() in ('1', 'true', 'yes', 'on'),
+        'target': float(raw.get('target', '0.5')),
+        'score': raw.get('score', 'Suitability').strip() or 'Suitability',
+        'elite_fraction': min(0.5, max(0.001, float(raw.get('elitefraction', '0.1')))),
+        'tuning_rounds': max(0, int(raw.get('tuningrounds', '5'))),
+        'tuning_samples': max(10, int(raw.get('tuningsamples', '2000'))),
+        'bins': max(1, int(raw.get('bins', '10'))),
+        'pool_size': max(100, int(raw.get('poolsize', '20000'))),
+        'smoothing': min(1.0, max(0.0, float(raw.get('smoothing', '0.7')))),
+        'defensive': min(1.0, max(0.001, float(raw.get('defensive', '0.1')))),
+        'proposal': proposal or None,
+    }
+
+
+def _cell_edges(draws, bins):
+    # Interior quantile edges of the binned outputs: (outputs, bins - 1)
+    columns = draws[:, :MAX_BINNED_OUTPUTS]
+    quantiles = np.linspace(0.0, 1.0, bins + 1)[1:-1]
+    with np.errstate(invalid='ignore'):
+        return np.array([np.nanquantile(c, quantiles) if np.isfinite(c).any() else np.full(len(quantiles), np.nan)
+                         for c in columns.T]).reshape(columns.shape[1], len(quantiles))
+
+
+def _cells(draws, edges):
+    # Cell index of every draw; NaN outputs get a cell of their own
+    per_output = edges.shape[1] + 2
+    index = np.zeros(len(draws), dtype=np.int64)
+    for k, e in enumerate(edges):
+        column = draws[:, k]
+        b = np.searchsorted(e, column, side='right') if np.isfinite(e).all() else np.zeros(len(draws), dtype=np.int64)
+        b = np.where(np.isnan(column), per_output - 1, b)
+        index = index * per_output + b
+    return index, per_output ** len(edges)
+
+
+class ImportanceSampler:
+    # Draws prior outputs from a tuned proposal over a pool of prior draws and reports per-sample weights
+
+    def __init__(self, Modules, topsorted, options, seed=None):
+        self.Modules = Modules
+        self.options = options
+        self.priors, self.downstream = find_factors(Modules, topsorted)
+        if not self.priors:
+            raise ValueError('The module graph has no prior modules to sample from a proposal.')
+        self.parameter_names = [p for m in self.priors for p in Modules[m].output_parameters]
+        self.factor_names = [' '.join(str(Modules[m].name).split()) for m in self.priors]
+        self.rng = np.random.default_rng(seed)
+        self.level = None
+        # Suitability and weights of the tuning samples, see tuning_samples()
+        self._tuning = []
+
+        self.pool = draw_prior_pool(Modules, self.priors, options['pool_size'])
+        self.edges = [_cell_edges(draws, options['bins']) for draws in self.pool]
+        self._index_pool()
+        self.proposal = [p.copy() for p in self.nominal]
+
+    def _index_pool(self):
+        # Cell of every pool row, rows grouped by cell, and the prior probability of every cell
+        self.cells, self.nominal, self._order, self._starts = [], [], [], []
+        for draws, edges in zip(self.pool, self.edges):
+            cells, n_cells = _cells(draws, edges)
+            counts = np.bincount(cells, minlength=n_cells)
+            self.cells.append(cells)
+            self.nominal.append(counts / len(cells))
+            self._order.append(np.argsort(cells, kind='stable'))
+            self._starts.append(np.concatenate([[0], np.cumsum(counts)[:-1]]))
+
+    def _tilted(self, j):
+        # Tilted cell probabilities of one factor, restricted to cells the pool has rows in
+        q = np.where(self.nominal[j] > 0, self.proposal[j], 0.0)
+        return q / q.sum() if q.sum() > 0 else self.nominal[j]
+
+    def draw(self, n):
+        # Returns (values, weights, cells): (n, outputs) prior values, likelihood ratios and the cells drawn
+        # The proposal is a joint mixture: a Defensive share of samples takes every factor from the priors,
+        # so the weight p / ((1 - d) q + d p) stays below 1 / Defensive however many factors there are
+        defensive = self.options['defensive']
+        from_prior = self.rng.random(n) < defensive
+        columns, drawn = [], []
+        p_joint, q_joint = np.ones(n), np.ones(n)
+        for j, draws in enumerate(self.pool):
+            p, q = self.nominal[j], self._tilted(j)
+            cells = np.where(from_prior, self.rng.choice(len(p), size=n, p=p), self.rng.choice(len(q), size=n, p=q))
+            counts = np.bincount(self.cells[j], minlength=len(p))
+            rows = self._order[j][self._starts[j][cells] + (self.rng.random(n) * counts[cells]).astype(np.int64)]
+            columns.append(draws[rows])
+            p_joint *= p[cells]
+            q_joint *= q[cells]
+            drawn.append(cells)
+        weights = p_joint / ((1.0 - defensive) * q_joint + defensive * p_joint)
+        return np.hstack(columns), weights, drawn
+
+    def apply(self, row):
+        # Sets one sample's prior outputs on keyparams (the prior modules themselves are not executed)
+        for p, v in zip(self.parameter_names, row):
+            setattr(keyparams, p, v)
+
+    # ---------- cross-entropy tuning ----------
+
+    def update(self, drawn, weights, suitability, score):
+        # One cross-entropy step: refits every factor's cells to the elite samples; returns the elite Score
+        # level, or None when no sample ranks above the rest
+        # Once EliteFraction of the samples reach Target, the elite are exactly those samples
+        reached = np.isfinite(suitability) & (suitability >= self.options['target'])
+        if np.mean(reached) >= self.options['elite_fraction']:
+            elite, level = reached, np.inf
+        else:
+            s = np.where(np.isfinite(score), score, -np.inf)
+            level = float(np.quantile(s, 1.0 - self.options['elite_fraction']))
+            # Ties at the bottom (mostly zeros) carry no information: only strictly better samples are elite
+            elite = s > level if level <= s.min() else s >= level
+        if not elite.any():
+            return None
+        alpha = self.options['smoothing']
+        for j, cells in enumerate(drawn):
+            mass = np.bincount(cells[elite], weights=weights[elite], minlength=len(self.proposal[j]))
+            self.proposal[j] = alpha * mass / mass.sum() + (1.0 - alpha) * self.proposal[j]
+        return level
+
+    def tune(self, verbose=True):
+        # Adaptive cross-entropy: raises the elite Score level round by round until EliteFraction reaches Target
+        # A round where every sample ties (all zeros) carries no information: the next one draws twice as many
+        target = self.options['target']
+        name = self.options['score']
+        sign = -1.0 if name.startswith('-') else 1.0
+        name = name.lstrip('-').strip()
+        n = self.options['tuning_samples']
+        for r in range(self.options['tuning_rounds']):
+            values, weights, drawn = self.draw(n)
+            outputs = {name: None}
+            suitability = evaluate_rows(self.Modules, self.downstream, self.parameter_names, values, outputs)
+            self._tuning.append((suitability, weights))
+            level = self.update(drawn, weights, suitability, sign * outputs[name])
+            if verbose:
+                print('[Importance] Round %d: %d samples, %.2f%% reach Suitability %.3g, elite %s'
+                      % (r + 1, n, 100.0 * np.mean(suitability >= target), target,
+                         '-' if level is None else 'reach Target' if level == np.inf
+                         else '%s %s %.4g' % (name, '>=' if sign > 0 else '<=', sign * level)))
+            if level is None:
+                n *= 2
+                continue
+            self.level = level
+            if level == np.inf:
+                break
+        if self.level is None:
+            print('[Importance] No tuning sample rose above the rest -- sampling from the priors')
+            if name == 'Suitability':
+                print('[Importance] Set [Importance] Score to a continuous output that grows towards the tail '
+                      '(e.g. Temperature)')
+        return self
+
+    def tuning_samples(self):
+        # (Suitability, weights) of every tuning sample, to fold into the weighted estimates of the run
+        if not self._tuning:
+            return np.empty(0), np.empty(0)
+        return tuple(np.concatenate(column) for column in zip(*self._tuning))
+
+    # ---------- persistence ----------
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        arrays = {'factors': np.array(self.factor_names), 'bins': self.options['bins']}
+        for j in range(len(self.pool)):
+            arrays['edges_%d' % j] = self.edges[j]
+            arrays['proposal_%d' % j] = self.proposal[j]
+        np.savez(path, **arrays)
+        return path
+
+    def load(self, path):
+        # Reuses a saved (or hand-edited) proposal; the cells keep their saved edges
+        saved = np.load(path)
+        if list(saved['factors']) != self.factor_names:
+            raise ValueError('%s was tuned for the priors %s, not %s'
+                             % (path, ', '.join(saved['factors']), ', '.join(self.factor_names)))
+        self.edges = [saved['edges_%d' % j] for j in range(len(self.pool))]
+        self._index_pool()
+        self.proposal = [np.asarray(saved['proposal_%d' % j], dtype=float) for j in range(len(self.pool))]
+        for j, q in enumerate(self.proposal):
+            if q.shape != self.nominal[j].shape:
+                raise ValueError('%s does not match the cells of %s' % (path, self.factor_names[j]))
+        return self
+
+    def describe(self):
+        return ('[Importance] %d prior factors (%s), pool of %d draws, weights at most %.1f'
+                % (len(self.priors), ', '.join(self.factor_names), self.options['pool_size'],
+                   1.0 / self.options['defensive']))
+
+
+# ======================================
+# Weighted statistics
+# ======================================
+
+def weighted_summary(values, weights, target):
+    # Self-normalized estimates with their standard errors, and the effective sample size
+    values = np.asarray(values, dtype=float)
+    weights = np.asarray(weights, dtype=float)
+    ok = np.isfinite(values)
+    v, w = values[ok], weights[ok]
+    if not len(v) or not w.sum() > 0:
+        return {'samples': len(v), 'ess': 0.0, 'mean': np.nan, 'mean_se': np.nan, 'tail': np.nan, 'tail_se': np.nan}
+    total = w.sum()
+    mean = np.sum(w * v) / total
+    tail_indicator = (v >= target).astype(float)
+    tail = np.sum(w * tail_indicator) / total
+    return {
+        'samples': len(v),
+        'ess': float(total ** 2 / np.sum(w ** 2)),
+        'mean': float(mean),
+        'mean_se': float(np.sqrt(np.sum(w ** 2 * (v - mean) ** 2)) / total),
+        'tail': float(tail),
+        'tail_se': float(np.sqrt(np.sum(w ** 2 * (tail_indicator - tail) ** 2)) / total),
+    }
+
+
+def print_weighted_summary(summary, target):
+    print('[Importance] %d weighted samples, effective sample size %.0f' % (summary['samples'], summary['ess']))
+    print('  Average Suitability %.4g ± %.2g' % (summary['mean'], summary['mean_se']))
+    print('  P(Suitability >= %.3g) = %.4g ± %.2g' % (target, summary['tail'], summary['tail_se']))
+
+
+def resample(results, seed=None):
+    # Equal-weight copy of the distributions (systematic resampling) for analyses without a weights argument
+    weights = np.asarray(results['Weights'], dtype=float)
+    n = len(weights)
+    if not n:
+        return results
+    positions = (np.random.default_rng(seed).random() + np.arange(n)) / n
+    rows = np.minimum(np.searchsorted(np.cumsum(weights) / weights.sum(), positions), n - 1)
+    resampled = dict(results)
+    for key in ('Suitability_Distribution', 'Temperature_Distribution', 'Pressure_Distribution',
+                'BondAlbedo_Distribution', 'GreenHouse_Distribution', 'Depth_Distribution'):
+        resampled[key] = np.asarray(results[key], dtype=float)[rows].tolist()
+    return resampled
@@ -0,0 +1,165 @@
+# Array kernels for metabolism modules, compiled with Numba when it is installed
+# A module can provide a pure function over whole columns next to its per-sample execute():
+#
+#   class Cyanobacteria(Module):
+#       input_parameters = ['Temperature', 'Pressure']
+#       output_parameters = ['Suitability']
+#       runid = 'cyano'                               (optional, set on keyparams by batch runs)
+#
+#       @staticmethod
+#       def kernel(Temperature, Pressure):           # float64 arrays, in input_parameters order
+#           return np.where(Pressure > 0.1, np.exp(-((Temperature - 290.0) / 30.0) ** 2), 0.0)
+#
+# It returns one array per output parameter (a tuple if there are several) and must not touch keyparams.
+# Keep it to NumPy operations and loops over arrays so numba.njit can compile it; without Numba (or if
+# compilation fails) the same function runs as plain NumPy. check_kernel() verifies a kernel against the
+# module's own execute() on real samples of the chain (python qhf_kernels.py Configs/<config>.cfg).
+
+import time
+import warnings
+
+import numpy as np
+
+import keyparams
+
+try:
+    import numba
+except ImportError:  # Numba is optional; kernels then run as plain NumPy
+    numba = None
+
+
+def has_kernel(module):
+    return callable(getattr(module, 'kernel', None))
+
+
+class Kernel:
+    # Callable wrapper: JIT-compiled on first use when possible, NumPy otherwise
+
+    def __init__(self, func, jit=None):
+        self.func = func
+        self.jit = numba is not None if jit is None else bool(jit and numba is not None)
+        self._compiled = numba.njit(cache=False)(func) if self.jit else None
+
+    @property
+    def backend(self):
+        return 'numba' if self._compiled is not None else 'numpy'
+
+    def __call__(self, *arrays):
+        if self._compiled is not None:
+            try:
+                return self._compiled(*arrays)
+            except Exception as e:
+                # Typing errors only show up at the first call; keep running on NumPy
+                warnings.warn(f'Numba could not compile {self.func.__qualname__} ({type(e).__name__}); using NumPy')
+                self._compiled = None
+        return self.func(*arrays)
+
+
+def run_kernel(kernel, module, inputs, n):
+    # Calls a kernel on the module's input columns and returns {output parameter: float array of length n}
+    arrays = [np.ascontiguousarray(inputs[p], dtype=float) for p in module.input_parameters]
+    outputs = kernel(*arrays)
+    if len(module.output_parameters) == 1 and not isinstance(outputs, tuple):
+        outputs = (outputs,)
+    return {p: np.broadcast_to(np.asarray(v, dtype=float), (n,)) for p, v in zip(module.output_parameters, outputs)}
+
+
+class KernelModule:
+    # Gives a module with a kernel the batch interface of the level executor; execute() stays per sample
+
+    def __init__(self, module, jit=None):
+        self.module = module
+        self.name = module.name
+        self.input_parameters = module.input_parameters
+        self.output_parameters = module.output_parameters
+        self.runid = getattr(module, 'runid', None)
+        self.kernel = Kernel(module.kernel, jit=jit)
+
+    def execute(self):
+        self.module.execute()
+
+    def execute_batch(self, inputs, n):
+        return run_kernel(self.kernel, self.module, inputs, n)
+
+
+def with_kernels(Modules, jit=None):
+    # Same list with kernel modules wrapped in KernelModule (indices are unchanged)
+    return [KernelModule(m, jit=jit) if has_kernel(m) else m for m in Modules]
+
+
+# ======================================
+# Equivalence harness
+# ======================================
+
+def _sample_chain(Modules, topsorted, m, n):
+    # Runs the chain up to module m for n samples; returns its input columns and its scalar outputs
+    module = Modules[m]
+    upstream = topsorted[:topsorted.index(m)]
+    inputs = {p: [] for p in module.input_parameters}
+    outputs = {p: [] for p in module.output_parameters}
+    keyparams.ProbeIndex = 0
+    scalar_seconds = 0.0
+    for _ in range(n):
+        for u in upstream:
+            Modules[u].execute()
+        for p in inputs:
+            inputs[p].append(getattr(keyparams, p, None))
+        t0 = time.perf_counter()
+        module.execute()
+        scalar_seconds += time.perf_counter() - t0
+        for p in outputs:
+            outputs[p].append(getattr(keyparams, p, None))
+    return ({p: np.asarray(v, dtype=float) for p, v in inputs.items()},
+            {p: np.asarray(v, dtype=float) for p, v in outputs.items()}, scalar_seconds)
+
+
+def _compare(expected, actual):
+    # 'identical', 'close' (within 1e-12 relative) or 'MISMATCH', plus the largest absolute difference
+    worst = 0.0
+    verdict = 'identical'
+    for p, e in expected.items():
+        a = actual[p]
+        if np.array_equal(e, a, equal_nan=True):
+            continue
+        diff = np.abs(e - a)
+        both_nan = np.isnan(e) & np.isnan(a)
+        worst = max(worst, float(np.nanmax(np.where(both_nan, 0.0, diff))) if diff.size else 0.0)
+        if np.allclose(e, a, rtol=1e-12, atol=0.0, equal_nan=True):
+            verdict = 'close' if verdict == 'identical' else verdict
+        else:
+            verdict = 'MISMATCH'
+    return verdict, worst
+
+
+def check_kernel(Modules, topsorted, m, n=1000, seed=0):
+    # Compares a module's kernel (NumPy and, if available, Numba) with its execute() on n chain samples
+    np.random.seed(seed)
+    module = Modules[m]
+    inputs, expected, scalar_seconds = _sample_chain(Modules, topsorted, m, n)
+    rows = []
+    for jit in ([False, True] if numba is not None else [False]):
+        kernel = Kernel(module.kernel, jit=jit)
+        run_kernel(kernel, module, inputs, n)  # warm-up (JIT compilation)
+        t0 = time.perf_counter()
+        actual = run_kernel(kernel, module, inputs, n)
+        seconds = time.perf_counter() - t0
+        verdict, worst = _compare(expected, actual)
+        rows.append({
+            'Module': ' '.join(str(module.name).split()),
+            'Backend': kernel.backend,
+            'Samples': n,
+            'Result': verdict,
+            'MaxAbsDiff': worst,
+            'ScalarSecondsPerSample': scalar_seconds / n,
+            'KernelSecondsPerSample': seconds / n,
+        })
+    return rows
+
+
+def print_kernel_checks(rows):
+    print('[Kernel check]')
+    for r in rows:
+        mark = '❌' if r['Result'] == 'MISMATCH' else '✅'
+        speedup = r['ScalarSecondsPerSample'] / r['KernelSecondsPerSample'] if r['KernelSecondsPerSample'] else float('inf')
+        print(f"  {mark} {r['Module']} [{r['Backend']}]: {r['Result']} over {r['Samples']} samples "
+              f"(max |diff| {r['MaxAbsDiff']:.3g}), {speedup:.0f}x faster than execute()")
@@ -0,0 +1,150 @@
+# Level-scheduled execution of the module DAG over a whole batch of samples
+# Instead of running the full chain once per sample (serial order), every module runs over the whole batch
+# before its dependents, level by level (level = longest dependency path from a prior). Modules in the
+# same level are independent; those exposing a batch interface run concurrently on a thread pool, which
+# pays off when their NumPy code releases the GIL.
+#
+#   [Execution]
+#   Mode = levels    (serial = original per-sample order, the default)
+#   Threads = 4
+#   JIT = auto       (compile module kernels with Numba when installed; off = plain NumPy)
+#
+# Batch interface (optional, per module):
+#   def execute_batch(self, inputs, n):   # inputs: {parameter: array of length n}
+#       return {parameter: array of length n for every output_parameter}
+# It must not touch keyparams, so it is safe to run next to other modules. Modules without it are
+# executed sample by sample with their declared inputs set on keyparams; they never run concurrently.
+# Modules with an array kernel (see modules/kernels.py) get the batch interface automatically.
+# Each batch lives in a ParameterStore, so columns are typed as declared in the modules' parameter_schema.
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import networkx as nx
+
+import keyparams
+from modules.parameter_store import ParameterStore, build_schema
+from modules.kernels import with_kernels
+
+
+def read_execution_options(section):
+    raw = {k.lower(): v for k, v in (section or {}).items()}
+    return {
+        'mode': str(raw.get('mode', 'serial')).strip().lower(),
+        'threads': max(1, int(raw.get('threads', '4') or 1)),
+        'jit': {'on': True, 'true': True, 'off': False, 'false': False}.get(
+            str(raw.get('jit', 'auto')).strip().lower()),
+    }
+
+
+def dependency_levels(Modules, order):
+    # Groups module indices by dependency depth; modules within a level do not depend on each other
+    DG = nx.DiGraph()
+    DG.add_nodes_from(order)
+    DG.add_edges_from((a, b) for b in order for ip in Modules[b].input_parameters
+                      for a in order if ip in Modules[a].output_parameters and a != b)
+    depth = {}
+    for m in nx.topological_sort(DG):
+        depth[m] = max((depth[p] + 1 for p in DG.predecessors(m)), default=0)
+    levels = [[] for _ in range(max(depth.values(), default=-1) + 1)]
+    for m in order:
+        levels[depth[m]].append(m)
+    return levels
+
+
+def has_batch_interface(module):
+    return callable(getattr(module, 'execute_batch', None))
+
+
+class LevelExecutor:
+    # Runs a sorted module chain level by level over batches of samples
+
+    def __init__(self, Modules, order, threads=4, jit=None):
+        self.Modules = with_kernels(Modules, jit=jit)
+        self.levels = dependency_levels(Modules, order)
+        self.schema, self.conflicts = build_schema(Modules, order)
+        self.threads = threads
+        self.pool = ThreadPoolExecutor(max_workers=threads) if threads > 1 else None
+
+    def describe(self):
+        lines = []
+        for depth, level in enumerate(self.levels):
+            names = ['%s%s' % (' '.join(self.Modules[m].name.split()),
+                               ' [batch]' if has_batch_interface(self.Modules[m]) else '') for m in level]
+            lines.append('  level %d: %s' % (depth, ', '.join(names)))
+        for conflict in self.conflicts:
+            lines.append('  ⚠️  ' + conflict)
+        if self.threads > 1 and not any(self._parallel(level) for level in self.levels):
+            lines.append('  ⚠️  No level has two modules that can run side by side (only modules with '
+                         'execute_batch or a kernel do) -- the %d threads stay idle and modules run one after another'
+                         % self.threads)
+        return '\n'.join(lines)
+
+    def _parallel(self, level):
+        # Batch modules run on the pool next to each other and next to the scalar modules of their level
+        batch = sum(has_batch_interface(self.Modules[m]) for m in level)
+        return batch + min(len(level) - batch, 1) > 1
+
+    def _run_batch_module(self, m, store, n):
+        module = self.Modules[m]
+        inputs = {p: store.column(p) for p in module.input_parameters if p in store}
+        t0 = time.perf_counter()
+        outputs = module.execute_batch(inputs, n)
+        return m, outputs, time.perf_counter() - t0
+
+    def _run_scalar_module(self, m, store, n):
+        module = self.Modules[m]
+        inputs = [(p, store.column(p)) for p in module.input_parameters if p in store]
+        outputs = {p: [None] * n for p in module.output_parameters}
+        t0 = time.perf_counter()
+        for i in range(n):
+            for p, column in inputs:
+                setattr(keyparams, p, column[i])
+            module.execute()
+            for p, column in outputs.items():
+                column[i] = getattr(keyparams, p, None)
+        return m, outputs, time.perf_counter() - t0
+
+    def run_batch(self, n, profile=None, inputs=None):
+        # Executes n samples into a ParameterStore and leaves the last sample's values on keyparams
+        # inputs ({parameter: column}) are set before the first level, e.g. fixed prior outputs of a chain
+        # without its prior modules
+        store = ParameterStore(self.schema, n)
+        for p, column in (inputs or {}).items():
+            store.set_column(p, column)
+        keyparams.runid = ''
+        for level in self.levels:
+            batch = [m for m in level if has_batch_interface(self.Modules[m])]
+            scalar = [m for m in level if m not in batch]
+
+            finished = []
+            futures = []
+            if self.pool is not None and self._parallel(level):
+                futures = [self.pool.submit(self._run_batch_module, m, store, n) for m in batch]
+            else:
+                finished.extend(self._run_batch_module(m, store, n) for m in batch)
+            # Scalar modules share keyparams, so they run one after another on this thread
+            # while the batch modules of the same level work on the pool
+            finished.extend(self._run_scalar_module(m, store, n) for m in scalar)
+            finished.extend(f.result() for f in futures)
+
+            # Only this thread writes the store (and keyparams), once the whole level is done
+            for m, outputs, seconds in sorted(finished, key=lambda r: level.index(r[0])):
+                for p, values in outputs.items():
+                    store.set_column(p, values)
+                if m in batch and getattr(self.Modules[m], 'runid', None):
+                    keyparams.runid = self.Modules[m].runid
+                if profile is not None:
+                    total, calls = profile.get(m, (0.0, 0))
+                    profile[m] = (total + seconds, calls + n)
+
+        for p, column in store.columns().items():
+            if n:
+                setattr(keyparams, p, column[-1])
+        # Keep promoted dtypes for the next batch
+        self.schema = store.schema
+        return store
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
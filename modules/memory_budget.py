@@ -0,0 +1,149 @@
+# Memory budget and per-stage footprint of a run
+#
+#   [Resources]
+#   MaxMemoryMB = 4000
+#
+# The footprint is the resident set size of the process (psutil if installed, /proc/self/statm on Linux,
+# else the Python allocations traced by tracemalloc), sampled on a background thread so the peak of every
+# stage (module loading, sampling, aggregation, plotting) is caught. Once the footprint passes
+# SOFT_FRACTION of the limit, run_monte_carlo folds its per-probe buffers into arrays every
+# STOP_CHECK_INTERVAL samples (smaller batches) and streams the collected distributions to files on disk,
+# which are memory-mapped when the run ends.
+
+import os
+import sys
+import atexit
+import shutil
+import tempfile
+import threading
+import tracemalloc
+from contextlib import contextmanager
+
+import numpy as np
+
+try:
+    import psutil
+except ImportError:  # psutil is optional; /proc or tracemalloc are used instead
+    psutil = None
+
+SOFT_FRACTION = 0.8
+SAMPLE_SECONDS = 0.05
+
+
+def _rss_reader():
+    # Returns a function giving the current footprint in bytes, and what it measures
+    if psutil is not None:
+        process = psutil.Process()
+        return (lambda: process.memory_info().rss), 'RSS'
+    if sys.platform.startswith('linux') and os.path.exists('/proc/self/statm'):
+        page = os.sysconf('SC_PAGE_SIZE')
+
+        def read():
+            with open('/proc/self/statm') as f:
+                return int(f.read().split()[1]) * page
+        return read, 'RSS'
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+    return (lambda: tracemalloc.get_traced_memory()[0]), 'traced Python memory'
+
+
+class MemoryMonitor:
+    # Samples the footprint in the background and keeps the peak of each named stage
+
+    def __init__(self, limit_mb=None, interval=SAMPLE_SECONDS):
+        self.limit_mb = limit_mb
+        self.interval = interval
+        self._read, self.measure = _rss_reader()
+        self.stages = {}
+        self.forced = False
+        self._stage = None
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        self._thread = threading.Thread(target=self._watch, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._done.set()
+
+    def _watch(self):
+        while not self._done.wait(self.interval):
+            self.sample()
+
+    def sample(self):
+        # Current footprint in MB; also raises the running stage's peak
+        mb = self._read() / 2 ** 20
+        with self._lock:
+            if self._stage is not None:
+                self.stages[self._stage] = max(self.stages.get(self._stage, 0.0), mb)
+        return mb
+
+    def set_stage(self, name):
+        # Attributes the footprint from now on to stage name (None: to no stage); returns the previous one
+        self.sample()
+        with self._lock:
+            previous, self._stage = self._stage, name
+        if name is not None:
+            self.sample()
+        return previous
+
+    @contextmanager
+    def stage(self, name):
+        previous = self.set_stage(name)
+        try:
+            yield self
+        finally:
+            self.set_stage(previous)
+
+    def pressure(self):
+        # True once the footprint passes SOFT_FRACTION of MaxMemoryMB (never without a limit)
+        return self.forced or (self.limit_mb is not None and self.sample() > SOFT_FRACTION * self.limit_mb)
+
+    def check_estimate(self, memory_mb):
+        # Warning text if the predicted result memory alone would not fit under the limit, else None
+        if self.limit_mb is None:
+            return None
+        available = SOFT_FRACTION * self.limit_mb - self.sample()
+        if memory_mb > available:
+            self.forced = True
+            return ('Predicted result memory %.0f MB exceeds the %.0f MB left under MaxMemoryMB = %g -- '
+                    'results will be streamed to disk' % (memory_mb, max(available, 0.0), self.limit_mb))
+        return None
+
+    def report(self):
+        limit = ' (limit %g MB)' % self.limit_mb if self.limit_mb is not None else ''
+        print('[Memory] Peak %s per stage%s' % (self.measure, limit))
+        for name, mb in self.stages.items():
+            over = '  ⚠️ over the limit' if self.limit_mb is not None and mb > self.limit_mb else ''
+            print('  %-15s %8.1f MB%s' % (name, mb, over))
+
+
+class SpilledDistributions:
+    # Append-only float64 files, one per distribution, memory-mapped once sampling is done
+
+    def __init__(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = tempfile.mkdtemp(prefix='.spill_', dir=directory)
+        self.lengths = {}
+        atexit.register(shutil.rmtree, self.directory, True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + '.f8')
+
+    def append(self, key, values):
+        values = np.ascontiguousarray(values, dtype=np.float64)
+        with open(self._path(key), 'ab') as f:
+            f.write(values.tobytes())
+        self.lengths[key] = self.lengths.get(key, 0) + len(values)
+
+    def load(self, key):
+        # Read-only view of everything appended to one distribution
+        if not self.lengths.get(key):
+            return np.zeros(0)
+        return np.memmap(self._path(key), dtype=np.float64, mode='r', shape=(self.lengths[key],))
+
+
+def start_memory_monitor(resource_options):
+    return MemoryMonitor(resource_options.get('max_memory_mb')).start()
@@ -0,0 +1,247 @@
+# Incremental recomputation: stores every module's output columns for a run and replays them on re-runs
+# A module's cache key combines the hash of its source files (the files defining its class and base classes,
+# plus the repository files they import from), its class, the keys of the modules feeding it and the run
+# shape (NumProbes x Niterations). Editing one Metabolism file therefore only invalidates that
+# module and its descendants; unchanged Habitat modules are replayed from disk instead of executed.
+#
+#   [Cache]
+#   Incremental = true
+#   Directory = Results/cache     (optional)
+#
+# Nothing is evicted automatically: python QHF.py <config> --clear-cache empties the directory first.
+#
+# Replayed modules only restore their declared output_parameters. Modules producing Suitability are
+# always executed, so run-level side effects such as keyparams.runid are still set.
+
+import os
+import glob
+import types
+import hashlib
+
+import numpy as np
+import networkx as nx
+
+import keyparams
+from modules.sample_collector import coerce_column
+
+CACHE_VERSION = "2"
+
+# Imports from files under here count as module sources; installed packages do not
+SOURCE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def read_cache_options(section, repo_root):
+    raw = {k.lower(): v for k, v in (section or {}).items()}
+    directory = raw.get('directory', os.path.join('Results', 'cache'))
+    return {
+        'incremental': str(raw.get('incremental', 'false')).strip().lower() in ('1', 'true', 'yes', 'on'),
+        'directory': directory if os.path.isabs(directory) else os.path.join(repo_root, directory),
+    }
+
+
+def _file_hash(path, _memo={}):
+    stat = os.stat(path)
+    memo_key = (path, stat.st_mtime_ns, stat.st_size)
+    if memo_key not in _memo:
+        with open(path, 'rb') as f:
+            _memo[memo_key] = hashlib.sha256(f.read()).hexdigest()
+    return _memo[memo_key]
+
+
+def _defined_in(value):
+    # Source file of an imported module, function or class, else None
+    if isinstance(value, types.ModuleType):
+        return getattr(value, '__file__', None)
+    if hasattr(value, '__code__'):
+        return value.__code__.co_filename
+    if isinstance(value, type):
+        return next((f.__code__.co_filename for f in vars(value).values() if hasattr(f, '__code__')), None)
+    return None
+
+
+def _is_source(path):
+    path = os.path.abspath(path)
+    return path.startswith(SOURCE_ROOT + os.sep) and 'site-packages' not in path.split(os.sep)
+
+
+def module_source_files(cls):
+    # Whole files defining the class and its bases, plus the repository files their globals come from
+    # Module files are exec'd without a sys.modules entry, so the files come from the methods' code objects
+    files = set()
+    for klass in cls.__mro__[:-1]:
+        for f in vars(klass).values():
+            if not hasattr(f, '__code__'):
+                continue
+            files.add(f.__code__.co_filename)
+            for value in getattr(f, '__globals__', {}).values():
+                path = _defined_in(value)
+                if path and _is_source(path):
+                    files.add(path)
+    return sorted(files)
+
+
+def module_source_hash(module):
+    # Hash of the file(s) the module's class depends on; None if the source cannot be located
+    cls = type(module)
+    if getattr(module, 'cacheable', True) is False:
+        return None
+    paths = module_source_files(cls)
+    if not paths or not all(os.path.isfile(p) for p in paths):
+        return None
+    text = ''.join(_file_hash(p) for p in paths) + cls.__qualname__ + module.name
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def module_keys(Modules, topsorted, run_shape):
+    # Cache key per module index; None marks modules (and descendants) that cannot be cached
+    DG = nx.DiGraph()
+    DG.add_nodes_from(topsorted)
+    DG.add_edges_from((a, b) for b in topsorted for ip in Modules[b].input_parameters
+                      for a in topsorted if ip in Modules[a].output_parameters)
+    keys = {}
+    for m in topsorted:
+        own = module_source_hash(Modules[m])
+        upstream = [keys[p] for p in DG.predecessors(m)]
+        if own is None or any(k is None for k in upstream):
+            keys[m] = None
+            continue
+        text = '|'.join([CACHE_VERSION, own, 'x'.join(map(str, run_shape))] + sorted(upstream))
+        keys[m] = hashlib.sha256(text.encode()).hexdigest()[:32]
+    return keys
+
+
+class _Cursor:
+    # Global sample index shared by the wrappers of one run
+    def __init__(self):
+        self.index = 0
+
+
+class ReplayModule:
+    # Replays cached output columns instead of executing the wrapped module
+
+    def __init__(self, module, columns, cursor):
+        self.module = module
+        self.name = module.name
+        self.input_parameters = module.input_parameters
+        self.output_parameters = module.output_parameters
+        self.columns = columns
+        self.cursor = cursor
+
+    def execute(self):
+        i = self.cursor.index
+        for p in self.output_parameters:
+            setattr(keyparams, p, self.columns[p][i])
+
+
+class RecordingModule:
+    # Executes the wrapped module and keeps its outputs for the cache
+
+    def __init__(self, module, cursor):
+        self.module = module
+        self.name = module.name
+        self.input_parameters = module.input_parameters
+        self.output_parameters = module.output_parameters
+        self.cursor = cursor
+        self.raw = {p: [] for p in module.output_parameters}
+
+    def execute(self):
+        self.module.execute()
+        for p in self.output_parameters:
+            self.raw[p].append(getattr(keyparams, p, None))
+
+
+class _AdvanceCursor:
+    # Last step of every sample: moves the shared cursor to the next sample
+    name = 'Cache cursor'
+    input_parameters = []
+    output_parameters = []
+
+    def __init__(self, cursor):
+        self.cursor = cursor
+
+    def execute(self):
+        self.cursor.index += 1
+
+
+class IncrementalRun:
+    # Wraps a sorted module chain so cached modules are replayed and the rest are recorded
+
+    def __init__(self, Modules, topsorted, NumProbes, N_iter, cache_dir):
+        self.cache_dir = cache_dir
+        self.n_samples = int(NumProbes) * int(N_iter)
+        self.keys = module_keys(Modules, topsorted, (int(NumProbes), int(N_iter)))
+        self.cursor = _Cursor()
+        self.recorders = {}
+        self.replayed = []
+        self.executed = []
+
+        wrapped = []
+        for m in topsorted:
+            module = Modules[m]
+            key = self.keys[m]
+            always_run = 'Suitability' in module.output_parameters
+            columns = None if (key is None or always_run) else self._load(key)
+            if columns is not None:
+                wrapped.append(ReplayModule(module, columns, self.cursor))
+                self.replayed.append(module.name)
+            elif key is not None and not always_run:
+                self.recorders[key] = RecordingModule(module, self.cursor)
+                wrapped.append(self.recorders[key])
+                self.executed.append(module.name)
+            else:
+                wrapped.append(module)
+                self.executed.append(module.name)
+        wrapped.append(_AdvanceCursor(self.cursor))
+        self.Modules = wrapped
+        self.order = list(range(len(wrapped)))
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key + '.npz')
+
+    def _load(self, key):
+        path = self._path(key)
+        if not os.path.isfile(path):
+            return None
+        try:
+            with np.load(path) as data:
+                columns = {p: data[p] for p in data.files}
+        except Exception:
+            return None
+        if any(len(c) != self.n_samples for c in columns.values()):
+            return None
+        return columns
+
+    def report(self):
+        print('[Incremental] Replaying %d cached modules, executing %d'
+              % (len(self.replayed), len(self.executed)))
+        for name in self.replayed:
+            print('   cached   :', ' '.join(name.split()))
+        for name in self.executed:
+            print('   executed :', ' '.join(name.split()))
+
+    def save(self):
+        # Stores recorded columns of a complete run; partial (cancelled) runs are not cached
+        if self.cursor.index != self.n_samples:
+            return 0
+        os.makedirs(self.cache_dir, exist_ok=True)
+        saved = 0
+        for key, recorder in self.recorders.items():
+            coerced = {p: coerce_column(values) for p, values in recorder.raw.items()}
+            # Only fully numeric outputs can be replayed faithfully
+            if any(n_invalid for _, n_invalid in coerced.values()):
+                continue
+            columns = {p: column for p, (column, _) in coerced.items()}
+            if columns and all(len(c) == self.n_samples for c in columns.values()):
+                tmp = self._path(key) + '.tmp.npz'
+                np.savez(tmp, **columns)
+                os.replace(tmp, self._path(key))
+                saved += 1
+        return saved
+
+
+def clear_cache(cache_dir):
+    removed = 0
+    for path in glob.glob(os.path.join(cache_dir, '*.npz')):
+        os.remove(path)
+        removed += 1
+    return removed
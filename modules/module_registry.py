@@ -0,0 +1,342 @@
+# Module registry: scans Habitats/, Metabolisms/ and Analyses/ once and keeps an on-disk index of
+# what every file defines (class/function names and the declared input/output parameters of QHF modules).
+# Files are only re-imported when their size/mtime and content hash change, so the GUI and the runner
+# can answer "which classes are in this file?" without executing module code on every start.
+# Several processes (batch workers) may update the index at once: each save takes a lock file, merges the
+# records it changed into the index on disk and replaces it through a temp file of its own.
+
+import os
+import sys
+import json
+import hashlib
+import inspect
+import tempfile
+import contextlib
+import importlib.util
+
+try:
+    import fcntl
+except ImportError:  # not on Windows; saves still merge and replace atomically, just without the lock
+    fcntl = None
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULE_KINDS = ("Habitats", "Metabolisms", "Analyses")
+INDEX_PATH = os.path.join(REPO_ROOT, ".qhf_module_index.json")
+INDEX_VERSION = 1
+
+# Support files that live next to the habitats but are not selectable modules
+SKIPPED_FILES = {"__init__", "keyparams", "mcmodules"}
+
+# keyparams and mcmodules live next to the habitat files
+for _kind in MODULE_KINDS:
+    _d = os.path.join(REPO_ROOT, _kind)
+    if _d not in sys.path:
+        sys.path.append(_d)
+
+
+def _file_digest(path):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def _module_info(obj):
+    # Declared interface of a QHF module instance
+    return {
+        "name": str(getattr(obj, "name", "")),
+        "class": type(obj).__name__,
+        "input_parameters": [str(p) for p in getattr(obj, "input_parameters", [])],
+        "output_parameters": [str(p) for p in getattr(obj, "output_parameters", [])],
+    }
+
+
+def _is_qhf_module(obj):
+    return hasattr(obj, "execute") and hasattr(obj, "input_parameters") and hasattr(obj, "output_parameters")
+
+
+def _takes_no_arguments(obj):
+    try:
+        params = inspect.signature(obj).parameters.values()
+    except (TypeError, ValueError):
+        return False
+    return all(p.default is not p.empty or p.kind in (p.VAR_POSITIONAL, p.VAR_KEYWORD) for p in params)
+
+
+def _is_module_class(obj):
+    # Subclass of mcmodules.Module (already imported by the file that defines it)
+    base = getattr(sys.modules.get("mcmodules"), "Module", None)
+    return inspect.isclass(obj) and base is not None and issubclass(obj, base) and obj is not base
+
+
+def introspect_module(module, kind, factories=()):
+    # Describes the public classes/functions defined in an imported module file
+    # Subclasses of mcmodules.Module and the given factory names (e.g. a config's HabitatModule) are called
+    # without arguments to read their declared parameters. Other callables are recorded as "unchecked"
+    # without running them; Analyses callables are never called (calling them would plot).
+    entries = {}
+    for attr, obj in vars(module).items():
+        if attr.startswith("_") or getattr(obj, "__module__", None) != module.__name__:
+            continue
+        if not (inspect.isclass(obj) or inspect.isfunction(obj)):
+            continue
+        entry = {"type": "class" if inspect.isclass(obj) else "function"}
+        if kind == "Analyses":
+            pass
+        elif not (attr in factories or _is_module_class(obj)):
+            entry["unchecked"] = True
+        elif _takes_no_arguments(obj):
+            try:
+                instance = obj()
+            except Exception as e:
+                entry["error"] = f"{type(e).__name__}: {e}"
+            else:
+                if isinstance(instance, list) and instance and all(_is_qhf_module(m) for m in instance):
+                    entry["role"] = "habitat"
+                    entry["modules"] = [_module_info(m) for m in instance]
+                elif _is_qhf_module(instance):
+                    entry["role"] = "module"
+                    entry["module"] = _module_info(instance)
+        entries[attr] = entry
+    return entries
+
+
+class ModuleRegistry:
+    # Index of module files plus a per-process cache of imported files
+
+    def __init__(self, repo_root=REPO_ROOT, index_path=None):
+        self.repo_root = repo_root
+        self.index_path = index_path or os.path.join(repo_root, os.path.basename(INDEX_PATH))
+        self.index = {"version": INDEX_VERSION, "files": {}}
+        self._loaded = {}
+        # Index records changed (or deleted) by this process since the last save
+        self._dirty = set()
+        self._removed = set()
+        self._load_index()
+
+    # ---------- index persistence ----------
+
+    def _read_index(self):
+        try:
+            with open(self.index_path, "r") as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return index if index.get("version") == INDEX_VERSION else None
+
+    def _load_index(self):
+        self.index = self._read_index() or self.index
+
+    @contextlib.contextmanager
+    def _locked(self):
+        # Exclusive lock shared by every process writing this index (a no-op without fcntl)
+        if fcntl is None:
+            yield
+            return
+        with open(self.index_path + ".lock", "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _merge(self, files):
+        # Applies this process's changes to the records of the index on disk
+        for rel in self._removed:
+            files.pop(rel, None)
+        for rel in self._dirty:
+            ours = self.index["files"].get(rel)
+            if ours is None:
+                continue
+            theirs = files.get(rel)
+            if theirs and theirs.get("sha256") == ours["sha256"] and theirs.get("profile"):
+                # Same file content: keep the profiles other processes measured
+                ours["profile"] = dict(theirs["profile"], **ours.get("profile", {}))
+            files[rel] = ours
+        return files
+
+    def _save_index(self):
+        tmp = None
+        try:
+            with self._locked():
+                on_disk = self._read_index()
+                files = self._merge(on_disk["files"] if on_disk else dict(self.index["files"]))
+                self.index = {"version": INDEX_VERSION, "files": files}
+                fd, tmp = tempfile.mkstemp(dir=os.path.dirname(self.index_path) or ".",
+                                           prefix=os.path.basename(self.index_path) + ".", suffix=".tmp")
+                with os.fdopen(fd, "w") as f:
+                    json.dump(self.index, f, indent=1, sort_keys=True)
+                os.replace(tmp, self.index_path)
+                tmp = None
+            self._dirty.clear()
+            self._removed.clear()
+        except OSError as e:
+            print(f"[Warning] Could not write module index: {e}")
+        finally:
+            if tmp is not None and os.path.exists(tmp):
+                os.remove(tmp)
+
+    # ---------- loading ----------
+
+    def path_for(self, kind, file_name):
+        return os.path.join(self.repo_root, kind, os.path.splitext(file_name)[0] + ".py")
+
+    def load(self, module_path, module_name=None):
+        # Imports a module file once per process; re-imports only if the file changed on disk
+        path = os.path.abspath(module_path)
+        stat = os.stat(path)
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        cached = self._loaded.get(path)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+        name = module_name or os.path.splitext(os.path.basename(path))[0]
+        spec = importlib.util.spec_from_file_location(name, path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        self._loaded[path] = (stamp, module)
+        return module
+
+    # ---------- scanning ----------
+
+    def scan(self, kinds=MODULE_KINDS, force=False):
+        # Brings the index up to date; returns the list of files that had to be (re)introspected
+        changed = []
+        seen = set()
+        dirty = False
+        for kind in kinds:
+            folder = os.path.join(self.repo_root, kind)
+            if not os.path.isdir(folder):
+                continue
+            for f in sorted(os.listdir(folder)):
+                stem, ext = os.path.splitext(f)
+                if ext != ".py" or stem in SKIPPED_FILES:
+                    continue
+                rel = f"{kind}/{f}"
+                seen.add(rel)
+                status = self._refresh_file(kind, rel, os.path.join(folder, f), force)
+                if status == "introspected":
+                    changed.append(rel)
+                if status is not None:
+                    self._dirty.add(rel)
+                dirty = dirty or status is not None
+        # Forget deleted files of the scanned kinds
+        for rel in list(self.index["files"]):
+            if rel.split("/")[0] in kinds and rel not in seen:
+                del self.index["files"][rel]
+                self._removed.add(rel)
+                changed.append(rel)
+        if changed or dirty:
+            self._save_index()
+        return changed
+
+    def refresh(self, kind, file_name, factories=()):
+        # Brings the record of one file up to date, calling the given factory names if they were never
+        # checked; the rest of the index is left as saved. Returns the status of _refresh_file
+        rel = f"{kind}/{os.path.splitext(file_name)[0]}.py"
+        path = self.path_for(kind, file_name)
+        if not os.path.isfile(path):
+            if self.index["files"].pop(rel, None) is None:
+                return None
+            self._removed.add(rel)
+            self._save_index()
+            return "removed"
+        status = self._refresh_file(kind, rel, path, False, factories)
+        if status is not None:
+            self._dirty.add(rel)
+            self._save_index()
+        return status
+
+    def _refresh_file(self, kind, rel, path, force, factories=()):
+        # Returns None (up to date), "touched" (same content, new mtime) or "introspected"
+        stat = os.stat(path)
+        record = self.index["files"].get(rel)
+        # Factories recorded without being called are checked now
+        unchecked = record is not None and any(record["entries"].get(n, {}).get("unchecked") for n in factories)
+        if not force and not unchecked and record and record["mtime_ns"] == stat.st_mtime_ns \
+                and record["size"] == stat.st_size:
+            return None
+        digest = _file_digest(path)
+        if not force and not unchecked and record and record["sha256"] == digest:
+            # Touched but unchanged: keep the metadata
+            record["mtime_ns"], record["size"] = stat.st_mtime_ns, stat.st_size
+            return "touched"
+        # Factory names checked before stay checked
+        factories = set(factories) | {n for n, e in (record or {}).get("entries", {}).items()
+                                      if not e.get("unchecked")}
+        record = {"kind": kind, "mtime_ns": stat.st_mtime_ns, "size": stat.st_size, "sha256": digest,
+                  "entries": {}, "error": None}
+        try:
+            module = self.load(path)
+            record["entries"] = introspect_module(module, kind, factories)
+        except Exception as e:
+            record["error"] = f"{type(e).__name__}: {e}"
+        self.index["files"][rel] = record
+        return "introspected"
+
+    # ---------- queries ----------
+
+    def files(self, kind):
+        # File names (without .py) of one kind, sorted
+        return sorted(os.path.splitext(rel.split("/", 1)[1])[0]
+                      for rel in self.index["files"] if rel.startswith(kind + "/"))
+
+    def record(self, kind, file_name):
+        return self.index["files"].get(f"{kind}/{os.path.splitext(file_name)[0]}.py")
+
+    def names(self, kind, file_name, role=None):
+        # Public class/function names defined in a file, optionally only those with a given role
+        # (unchecked callables may have any role, so they are listed as candidates)
+        record = self.record(kind, file_name)
+        if not record:
+            return []
+        return sorted(n for n, e in record["entries"].items()
+                      if role is None or e.get("role") == role or e.get("unchecked"))
+
+    def entry(self, kind, file_name, name):
+        record = self.record(kind, file_name)
+        return record["entries"].get(name) if record else None
+
+    def has_name(self, kind, file_name, name):
+        return self.entry(kind, file_name, name) is not None
+
+    # ---------- profiling data ----------
+
+    def _rel_path_of(self, module):
+        # Index key of the file defining a module instance's class (None for wrappers/unknown files)
+        code = getattr(getattr(type(module), "execute", None), "__code__", None)
+        if code is None:
+            return None
+        rel = os.path.relpath(os.path.abspath(code.co_filename), self.repo_root).replace(os.sep, "/")
+        return rel if rel in self.index["files"] else None
+
+    def record_profiles(self, Modules, timings):
+        # Stores measured seconds per execute() call; timings maps module index -> (seconds, calls)
+        # Profiles live in the file's record, so they are dropped automatically when the file changes
+        updated = False
+        for m, (seconds, calls) in timings.items():
+            rel = self._rel_path_of(Modules[m])
+            if rel is None or calls <= 0:
+                continue
+            profile = self.index["files"][rel].setdefault("profile", {})
+            profile[" ".join(str(Modules[m].name).split())] = seconds / calls
+            self._dirty.add(rel)
+            updated = True
+        if updated:
+            self._save_index()
+        return updated
+
+    def module_cost(self, kind, file_name, module_name):
+        # Stored seconds per call for a module, or None if it was never profiled
+        record = self.record(kind, file_name)
+        if not record:
+            return None
+        return record.get("profile", {}).get(" ".join(str(module_name).split()))
+
+
+_registry = None
+
+
+def get_registry():
+    # Shared registry for this process; call scan() before querying the index
+    global _registry
+    if _registry is None:
+        _registry = ModuleRegistry()
+    return _registry
@@ -0,0 +1,138 @@
+# Typed parameter schema and structured-array store for batches of samples
+# The schema lists every parameter named in the modules' input_parameters/output_parameters. Modules can
+# describe their parameters with an optional class attribute; anything undeclared is a float64 without units:
+#
+#   parameter_schema = {
+#       'Temperature': {'dtype': 'f8', 'units': 'K', 'default': float('nan')},
+#       'Habitable':   {'dtype': '?', 'default': False},
+#   }
+#
+# A ParameterStore holds one NumPy record array per batch (one field per parameter), so batch modules read
+# and write typed columns, and a whole batch can be copied (snapshot) or saved with its dtype in one go.
+
+from collections import namedtuple
+
+import numpy as np
+
+Parameter = namedtuple('Parameter', ['name', 'dtype', 'units', 'default'])
+
+DEFAULT_DTYPE = np.dtype('f8')
+
+
+def _declared(module):
+    return getattr(module, 'parameter_schema', None) or {}
+
+
+def _default_for(dtype):
+    if dtype.kind == 'f':
+        return np.nan
+    if dtype.kind == 'O':
+        return None
+    return np.zeros((), dtype=dtype).item()
+
+
+def build_schema(Modules, order=None):
+    # Returns ({name: Parameter}, [conflict messages]); the producer's declaration wins over consumers'
+    order = range(len(Modules)) if order is None else order
+    declarations = {}
+    for m in order:
+        module = Modules[m]
+        declared = _declared(module)
+        for p in list(module.output_parameters) + list(module.input_parameters):
+            if p in declared:
+                produced = p in module.output_parameters
+                declarations.setdefault(p, []).append((produced, ' '.join(str(module.name).split()), declared[p]))
+            else:
+                declarations.setdefault(p, [])
+
+    schema = {}
+    conflicts = []
+    for p, found in declarations.items():
+        # Producers first, then consumers, each in execution order
+        found = sorted(found, key=lambda d: not d[0])
+        spec = dict(found[0][2]) if found else {}
+        dtype = np.dtype(spec.get('dtype', DEFAULT_DTYPE))
+        units = str(spec.get('units', ''))
+        default = spec.get('default', _default_for(dtype))
+        for _, name, other in found[1:]:
+            if 'units' in other and units and str(other['units']) != units:
+                conflicts.append(f"'{p}': {found[0][1]} uses {units}, {name} expects {other['units']}")
+            if 'dtype' in other and np.dtype(other['dtype']) != dtype:
+                conflicts.append(f"'{p}': {found[0][1]} declares {dtype}, {name} expects {np.dtype(other['dtype'])}")
+        schema[p] = Parameter(p, dtype, units, default)
+    return schema, conflicts
+
+
+class ParameterStore:
+    # One structured array of n samples per batch, laid out from the schema
+
+    def __init__(self, schema, n):
+        self.schema = dict(schema)
+        self.n = int(n)
+        self.data = self._allocate(self.schema, self.n)
+        self.written = set()
+
+    @staticmethod
+    def _allocate(schema, n):
+        data = np.empty(n, dtype=[(p.name, p.dtype) for p in schema.values()])
+        for p in schema.values():
+            data[p.name] = p.default
+        return data
+
+    def __contains__(self, name):
+        return name in self.written
+
+    def column(self, name):
+        # Typed view of one parameter over the batch (no copy)
+        return self.data[name]
+
+    def columns(self, names=None):
+        names = self.written if names is None else [p for p in names if p in self.written]
+        return {p: self.data[p] for p in names}
+
+    def _promote(self, name):
+        # A value did not fit the declared dtype: keep this field as Python objects from now on
+        print(f"[Parameters] '{name}' is not a {self.schema[name].dtype}; storing it as objects")
+        old = self.data
+        self.schema[name] = self.schema[name]._replace(dtype=np.dtype('O'), default=None)
+        self.data = self._allocate(self.schema, self.n)
+        for p in old.dtype.names:
+            self.data[p] = old[p] if p != name else old[p].astype(object)
+
+    def set_column(self, name, values):
+        if name not in self.schema:
+            self.schema[name] = Parameter(name, DEFAULT_DTYPE, '', np.nan)
+            old = self.data
+            self.data = self._allocate(self.schema, self.n)
+            for p in old.dtype.names:
+                self.data[p] = old[p]
+        try:
+            self.data[name] = values
+        except (TypeError, ValueError):
+            self._promote(name)
+            self.data[name] = np.fromiter(values, dtype=object, count=self.n)
+        self.written.add(name)
+
+    def set_value(self, i, name, value):
+        try:
+            self.data[name][i] = value
+        except (TypeError, ValueError):
+            self._promote(name)
+            self.data[name][i] = value
+        self.written.add(name)
+
+    def snapshot(self):
+        return self.data.copy()
+
+    def units(self):
+        return {p.name: p.units for p in self.schema.values() if p.units}
+
+    def save(self, path):
+        # Typed serialization; object fields need pickling
+        np.save(path, self.data, allow_pickle=self.data.dtype.hasobject)
+        return path
+
+
+def load_store(path):
+    # Reads a saved batch back as a structured array
+    return np.load(path, allow_pickle=True)
@@ -0,0 +1,140 @@
+# Static pre-flight check of a Habitat + Metabolism pairing, using module registry metadata only
+# Reports unsatisfied inputs, parameters with several producers, dependency cycles and modules that would
+# never run, and estimates the per-sample cost from profiling data stored by earlier runs.
+# Only the three files named in the settings are refreshed (the configured factories are called once to read
+# their parameters); nothing is sampled, and every other file keeps its saved index record.
+
+import networkx as nx
+
+from modules.module_registry import get_registry
+
+
+def _label(name):
+    return " ".join(str(name).split())
+
+
+def preflight(settings, registry=None):
+    # settings needs HabitatFile/HabitatModule/MetabolismFile/MetabolismModule/VisualizationFile/VisualizationModule;
+    # NumProbes/Niterations are used for the total cost estimate when present
+    registry = registry or get_registry()
+    for kind, file_key, name_key in (("Habitats", "HabitatFile", "HabitatModule"),
+                                     ("Metabolisms", "MetabolismFile", "MetabolismModule"),
+                                     ("Analyses", "VisualizationFile", "VisualizationModule")):
+        if settings.get(file_key):
+            registry.refresh(kind, settings[file_key], factories=(settings.get(name_key, ""),))
+    report = {"errors": [], "warnings": [], "modules": [], "order": [],
+              "cost_per_sample": None, "unprofiled": [], "total_samples": None}
+
+    # ---------- entries ----------
+    def _entry(kind, file_key, name_key, role):
+        file_name, name = settings.get(file_key, ""), settings.get(name_key, "")
+        record = registry.record(kind, file_name)
+        if record is None:
+            report["errors"].append(f"{kind}/{file_name}.py not found")
+            return None
+        if record["error"]:
+            report["errors"].append(f"{kind}/{file_name}.py cannot be imported: {record['error']}")
+            return None
+        entry = record["entries"].get(name)
+        if entry is None:
+            found = ", ".join(sorted(record["entries"])) or "none"
+            report["errors"].append(f"'{name}' is not defined in {kind}/{file_name}.py (found: {found})")
+            return None
+        if role and entry.get("role") != role:
+            detail = entry.get("error") or f"it does not build a {'module list' if role == 'habitat' else 'QHF module'}"
+            report["errors"].append(f"{kind}/{file_name}.py:{name} is unusable: {detail}")
+            return None
+        return entry
+
+    habitat = _entry("Habitats", "HabitatFile", "HabitatModule", "habitat")
+    metabolism = _entry("Metabolisms", "MetabolismFile", "MetabolismModule", "module")
+    _entry("Analyses", "VisualizationFile", "VisualizationModule", None)
+    if habitat is None or metabolism is None:
+        return report
+
+    modules = [dict(m, kind="Habitats", file=settings["HabitatFile"]) for m in habitat["modules"]]
+    modules.append(dict(metabolism["module"], kind="Metabolisms", file=settings["MetabolismFile"]))
+    report["modules"] = modules
+
+    # ---------- producers ----------
+    producers = {}
+    for i, m in enumerate(modules):
+        for p in m["output_parameters"]:
+            producers.setdefault(p, []).append(i)
+    for p, idx in sorted(producers.items()):
+        if len(idx) > 1:
+            names = ", ".join(_label(modules[i]["name"]) for i in idx)
+            report["warnings"].append(f"'{p}' is produced by several modules ({names}); consumers depend on all of them")
+
+    # ---------- dependency graph ----------
+    DG = nx.DiGraph()
+    DG.add_nodes_from(range(len(modules)))
+    for j, m in enumerate(modules):
+        for p in m["input_parameters"]:
+            if p not in producers:
+                report["errors"].append(f"{_label(m['name'])} needs '{p}', which no module produces")
+            for i in producers.get(p, []):
+                DG.add_edge(i, j)
+
+    if not nx.is_directed_acyclic_graph(DG):
+        cycle = nx.find_cycle(DG)
+        path = " -> ".join(_label(modules[a]["name"]) for a, _ in cycle) + " -> " + _label(modules[cycle[0][0]]["name"])
+        report["errors"].append(f"Dependency cycle: {path}")
+    else:
+        report["order"] = list(nx.topological_sort(DG))
+
+    for i in range(len(modules)):
+        if DG.degree(i) == 0:
+            report["warnings"].append(f"{_label(modules[i]['name'])} is not connected to any other module and will not run")
+
+    if not any("Suitability" in m["output_parameters"] for m in modules):
+        report["warnings"].append("No module produces 'Suitability'; the temperature-based proxy will be used")
+
+    # ---------- cost estimate ----------
+    cost = 0.0
+    for i in range(len(modules)):
+        if DG.degree(i) == 0:
+            continue
+        m = modules[i]
+        seconds = registry.module_cost(m["kind"], m["file"], m["name"])
+        if seconds is None:
+            report["unprofiled"].append(_label(m["name"]))
+        else:
+            cost += seconds
+    if not report["unprofiled"]:
+        report["cost_per_sample"] = cost
+    if settings.get("NumProbes") and settings.get("Niterations"):
+        report["total_samples"] = int(float(settings["NumProbes"])) * int(settings["Niterations"])
+
+    return report
+
+
+def format_seconds(seconds):
+    if seconds < 1e-3:
+        return f"{seconds * 1e6:.1f} µs"
+    if seconds < 1:
+        return f"{seconds * 1e3:.1f} ms"
+    if seconds < 120:
+        return f"{seconds:.1f} s"
+    if seconds < 7200:
+        return f"{seconds / 60:.1f} min"
+    return f"{seconds / 3600:.1f} h"
+
+
+def print_preflight(report):
+    print("[Pre-flight check]")
+    for e in report["errors"]:
+        print(f"  ❌ {e}")
+    for w in report["warnings"]:
+        print(f"  ⚠️  {w}")
+    if report["order"]:
+        print("  Execution order: " + " -> ".join(_label(report["modules"][i]["name"]) for i in report["order"]))
+    if report["cost_per_sample"] is not None:
+        line = f"  Estimated cost: {format_seconds(report['cost_per_sample'])} per sample"
+        if report["total_samples"]:
+            line += f", ~{format_seconds(report['cost_per_sample'] * report['total_samples'])} for {report['total_samples']} samples"
+        print(line)
+    elif report["unprofiled"]:
+        print("  No profiling data yet for: " + ", ".join(report["unprofiled"]))
+    if not report["errors"]:
+        print("  ✅ Pairing is compatible")
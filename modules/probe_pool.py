@@ -0,0 +1,163 @@
+# Runs the probes of one config on a process pool, with results written straight into shared memory
+# The parent allocates one multiprocessing.shared_memory block holding every sample column (one row block
+# of N_iter samples per probe) plus per-probe Suitability sums and Variable. Workers attach to it by name,
+# run their probe range with run_monte_carlo writing each probe's columns straight into the block, so only small
+# status dicts travel back through pickling.
+# The distribution arrays, Suitability_Plot and Variable returned to QHF.py are views of that block.
+
+import os
+import time
+import contextlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+
+import numpy as np
+
+import keyparams
+from modules.sample_collector import COLLECTED_PARAMETERS, SampleCollector
+from modules.qhf_engine import DISTRIBUTION_COLUMNS, load_modules, build_graph, prepare_sampling, run_monte_carlo
+
+# Per-probe rows stored after the sample columns
+PROBE_ROWS = ("SuitabilitySum", "SuitabilityCount", "Variable")
+
+# Loaded once per worker process by _init_worker
+_worker = {}
+
+
+def _layout(buffer, NumProbes, N_iter):
+    # Views of the shared block: (parameters x samples) columns and (PROBE_ROWS x probes) summaries
+    n_samples = NumProbes * N_iter
+    columns = np.ndarray((len(COLLECTED_PARAMETERS), n_samples), dtype=float, buffer=buffer)
+    probes = np.ndarray((len(PROBE_ROWS), NumProbes), dtype=float, buffer=buffer, offset=columns.nbytes)
+    return columns, probes
+
+
+def _init_worker(settings, shm_name, NumProbes, N_iter, surrogate):
+    with open(os.devnull, "w") as sink, contextlib.redirect_stdout(sink):
+        Modules, _ = load_modules(settings)
+        _, _, _, topsorted = build_graph(Modules, verbose=False)
+        Modules, topsorted = prepare_sampling(Modules, topsorted, settings, verbose=False, surrogate=surrogate)
+    # Forked workers inherit the parent's generator state; draw independent streams instead
+    np.random.seed()
+    shm = shared_memory.SharedMemory(name=shm_name)
+    _worker.update(Modules=Modules, topsorted=topsorted, shm=shm, N_iter=N_iter,
+                   saved_parameters=settings.get("SavedParameters"),
+                   views=_layout(shm.buf, NumProbes, N_iter))
+
+
+def _run_probes(first_probe, count, profile):
+    # Worker entry point: samples probes [first_probe, first_probe + count) into the shared block
+    N_iter = _worker["N_iter"]
+    columns, probes = _worker["views"]
+    timings = {} if profile else None
+    rows = slice(first_probe * N_iter, (first_probe + count) * N_iter)
+    # Column i of the block holds COLLECTED_PARAMETERS[i], the order of DISTRIBUTION_COLUMNS
+    out = {key: columns[i, rows] for i, (key, _) in enumerate(DISTRIBUTION_COLUMNS)}
+    with open(os.devnull, "w") as sink, contextlib.redirect_stdout(sink):
+        results = run_monte_carlo(_worker["Modules"], _worker["topsorted"], count, N_iter, verbose=False,
+                                  profile=timings, first_probe=first_probe,
+                                  saved_parameters=_worker["saved_parameters"], out=out)
+
+    suitability = columns[0, rows].reshape(count, N_iter)
+    probes[0, first_probe:first_probe + count] = suitability.sum(axis=1)
+    probes[1, first_probe:first_probe + count] = N_iter
+    for k, value in enumerate(results["Variable"]):
+        try:
+            probes[2, first_probe + k] = float(value)
+        except (TypeError, ValueError):
+            probes[2, first_probe + k] = np.nan
+
+    collector = results["Collector"]
+    return {
+        "first_probe": first_probe,
+        "count": count,
+        "runid": results["runid"],
+        "invalid_counts": collector.invalid_counts,
+        "proxy_count": collector.proxy_count,
+        "timings": timings or {},
+        # Per-probe snapshots are a few numbers per probe, cheap enough to pickle
+        "snapshots": results["SavedParameters"],
+    }
+
+
+def run_probe_pool(settings, NumProbes, N_iter, workers, probes_per_task=None, progress=None,
+                   should_stop=None, profile=None, saved_parameters=None, surrogate=None):
+    # Same result dict as run_monte_carlo(); arrays are views of shared memory that outlive the pool
+    # surrogate (surrogate_spec of the parent's sampling modules) makes every worker use the parent's fit
+    settings = dict(settings, SavedParameters=saved_parameters or settings.get("SavedParameters"))
+    NumProbes, N_iter = int(NumProbes), int(N_iter)
+    probes_per_task = probes_per_task or max(1, NumProbes // (workers * 4))
+    nbytes = (len(COLLECTED_PARAMETERS) * NumProbes * N_iter + len(PROBE_ROWS) * NumProbes) * 8
+    shm = shared_memory.SharedMemory(create=True, size=max(nbytes, 1))
+    columns, probes = _layout(shm.buf, NumProbes, N_iter)
+    columns[:] = np.nan
+    probes[:] = np.nan
+
+    Collector = SampleCollector()
+    done = np.zeros(NumProbes, dtype=bool)
+    runid = ""
+    snapshots = None
+    cancelled = False
+    start = time.perf_counter()
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(settings, shm.name, NumProbes, N_iter, surrogate)) as pool:
+            futures = [pool.submit(_run_probes, s, min(probes_per_task, NumProbes - s),
+                                   profile is not None and s == 0)
+                       for s in range(0, NumProbes, probes_per_task)]
+            for future in as_completed(futures):
+                status = future.result()
+                done[status["first_probe"]:status["first_probe"] + status["count"]] = True
+                runid = status["runid"] or runid
+                if snapshots is None:
+                    snapshots = np.full(NumProbes, np.nan, dtype=status["snapshots"].dtype)
+                snapshots[status["first_probe"]:status["first_probe"] + status["count"]] = status["snapshots"]
+                for p, n in status["invalid_counts"].items():
+                    Collector.invalid_counts[p] += n
+                Collector.proxy_count += status["proxy_count"]
+                Collector.samples += status["count"] * N_iter
+                if profile is not None:
+                    for m, (seconds, calls) in status["timings"].items():
+                        total, n = profile.get(m, (0.0, 0))
+                        profile[m] = (total + seconds, calls + n)
+                if progress is not None:
+                    finished = int(done.sum())
+                    elapsed = time.perf_counter() - start
+                    progress({
+                        "probes_done": finished,
+                        "probes_total": NumProbes,
+                        "samples": finished * N_iter,
+                        "samples_per_sec": finished * N_iter / elapsed if elapsed > 0 else 0.0,
+                        "eta_sec": elapsed / finished * (NumProbes - finished),
+                        "suitability": float(probes[0][done].sum() / probes[1][done].sum()),
+                    })
+                if should_stop is not None and should_stop():
+                    cancelled = True
+                    for f in futures:
+                        f.cancel()
+                    break
+    finally:
+        # The mapping stays valid while the views exist; unlinking now means nothing leaks on exit
+        shm.unlink()
+
+    if cancelled:
+        # Partial runs keep the completed probes only (this is the one place results are copied)
+        kept = np.flatnonzero(done)
+        columns = columns[:, np.repeat(done, N_iter)]
+        probes = probes[:, kept]
+        snapshots = snapshots[kept] if snapshots is not None else None
+
+    keyparams.runid = runid
+    with np.errstate(invalid="ignore", divide="ignore"):
+        suitability_plot = np.cumsum(probes[0]) / np.cumsum(probes[1])
+    results = {key: columns[i] for i, (key, _) in enumerate(DISTRIBUTION_COLUMNS)}
+    results.update({
+        "SavedParameters": snapshots if snapshots is not None else np.empty(0, dtype=[("Probe", "f8")]),
+        "Suitability_Plot": suitability_plot,
+        "Variable": probes[2],
+        "runid": runid,
+        "Collector": Collector,
+        "cancelled": cancelled,
+        "shared_memory": shm,
+    })
+    return results
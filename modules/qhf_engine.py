@@ -0,0 +1,394 @@
+# Reusable pieces of the QHF run: config parsing, module loading, graph building and Monte Carlo sampling
+# QHF.py drives a single interactive run with these; qhf_batch.py reuses them to run many configs per process
+
+import os
+import re
+import sys
+import time
+import importlib.util
+
+import numpy as np
+import networkx as nx
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HABITATS_DIR = os.path.join(REPO_ROOT, "Habitats")
+METABOLISMS_DIR = os.path.join(REPO_ROOT, "Metabolisms")
+ANALYSES_DIR = os.path.join(REPO_ROOT, "Analyses")
+CONFIGS_DIR = os.path.join(REPO_ROOT, "Configs")
+
+# keyparams and mcmodules live next to the habitat files
+for _d in [HABITATS_DIR, METABOLISMS_DIR, ANALYSES_DIR]:
+    if _d not in sys.path:
+        sys.path.append(_d)
+
+import keyparams
+from modules.sample_collector import SampleCollector, ProbeSnapshots, coerce_column
+from modules.surrogate import apply_surrogate, substitute_surrogate
+from modules.module_cache import IncrementalRun, read_cache_options
+from modules.module_registry import get_registry
+from modules.diagnostics import diagnose
+from modules.memory_budget import SpilledDistributions
+from modules.config_templates import load_config
+
+MAX_PROBES = 1e8
+RESULTS_DIR = os.path.join(REPO_ROOT, "Results")
+
+# How often (in samples) a long probe checks for cancellation
+STOP_CHECK_INTERVAL = 1000
+
+# Number of samples at the start of a run whose module calls are timed for the cost estimates
+PROFILE_SAMPLES = 200
+
+# Result distributions and the collected parameter each one holds
+DISTRIBUTION_COLUMNS = [
+    ('Suitability_Distribution', 'Suitability'),
+    ('Temperature_Distribution', 'Temperature'),
+    ('BondAlbedo_Distribution', 'Bond_Albedo'),
+    ('GreenHouse_Distribution', 'GreenhouseWarming'),
+    ('Pressure_Distribution', 'Pressure'),
+    ('Depth_Distribution', 'Depth'),
+]
+
+
+# ======================================
+# Configuration
+# ======================================
+
+def read_run_config(config_file_path, overrides=None):
+    # Reads a .cfg file (with its Extends bases) into a flat dict of run settings
+    # overrides ({section: {key: value}}) pick one job of a template, see config_templates.expand_config
+    config = load_config(config_file_path, overrides, [CONFIGS_DIR])
+
+    NumProbes = config['Sampling']['NumProbes']
+    if float(NumProbes) > MAX_PROBES:
+        print('### Warning: Number of Probes limited -- change QHF code if you need more probes.')
+
+    return {
+        'ConfigPath': config_file_path,
+        'ConfigID': config['Configuration']['ConfigID'],
+        'HabitatFile': config['Habitat']['HabitatFile'],
+        'HabitatModule': config['Habitat']['HabitatModule'],
+        'HabitatLogo': os.path.join(REPO_ROOT, config['Habitat']['HabitatLogo']),
+        'HabitatShortName': config['Habitat']['HabitatShortname'],
+        'MetabolismFile': os.path.splitext(config['Metabolism']['MetabolismFile'])[0],
+        'MetabolismModule': config['Metabolism']['MetabolismModule'],
+        'VisualizationFile': os.path.splitext(config['Visualization']['VisualizationFile'])[0],
+        'VisualizationModule': config['Visualization']['VisualizationModule'],
+        'NumProbes': np.clip(float(NumProbes), 1, MAX_PROBES),
+        'RequestedProbes': float(NumProbes),
+        'Niterations': int(config['Sampling']['Niterations']),
+        'SavedParameters': [p.strip() for p in config['Sampling'].get('SavedParameters', '').split(',') if p.strip()],
+        'Surrogate': dict(config['Surrogate']) if config.has_section('Surrogate') else {},
+        'Cache': dict(config['Cache']) if config.has_section('Cache') else {},
+        'Resources': dict(config['Resources']) if config.has_section('Resources') else {},
+        'Execution': dict(config['Execution']) if config.has_section('Execution') else {},
+        'Importance': dict(config['Importance']) if config.has_section('Importance') else {},
+        'Diagnostics': dict(config['Diagnostics']) if config.has_section('Diagnostics') else {},
+    }
+
+
+# ======================================
+# Module Loading
+# ======================================
+
+def dynamic_import(module_path, module_name):
+    spec = importlib.util.spec_from_file_location(module_name, module_path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def load_module_file(module_path, module_name):
+    # Executes a module file once per process (again only if it changed on disk), via the module registry
+    return get_registry().load(module_path, module_name)
+
+
+def load_modules(settings):
+    # Instantiates the habitat chain plus the metabolism module; returns (Modules, visualization callable)
+    habitat_path = os.path.join(HABITATS_DIR, settings['HabitatFile'] + ".py")
+    habitat_module = load_module_file(habitat_path, settings['HabitatModule'])
+    Modules = getattr(habitat_module, settings['HabitatModule'])()
+
+    metabolism_path = os.path.join(METABOLISMS_DIR, settings['MetabolismFile'] + ".py")
+    metabolism_module = load_module_file(metabolism_path, settings['MetabolismModule'])
+    Modules.append(getattr(metabolism_module, settings['MetabolismModule'])())
+
+    visual_path = os.path.join(ANALYSES_DIR, settings['VisualizationFile'] + ".py")
+    visual_module = load_module_file(visual_path, settings['VisualizationModule'])
+    VisualizationModule = getattr(visual_module, settings['VisualizationModule'])
+
+    return Modules, VisualizationModule
+
+
+# ======================================
+# Graph Building
+# ======================================
+
+def build_graph(Modules, verbose=True):
+    # Connects every input parameter to the modules producing it
+    # Returns (edges, edge_labels, mod_labels, topsorted)
+    edges = []
+    edge_labels = {}
+    mod_labels = {}
+    nmods = len(Modules)
+
+    for jj in np.arange(nmods):
+        mod_labels[int(jj)] = Modules[jj].name
+        if verbose:
+            print('--------------------------------------------------------------------------------')
+            print('Identifying input connections for module ', Modules[jj].name)
+
+        for ip in Modules[jj].input_parameters:
+            if verbose:
+                print('......................................................................')
+                print('Scanning for output parameters matching the input parameter:', ip)
+
+            for module_scanned in np.arange(nmods):
+                if any(x == ip for x in Modules[module_scanned].output_parameters):
+                    if verbose:
+                        print(' + Input/output Match found in module: ', Modules[module_scanned].name)
+                    edges.append([module_scanned, jj])
+                    edge_labels[(module_scanned, jj)] = ip.replace('_', ' ')
+
+    DG = nx.DiGraph()
+    DG.add_edges_from(edges)
+    topsorted = list(nx.topological_sort(DG))
+
+    return edges, edge_labels, mod_labels, topsorted
+
+
+def prepare_sampling(Modules, topsorted, settings, verbose=True, surrogate=None):
+    # Returns the modules and execution order to sample with, after optional surrogate substitution
+    # The original Modules/topsorted stay untouched for the connection graph plot
+    # surrogate (surrogate.surrogate_spec of the parent's modules) reuses that fit, or the parent's decision to
+    # keep the exact modules ({}), instead of fitting anew
+    if surrogate is not None:
+        SampleModules = substitute_surrogate(Modules, surrogate)
+    else:
+        SampleModules = apply_surrogate(Modules, topsorted, settings.get('Surrogate'), verbose=verbose)
+    if SampleModules is Modules:
+        return Modules, topsorted
+    _, _, _, sample_order = build_graph(SampleModules, verbose=False)
+    return SampleModules, sample_order
+
+
+def open_incremental_run(Modules, topsorted, settings, force=False, directory=None):
+    # Wraps the chain for incremental recomputation when [Cache] Incremental is on (or forced); else None
+    # directory replaces [Cache] Directory for a forced cache (qhf_batch's per-batch cache)
+    options = read_cache_options(settings.get('Cache'), REPO_ROOT)
+    if options['incremental']:
+        directory = options['directory']
+    elif not force:
+        return None
+    return IncrementalRun(Modules, topsorted, settings['NumProbes'], settings['Niterations'],
+                          directory or options['directory'])
+
+
+# ======================================
+# Monte Carlo Simulation
+# ======================================
+
+def run_monte_carlo(Modules, topsorted, NumProbes, N_iter, verbose=True, progress=None, should_stop=None,
+                    profile=None, executor=None, first_probe=0, saved_parameters=None, importance=None,
+                    streams=4, memory=None, out=None):
+    # Samples the sorted module chain N_iter times per probe and collects the results
+    # progress(dict) is called after every probe; should_stop() is polled to cancel early with partial results
+    # profile (dict) receives {module index: (seconds, calls)} measured over the first PROFILE_SAMPLES samples
+    # executor (LevelExecutor) runs each probe as one batch, level by level, instead of sample by sample
+    # first_probe offsets keyparams.ProbeIndex, so a probe range can be run on its own (distributed workers)
+    # saved_parameters selects the per-probe snapshot (default: every module output), see ProbeSnapshots
+    # importance (ImportanceSampler) replaces the prior modules by proposal draws; results['Weights'] then
+    # holds every sample's likelihood ratio and Suitability_Plot the weighted running mean
+    # streams is the number of segments each probe is split into for its error estimate (see diagnostics)
+    # memory (MemoryMonitor): near its limit, probes are collected in smaller batches and the distributions
+    # are streamed to disk; they are then returned as read-only memory-mapped arrays instead of lists
+    # out ({distribution key: float array of NumProbes * N_iter}) receives the samples in place, e.g. views of
+    # probe_pool's shared memory; the distributions are then returned as views of it instead of lists
+    results = {
+        'Suitability_Distribution': [],
+        'Temperature_Distribution': [],
+        'Pressure_Distribution': [],
+        'BondAlbedo_Distribution': [],
+        'GreenHouse_Distribution': [],
+        'Depth_Distribution': [],
+        'SavedParameters': [],
+        'Suitability_Plot': [],
+        'Variable': [],
+        'Weights': [],
+    }
+    order = topsorted if importance is None else importance.downstream
+    weighted_sum = weight_total = 0.0
+    suitability_sum = 0.0
+    written = 0
+    spilled = None
+    Collector = SampleCollector()
+    if not saved_parameters:
+        saved_parameters = [p for m in topsorted for p in Modules[m].output_parameters]
+    Snapshots = ProbeSnapshots(saved_parameters, NumProbes)
+    cancelled = False
+    start = time.perf_counter()
+    profiled = 0
+
+    for keyparams.ProbeIndex in np.arange(float(first_probe), float(first_probe) + float(NumProbes)):
+        if verbose:
+            print('Probing location ', keyparams.ProbeIndex)
+
+        # Batches already folded into arrays (memory pressure) and the number of samples they hold
+        chunks = []
+        folded = 0
+
+        if executor is not None:
+            if should_stop is not None and should_stop():
+                cancelled = True
+                break
+            remaining = int(N_iter)
+            while remaining:
+                # Near the memory limit the probe runs as several smaller batches
+                n = remaining if memory is None or not memory.pressure() else min(remaining, STOP_CHECK_INTERVAL)
+                store = executor.run_batch(n, profile=profile)
+                Collector.record_batch(store.columns(), n, keyparams)
+                Snapshots.record_batch(store.columns(), n, keyparams)
+                remaining -= n
+                if remaining:
+                    chunks.append(Collector.flush())
+                    Snapshots.fold()
+                del store
+
+        if importance is not None:
+            prior_values, probe_weights, _ = importance.draw(int(N_iter))
+
+        for ii in np.arange(N_iter if executor is None else 0):
+            if should_stop is not None and ii % STOP_CHECK_INTERVAL == 0 and should_stop():
+                cancelled = True
+                break
+            if memory is not None and ii and ii % STOP_CHECK_INTERVAL == 0 and memory.pressure():
+                # Near the memory limit: coerce what is buffered now instead of at the end of the probe
+                chunks.append(Collector.flush())
+                Snapshots.fold(None if importance is None else probe_weights[folded:ii])
+                folded = int(ii)
+            keyparams.runid = ''
+            if importance is not None:
+                importance.apply(prior_values[ii])
+            if profile is not None and profiled < PROFILE_SAMPLES:
+                for m in order:
+                    if verbose:
+                        print('Executing ', Modules[m].name)
+                    t0 = time.perf_counter()
+                    Modules[m].execute()
+                    seconds, calls = profile.get(m, (0.0, 0))
+                    profile[m] = (seconds + time.perf_counter() - t0, calls + 1)
+                profiled += 1
+            else:
+                for mi in np.arange(len(order)):
+                    if verbose:
+                        print('Executing ', Modules[order[mi]].name)
+                    Modules[order[mi]].execute()
+
+            # Raw values only; coercion and the Suitability fallback happen per batch below
+            Collector.record(keyparams)
+            Snapshots.record(keyparams)
+
+        # Validate the whole probe batch at once (possibly partial if cancelled)
+        batch = Collector.flush()
+        if chunks:
+            batch = {p: np.concatenate([c[p] for c in chunks] + [batch[p]]) for p in batch}
+        if cancelled and not len(batch['Suitability']):
+            break
+        weights = None if importance is None else probe_weights[:len(batch['Suitability'])]
+
+        if spilled is None and out is None and memory is not None and memory.pressure():
+            # Move what was collected so far to disk; later probes append there
+            spilled = SpilledDistributions(RESULTS_DIR)
+            for key, _ in DISTRIBUTION_COLUMNS + [('Weights', None)]:
+                spilled.append(key, results[key])
+                results[key] = []
+            if verbose:
+                print('[Memory] Near MaxMemoryMB -- streaming the distributions to', spilled.directory)
+        for key, p in DISTRIBUTION_COLUMNS:
+            if out is not None:
+                out[key][written:written + len(batch[p])] = batch[p]
+            elif spilled is not None:
+                spilled.append(key, batch[p])
+            else:
+                results[key].extend(batch[p].tolist())
+        written += len(batch['Suitability'])
+        suitability_sum += float(np.sum(batch['Suitability']))
+        samples_done = int(Collector.samples)
+
+        if importance is not None:
+            if spilled is not None:
+                spilled.append('Weights', weights)
+            else:
+                results['Weights'].extend(weights.tolist())
+            finite = np.isfinite(batch['Suitability'])
+            weighted_sum += float(np.sum(weights[finite] * batch['Suitability'][finite]))
+            weight_total += float(np.sum(weights[finite]))
+            This_Suitability = weighted_sum / weight_total if weight_total > 0 else np.nan
+        else:
+            weights = None
+            This_Suitability = suitability_sum / samples_done if samples_done else np.nan
+        probe_check = diagnose(batch['Suitability'], weights, streams)
+        if verbose:
+            print('Monte Carlo loop completed')
+            print('Runid: ' + keyparams.runid)
+            print('Average Suitability %.2f' % This_Suitability)
+            print('Probe Suitability %.4g ± %.2g (ESS %.0f, R-hat %.3f)'
+                  % (probe_check['mean'][0], probe_check['se'][0], probe_check['ess'][0], probe_check['rhat'][0]))
+
+        results['Suitability_Plot'].append(This_Suitability)
+        results['Variable'].append(keyparams.Depth)
+        Snapshots.close_probe(keyparams.ProbeIndex, None if weights is None else weights[folded:])
+
+        if progress is not None:
+            elapsed = time.perf_counter() - start
+            probes_done = len(results['Suitability_Plot'])
+            samples = samples_done
+            progress({
+                'probes_done': probes_done,
+                'probes_total': int(NumProbes),
+                'samples': samples,
+                'samples_per_sec': samples / elapsed if elapsed > 0 else 0.0,
+                'eta_sec': elapsed / probes_done * (int(NumProbes) - probes_done),
+                'suitability': float(This_Suitability),
+                'probe_suitability_se': float(probe_check['se'][0]),
+            })
+        if cancelled:
+            break
+
+    if spilled is not None:
+        for key, _ in DISTRIBUTION_COLUMNS + [('Weights', None)]:
+            results[key] = spilled.load(key)
+        results['Spilled'] = spilled.directory
+    if out is not None:
+        for key, _ in DISTRIBUTION_COLUMNS:
+            results[key] = out[key][:written]
+    results['SavedParameters'] = Snapshots.result()
+    results['runid'] = keyparams.runid
+    results['Collector'] = Collector
+    results['cancelled'] = cancelled
+    return results
+
+
+def safe_filename(name):
+    # File name stem for a ConfigID; template jobs have IDs like 'Study [Mars, Cyanobacteria]'
+    return re.sub(r'[^\w.-]+', '_', str(name)).strip('_.') or 'run'
+
+
+def save_results(results, path):
+    # Writes the sample distributions and per-probe summaries to a compressed .npz file
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    np.savez_compressed(
+        path,
+        Suitability=np.asarray(results['Suitability_Distribution'], dtype=float),
+        Temperature=np.asarray(results['Temperature_Distribution'], dtype=float),
+        Bond_Albedo=np.asarray(results['BondAlbedo_Distribution'], dtype=float),
+        GreenhouseWarming=np.asarray(results['GreenHouse_Distribution'], dtype=float),
+        Pressure=np.asarray(results['Pressure_Distribution'], dtype=float),
+        Depth=np.asarray(results['Depth_Distribution'], dtype=float),
+        Suitability_Plot=np.asarray(results['Suitability_Plot'], dtype=float),
+        Variable=coerce_column(list(results['Variable']))[0],
+        SavedParameters=np.asarray(results['SavedParameters']),
+        Weights=np.asarray(results.get('Weights', []), dtype=float),
+        cancelled=bool(results.get('cancelled', False)),
+    )
+    return path
@@ -0,0 +1,145 @@
+# Starts QHF.py as a managed subprocess and streams its progress back to the launcher or GUI
+# The child prints one machine-readable event per line (EVENT_PREFIX + JSON) and listens on stdin for "cancel"
+
+import os
+import sys
+import json
+import queue
+import threading
+import subprocess
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+QHF_SCRIPT = os.path.join(REPO_ROOT, "QHF.py")
+
+EVENT_PREFIX = "@@QHF "
+CANCEL_COMMAND = "cancel"
+
+
+# ======================================
+# Child side (used by QHF.py)
+# ======================================
+
+def emit_event(kind, **fields):
+    # Writes one progress event to stdout; flushed so the parent sees it immediately
+    fields["event"] = kind
+    sys.stdout.write(EVENT_PREFIX + json.dumps(fields) + "\n")
+    sys.stdout.flush()
+
+
+def listen_for_cancel(stream=None):
+    # Watches stdin on a daemon thread; returns a threading.Event set when "cancel" arrives or stdin closes
+    stream = stream or sys.stdin
+    cancel_event = threading.Event()
+
+    def _watch():
+        try:
+            for line in stream:
+                if line.strip().lower() == CANCEL_COMMAND:
+                    break
+        except Exception:
+            pass
+        cancel_event.set()
+
+    threading.Thread(target=_watch, daemon=True).start()
+    return cancel_event
+
+
+# ======================================
+# Parent side
+# ======================================
+
+def parse_event(line):
+    # Returns the event dict for a protocol line, or None for ordinary output
+    if not line.startswith(EVENT_PREFIX):
+        return None
+    try:
+        return json.loads(line[len(EVENT_PREFIX):])
+    except ValueError:
+        return None
+
+
+def format_eta(seconds):
+    seconds = int(max(0, seconds or 0))
+    h, rem = divmod(seconds, 3600)
+    m, s = divmod(rem, 60)
+    return f"{h:d}:{m:02d}:{s:02d}" if h else f"{m:d}:{s:02d}"
+
+
+def format_progress_bar(event, width=30):
+    # One-line text progress bar for a "progress" event
+    total = max(1, event.get("probes_total", 1))
+    done = event.get("probes_done", 0)
+    filled = int(width * done / total)
+    return (f"[{'#' * filled}{'.' * (width - filled)}] {done}/{total} probes | "
+            f"{event.get('samples_per_sec', 0):.0f} samples/s | ETA {format_eta(event.get('eta_sec'))} | "
+            f"Suitability {event.get('suitability', float('nan')):.3f}")
+
+
+class QHFRun:
+    # A QHF.py child process with its events and output lines collected on a reader thread
+
+    def __init__(self, config_path, extra_args=None):
+        self.config_path = config_path
+        self.extra_args = list(extra_args or [])
+        self.process = None
+        self.messages = queue.Queue()
+        self.last_event = None
+        self.cancel_requested = False
+        self._reader = None
+
+    def start(self):
+        # Arguments are passed as a list, so config paths with spaces or quotes need no shell quoting
+        cmd = [sys.executable, "-u", QHF_SCRIPT, self.config_path, "--progress-events"] + self.extra_args
+        self.process = subprocess.Popen(
+            cmd, cwd=REPO_ROOT, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT, text=True, bufsize=1,
+        )
+        self._reader = threading.Thread(target=self._read_output, daemon=True)
+        self._reader.start()
+        return self
+
+    def _read_output(self):
+        # Keeps events and plain output in one queue so their order is preserved
+        for line in self.process.stdout:
+            event = parse_event(line)
+            if event is not None:
+                self.messages.put(("event", event))
+            else:
+                self.messages.put(("output", line.rstrip("\n")))
+        self.process.stdout.close()
+
+    def poll(self):
+        # Returns all ("event", dict) / ("output", str) messages received since the last call (never blocks)
+        messages = []
+        while True:
+            try:
+                messages.append(self.messages.get_nowait())
+            except queue.Empty:
+                break
+        for kind, payload in messages:
+            if kind == "event":
+                self.last_event = payload
+        return messages
+
+    def is_running(self):
+        # True until the child has exited and all of its output has been read
+        if self.process is None:
+            return False
+        return self.process.poll() is None or self._reader.is_alive()
+
+    def cancel(self):
+        # Asks the child to stop sampling; it writes a partial result before exiting
+        if not self.is_running() or self.cancel_requested:
+            return
+        self.cancel_requested = True
+        try:
+            self.process.stdin.write(CANCEL_COMMAND + "\n")
+            self.process.stdin.flush()
+        except (BrokenPipeError, OSError, ValueError):
+            pass
+
+    def wait(self, timeout=None):
+        code = self.process.wait(timeout=timeout)
+        if self._reader is not None:
+            self._reader.join(timeout=5)
+        return code
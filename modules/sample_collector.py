@@ -0,0 +1,155 @@
+# Collects raw per-sample outputs from keyparams and coerces them to float arrays in bulk
+# Used by QHF.py so each Monte Carlo batch is validated once with NumPy instead of per sample
+
+import numpy as np
+
+# Parameters handed to the Analyses module, in the order QHF.py passes them
+COLLECTED_PARAMETERS = [
+    "Suitability",
+    "Temperature",
+    "Bond_Albedo",
+    "GreenhouseWarming",
+    "Pressure",
+    "Depth",
+]
+
+# Initial number of snapshot rows; the array doubles when full
+SNAPSHOT_CHUNK = 1024
+
+
+def coerce_column(values):
+    # Converts a list of raw values to float64, NaN-filling non-numeric and non-finite entries
+    # Returns the array and the number of invalid entries
+    try:
+        column = np.array(values, dtype=float)
+        if column.ndim != 1:
+            raise ValueError("ragged column")
+    except (TypeError, ValueError):
+        # Slow path only for dirty batches (None, strings, size-1 arrays, ...)
+        column = np.empty(len(values), dtype=float)
+        for i, x in enumerate(values):
+            try:
+                column[i] = float(x)
+            except (TypeError, ValueError):
+                column[i] = np.nan
+    invalid = ~np.isfinite(column)
+    column[invalid] = np.nan
+    return column, int(np.count_nonzero(invalid))
+
+
+def fallback_suitability(suitability, temperature):
+    # Toy proxy for samples where the metabolism left Suitability unset: favor temps near 273 K
+    # Only NaN entries of suitability are replaced; returns the filled array and how many were filled
+    missing = np.isnan(suitability) & np.isfinite(temperature)
+    proxy = 1.0 - np.minimum(1.0, np.abs(temperature - 273.15) / 200.0)
+    filled = np.where(missing, proxy, suitability)
+    return filled, int(np.count_nonzero(missing))
+
+
+class SampleCollector:
+    # Buffers raw keyparams values for a batch of samples and validates them together
+
+    def __init__(self, parameters=None):
+        self.parameters = list(parameters or COLLECTED_PARAMETERS)
+        self.invalid_counts = {p: 0 for p in self.parameters}
+        self.proxy_count = 0
+        self.samples = 0
+        self._raw = {p: [] for p in self.parameters}
+
+    def record(self, source):
+        # Reads the current sample from source (normally the keyparams module) without coercion
+        for p in self.parameters:
+            self._raw[p].append(getattr(source, p, None))
+
+    def record_batch(self, columns, n, source):
+        # Appends n samples from {parameter: column}; parameters no module produced are read from source
+        for p in self.parameters:
+            column = columns.get(p)
+            self._raw[p].extend(list(column) if column is not None else [getattr(source, p, None)] * n)
+
+    def flush(self):
+        # Coerces the buffered batch and returns {parameter: float array}; resets the buffer
+        columns = {}
+        for p in self.parameters:
+            columns[p], n_invalid = coerce_column(self._raw[p])
+            self.invalid_counts[p] += n_invalid
+            self._raw[p] = []
+
+        if "Suitability" in columns and "Temperature" in columns:
+            columns["Suitability"], n_proxy = fallback_suitability(
+                columns["Suitability"], columns["Temperature"]
+            )
+            self.proxy_count += n_proxy
+
+        if columns:
+            self.samples += len(next(iter(columns.values())))
+        return columns
+
+    def report(self):
+        # Prints invalid-value counts per parameter collected so far
+        print(f"[Sample validation] {self.samples} samples collected")
+        for p in self.parameters:
+            n = self.invalid_counts[p]
+            if n:
+                print(f"  ⚠️ {p}: {n} invalid (non-numeric or non-finite) values set to NaN")
+        if self.proxy_count:
+            print(f"  ℹ️ Suitability: {self.proxy_count} samples filled with the temperature-based proxy")
+        if not any(self.invalid_counts.values()):
+            print("  ✅ All collected values were finite numbers")
+
+
+class ProbeSnapshots:
+    # Per-probe snapshot of parameters: mean over the probe's samples and the value of its last sample
+    # Rows live in one structured array (fields Probe, <p>_mean, <p>_last) that starts at SNAPSHOT_CHUNK rows
+    # and doubles when full, so a huge NumProbes does not reserve memory up front; non-numeric values become
+    # NaN, like in the collected distributions
+
+    def __init__(self, parameters, NumProbes):
+        self.parameters = list(dict.fromkeys(parameters))
+        fields = [("Probe", "f8")]
+        for p in self.parameters:
+            fields += [(p + "_mean", "f8"), (p + "_last", "f8")]
+        self.capacity = int(NumProbes)
+        self.data = np.full(min(self.capacity, SNAPSHOT_CHUNK), np.nan, dtype=fields)
+        self.count = 0
+        self._raw = {p: [] for p in self.parameters}
+        self._sums = {}
+
+    def record(self, source):
+        for p in self.parameters:
+            self._raw[p].append(getattr(source, p, None))
+
+    def record_batch(self, columns, n, source):
+        for p in self.parameters:
+            column = columns.get(p)
+            self._raw[p].extend(list(column) if column is not None else [getattr(source, p, None)] * n)
+
+    def fold(self, weights=None):
+        # Reduces the buffered samples to running sums so a long probe does not hold every raw value
+        # weights (importance sampling) turn the probe means into weighted means
+        for p in self.parameters:
+            column, _ = coerce_column(self._raw[p])
+            if len(column):
+                ok = np.isfinite(column)
+                w = np.ones(len(column)) if weights is None else np.asarray(weights, dtype=float)
+                total, weighted, _ = self._sums.get(p, (0.0, 0.0, np.nan))
+                self._sums[p] = (total + np.sum(w[ok]), weighted + np.sum(w[ok] * column[ok]), column[-1])
+            self._raw[p] = []
+
+    def close_probe(self, probe_index, weights=None):
+        # Summarizes the probe's samples (folded and still buffered) into the next row; resets the buffer
+        self.fold(weights)
+        if self.count == len(self.data):
+            size = max(min(2 * self.count, self.capacity), self.count + 1)
+            self.data = np.concatenate([self.data, np.full(size - self.count, np.nan, dtype=self.data.dtype)])
+        row = self.data[self.count]
+        row["Probe"] = probe_index
+        for p, (total, weighted, last) in self._sums.items():
+            row[p + "_mean"] = weighted / total if total > 0 else np.nan
+            row[p + "_last"] = last
+        self._sums = {}
+        self.count += 1
+
+    def result(self):
+        # Snapshot rows of the probes completed so far (a view, no copy)
+        return self.data[:self.count]
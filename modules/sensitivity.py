@@ -0,0 +1,230 @@
+# Variance-based sensitivity analysis (Sobol indices) of Suitability with respect to the prior modules
+# Factors are the prior nodes of the module graph (modules with no input_parameters). Each factor is
+# resampled jointly from draws of its own module, so correlated outputs of one prior stay consistent.
+# Model evaluations run the downstream chain through a LevelExecutor, CHUNK_ROWS rows per batch, like a run
+# in levels mode; with workers each process loads the modules once and evaluates whole chunks. A chunk is
+# seeded from the seed and its index, so the indices do not depend on the number of workers.
+
+import os
+import contextlib
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import keyparams
+from modules.qhf_engine import read_run_config, load_modules, build_graph, prepare_sampling
+from modules.sample_collector import coerce_column, fallback_suitability
+from modules.surrogate import surrogate_spec
+from modules.level_executor import LevelExecutor, read_execution_options
+
+try:
+    from scipy.stats import qmc
+except ImportError:  # SciPy is optional; plain random matrices work, just converge slower
+    qmc = None
+
+# Rows evaluated per batch (and per task with workers)
+CHUNK_ROWS = 1000
+
+# Loaded once per worker process by _init_worker
+_worker = {}
+
+
+def find_factors(Modules, topsorted):
+    # Prior modules in execution order, and the modules that have to run for every evaluation
+    priors = [m for m in topsorted if len(Modules[m].input_parameters) == 0]
+    downstream = [m for m in topsorted if m not in priors]
+    return priors, downstream
+
+
+def draw_prior_pool(Modules, priors, n):
+    # Executes every prior module n times and keeps its outputs: one (n, n_outputs) array per factor
+    keyparams.ProbeIndex = 0
+    pool = []
+    for m in priors:
+        names = Modules[m].output_parameters
+        raw = {p: [] for p in names}
+        for _ in range(n):
+            Modules[m].execute()
+            for p in names:
+                raw[p].append(getattr(keyparams, p, None))
+        pool.append(np.column_stack([coerce_column(raw[p])[0] for p in names]))
+    return pool
+
+
+def saltelli_matrices(n, d, seed=None):
+    # Two independent (n, d) matrices on [0, 1); scrambled Sobol points when SciPy is available
+    if qmc is not None:
+        points = qmc.Sobol(d=2 * d, scramble=True, seed=seed).random(n)
+    else:
+        points = np.random.default_rng(seed).random((n, 2 * d))
+    return points[:, :d], points[:, d:]
+
+
+def _resolve(pool, U):
+    # Maps unit-interval coordinates to rows of each factor's pool; returns one (n, total_outputs) matrix
+    columns = []
+    for j, draws in enumerate(pool):
+        rows = np.minimum((U[:, j] * len(draws)).astype(int), len(draws) - 1)
+        columns.append(draws[rows])
+    return np.hstack(columns)
+
+
+def evaluate_rows(Modules, downstream, parameter_names, values, outputs=None, executor=None):
+    # Runs the downstream chain for every row with the prior outputs fixed to the given values
+    # outputs ({parameter: []}) additionally receives those parameters of every row, coerced to float arrays
+    # executor (LevelExecutor over downstream) evaluates all rows as one batch; without it row by row
+    raw_suitability, raw_temperature = [], []
+    raw_outputs = {p: [] for p in outputs or {}}
+    if executor is not None:
+        values = np.asarray(values)
+        store = executor.run_batch(len(values), inputs={p: values[:, k] for k, p in enumerate(parameter_names)})
+        columns = store.columns()
+
+        def raw(p):
+            # Parameters no module produced keep their keyparams value, as in run_monte_carlo
+            return list(columns[p]) if p in columns else [getattr(keyparams, p, None)] * len(values)
+        raw_suitability, raw_temperature = raw('Suitability'), raw('Temperature')
+        raw_outputs = {p: raw(p) for p in raw_outputs}
+    for row in values if executor is None else ():
+        for p, v in zip(parameter_names, row):
+            setattr(keyparams, p, v)
+        keyparams.runid = ''
+        for m in downstream:
+            Modules[m].execute()
+        raw_suitability.append(getattr(keyparams, 'Suitability', None))
+        raw_temperature.append(getattr(keyparams, 'Temperature', None))
+        for p, raw in raw_outputs.items():
+            raw.append(getattr(keyparams, p, None))
+    for p, raw in raw_outputs.items():
+        outputs[p] = coerce_column(raw)[0]
+    suitability, _ = coerce_column(raw_suitability)
+    temperature, _ = coerce_column(raw_temperature)
+    return fallback_suitability(suitability, temperature)[0]
+
+
+def _evaluation_chain(Modules, topsorted, settings):
+    # The downstream modules and a LevelExecutor running them, with the config's [Execution] threads
+    _, downstream = find_factors(Modules, topsorted)
+    options = read_execution_options(settings['Execution'])
+    return {'Modules': Modules, 'downstream': downstream,
+            'executor': LevelExecutor(Modules, downstream, threads=options['threads'], jit=options['jit'])}
+
+
+def _init_worker(config_path, surrogate):
+    # Loads the modules once per worker process, with the parent's surrogate fit
+    with open(os.devnull, "w") as sink, contextlib.redirect_stdout(sink):
+        settings = read_run_config(config_path)
+        Modules, _ = load_modules(settings)
+        _, _, _, topsorted = build_graph(Modules, verbose=False)
+        Modules, topsorted = prepare_sampling(Modules, topsorted, settings, verbose=False, surrogate=surrogate)
+        _worker.update(_evaluation_chain(Modules, topsorted, settings))
+
+
+def _evaluate(chain, index, parameter_names, values, seed):
+    # Evaluates chunk index; modules drawing random numbers get a per-chunk seed
+    if seed is not None:
+        np.random.seed((int(seed) + 1 + index) % 2 ** 32)
+    with open(os.devnull, "w") as sink, contextlib.redirect_stdout(sink):
+        return evaluate_rows(chain['Modules'], chain['downstream'], parameter_names, values,
+                             executor=chain['executor'])
+
+
+def _evaluate_chunk(index, parameter_names, values, seed):
+    # Worker entry point: one chunk of rows with the modules loaded by _init_worker
+    return _evaluate(_worker, index, parameter_names, values, seed)
+
+
+def sobol_indices(fA, fB, fAB):
+    # First-order (Saltelli 2010) and total (Jansen) estimators; fAB has one column per factor
+    variance = np.var(np.concatenate([fA, fB]))
+    if not variance > 0:
+        nan = np.full(fAB.shape[1], np.nan)
+        return nan, nan
+    first = np.mean(fB[:, None] * (fAB - fA[:, None]), axis=0) / variance
+    total = 0.5 * np.mean((fA[:, None] - fAB) ** 2, axis=0) / variance
+    return first, total
+
+
+def run_sensitivity(config_path, n=1024, workers=1, bootstrap=100, seed=None, verbose=True):
+    # Estimates Sobol indices of Suitability for every prior factor; returns a list of result rows
+    settings = read_run_config(config_path)
+    Modules, _ = load_modules(settings)
+    _, _, _, topsorted = build_graph(Modules, verbose=False)
+    Modules, topsorted = prepare_sampling(Modules, topsorted, settings, verbose=verbose)
+    priors, _ = find_factors(Modules, topsorted)
+    if not priors:
+        raise ValueError('The module graph has no prior nodes to use as factors.')
+
+    d = len(priors)
+    parameter_names = [p for m in priors for p in Modules[m].output_parameters]
+    if verbose:
+        print('[Sensitivity] %d factors, %d base samples, %d model evaluations'
+              % (d, n, n * (d + 2)))
+
+    if seed is not None:
+        # Prior modules draw from NumPy's global generator
+        np.random.seed(seed)
+    pool = draw_prior_pool(Modules, priors, n)
+    A, B = saltelli_matrices(n, d, seed)
+    blocks = [A, B]
+    for i in range(d):
+        AB = A.copy()
+        AB[:, i] = B[:, i]
+        blocks.append(AB)
+    values = np.vstack([_resolve(pool, U) for U in blocks])
+
+    chunks = [values[i:i + CHUNK_ROWS] for i in range(0, len(values), CHUNK_ROWS)]
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(config_path, surrogate_spec(Modules))) as pool:
+            outputs = list(pool.map(_evaluate_chunk, range(len(chunks)), [parameter_names] * len(chunks), chunks,
+                                    [seed] * len(chunks)))
+    else:
+        chain = _evaluation_chain(Modules, topsorted, settings)
+        try:
+            outputs = [_evaluate(chain, i, parameter_names, chunk, seed) for i, chunk in enumerate(chunks)]
+        finally:
+            chain['executor'].close()
+    f = np.concatenate(outputs)
+
+    f = f.reshape(d + 2, n)
+    valid = np.all(np.isfinite(f), axis=0)
+    if verbose and not valid.all():
+        print('[Sensitivity] Dropping %d base samples with invalid Suitability' % np.count_nonzero(~valid))
+    fA, fB, fAB = f[0, valid], f[1, valid], f[2:, valid].T
+
+    first, total = sobol_indices(fA, fB, fAB)
+
+    # Bootstrap confidence intervals (95%) over the base samples
+    rng = np.random.default_rng(seed)
+    boot_first, boot_total = [], []
+    for _ in range(bootstrap):
+        k = rng.integers(0, len(fA), len(fA))
+        s1, st = sobol_indices(fA[k], fB[k], fAB[k])
+        boot_first.append(s1)
+        boot_total.append(st)
+    ci_first = 1.96 * np.std(boot_first, axis=0) if bootstrap else np.full(d, np.nan)
+    ci_total = 1.96 * np.std(boot_total, axis=0) if bootstrap else np.full(d, np.nan)
+
+    rows = []
+    for i, m in enumerate(priors):
+        rows.append({
+            'Factor': ' '.join(Modules[m].name.split()),
+            'Parameters': ', '.join(Modules[m].output_parameters),
+            'S1': float(first[i]),
+            'S1_conf': float(ci_first[i]),
+            'ST': float(total[i]),
+            'ST_conf': float(ci_total[i]),
+        })
+    rows.sort(key=lambda r: -np.nan_to_num(r['ST']))
+    return rows
+
+
+def print_sensitivity(rows):
+    print('\n' + '=' * 86)
+    print('%-26s %-24s %15s %15s' % ('Factor', 'Parameters', 'First-order S1', 'Total ST'))
+    print('-' * 86)
+    for r in rows:
+        print('%-26s %-24s %7.3f ± %5.3f %7.3f ± %5.3f'
+              % (r['Factor'][:26], r['Parameters'][:24], r['S1'], r['S1_conf'], r['ST'], r['ST_conf']))
+    print('=' * 86)
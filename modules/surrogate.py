@@ -0,0 +1,303 @@
+# Optional surrogate layer: replaces an expensive, smooth chain of modules with a fitted interpolator
+# Enabled per config:
+#
+#   [Surrogate]
+#   Enabled = true
+#   Modules = Equilibrium Temperature, Leaky Greenhouse   (module names, as printed under [Modules Loaded])
+#   DesignPoints = 400      (exact evaluations used to fit and validate)
+#   HoldoutFraction = 0.2   (share of design points kept back for validation)
+#   Tolerance = 0.01        (max relative RMS error on the holdout, per output)
+#   Method = rbf            (rbf needs SciPy; poly is a quadratic least-squares fit in NumPy)
+#
+# The surrogate only sees the subgraph's declared input parameters, so it is only valid for
+# modules whose outputs depend on those inputs alone. If validation fails the exact modules are kept.
+# An interpolator call costs tens of microseconds, so per sample (serial mode) the surrogate rarely beats
+# cheap modules; with [Execution] Mode = levels it evaluates whole batches at once (execute_batch).
+# Worker processes (probe pool, distributed workers, sensitivity chunks) do not fit their own surrogate on new
+# random design points: the fitting process hands them surrogate_spec(), whose design points they refit exactly.
+
+import time
+
+import numpy as np
+import networkx as nx
+
+import keyparams
+
+try:
+    from scipy.interpolate import RBFInterpolator
+except ImportError:  # SciPy is optional; fall back to the polynomial fit
+    RBFInterpolator = None
+
+# configparser lower-cases option names
+DEFAULT_OPTIONS = {
+    'enabled': 'false',
+    'modules': '',
+    'designpoints': '400',
+    'holdoutfraction': '0.2',
+    'tolerance': '0.01',
+    'method': 'rbf',
+}
+
+
+def _normalize_name(name):
+    # Module names often carry layout line breaks ("Equilibrium \n Temperature")
+    return ' '.join(str(name).split()).lower()
+
+
+def read_surrogate_options(section):
+    # Turns the raw [Surrogate] section (dict of strings) into typed options
+    raw = dict(DEFAULT_OPTIONS)
+    raw.update({k.lower(): v for k, v in (section or {}).items()})
+    return {
+        'enabled': str(raw['enabled']).strip().lower() in ('1', 'true', 'yes', 'on'),
+        'modules': [_normalize_name(m) for m in raw['modules'].split(',') if m.strip()],
+        'design_points': int(raw['designpoints']),
+        'holdout_fraction': float(raw['holdoutfraction']),
+        'tolerance': float(raw['tolerance']),
+        'method': raw['method'].strip().lower(),
+    }
+
+
+# ======================================
+# Interpolators
+# ======================================
+
+class _PolynomialFit:
+    # Quadratic least-squares fit on standardized inputs
+
+    def __init__(self, X, Y):
+        self.mean = X.mean(axis=0)
+        self.scale = np.where(X.std(axis=0) > 0, X.std(axis=0), 1.0)
+        self.coef, *_ = np.linalg.lstsq(self._features(X), Y, rcond=None)
+
+    def _features(self, X):
+        Z = (X - self.mean) / self.scale
+        n, d = Z.shape
+        cols = [np.ones(n)] + [Z[:, i] for i in range(d)]
+        cols += [Z[:, i] * Z[:, j] for i in range(d) for j in range(i, d)]
+        return np.column_stack(cols)
+
+    def __call__(self, X):
+        return self._features(X) @ self.coef
+
+
+class _RBFFit:
+    # Thin-plate-spline RBF interpolation on standardized inputs (SciPy)
+
+    def __init__(self, X, Y):
+        self.mean = X.mean(axis=0)
+        self.scale = np.where(X.std(axis=0) > 0, X.std(axis=0), 1.0)
+        self.rbf = RBFInterpolator((X - self.mean) / self.scale, Y, kernel='thin_plate_spline',
+                                   smoothing=1e-9, degree=1)
+
+    def __call__(self, X):
+        return self.rbf((X - self.mean) / self.scale)
+
+
+def fit_interpolator(X, Y, method='rbf'):
+    if method == 'rbf' and RBFInterpolator is not None:
+        return _RBFFit(X, Y)
+    return _PolynomialFit(X, Y)
+
+
+def holdout_error(predicted, actual):
+    # Relative RMS error per output column, scaled by the spread (or magnitude) of the true values
+    rms = np.sqrt(np.mean((predicted - actual) ** 2, axis=0))
+    scale = np.std(actual, axis=0)
+    scale = np.where(scale > 0, scale, np.maximum(np.abs(np.mean(actual, axis=0)), 1.0))
+    return rms / scale
+
+
+# ======================================
+# Surrogate Module
+# ======================================
+
+class SurrogateModule:
+    # Stands in for a subgraph of modules: reads its external inputs from keyparams and writes all its outputs
+
+    # Fitted on random design points, so its outputs must never be reused from the incremental cache
+    cacheable = False
+
+    def __init__(self, name, input_parameters, output_parameters, interpolator, replaced, design=None,
+                 method='rbf'):
+        self.name = name
+        self.input_parameters = list(input_parameters)
+        self.output_parameters = list(output_parameters)
+        self.interpolator = interpolator
+        self.replaced = replaced
+        # (X, Y) the interpolator was fitted on, so other processes can rebuild the same fit
+        self.design = design
+        self.method = method
+
+    def spec(self):
+        # JSON-friendly description of the fitted surrogate, see surrogate_from_spec
+        X, Y = self.design
+        return {'name': self.name, 'input_parameters': self.input_parameters,
+                'output_parameters': self.output_parameters, 'replaced': list(self.replaced),
+                'method': self.method, 'X': np.asarray(X).tolist(), 'Y': np.asarray(Y).tolist()}
+
+    def execute(self):
+        x = np.array([[float(getattr(keyparams, p)) for p in self.input_parameters]])
+        y = self.interpolator(x)[0]
+        for p, value in zip(self.output_parameters, y):
+            setattr(keyparams, p, float(value))
+
+    def execute_batch(self, inputs, n):
+        # Batch interface of the level executor: one interpolator call for the whole column
+        X = np.column_stack([np.asarray(inputs[p], dtype=float) for p in self.input_parameters])
+        Y = np.asarray(self.interpolator(X), dtype=float).reshape(n, len(self.output_parameters))
+        return {p: Y[:, k] for k, p in enumerate(self.output_parameters)}
+
+
+def surrogate_spec(Modules):
+    # Spec of the surrogate in a sampling module list; {} when the exact modules are used
+    for m in Modules:
+        if isinstance(m, SurrogateModule) and m.design is not None:
+            return m.spec()
+    return {}
+
+
+def surrogate_from_spec(spec):
+    # Refits the interpolator on the shipped design points; both methods are deterministic
+    X, Y = np.asarray(spec['X'], dtype=float), np.asarray(spec['Y'], dtype=float)
+    return SurrogateModule(spec['name'], spec['input_parameters'], spec['output_parameters'],
+                           fit_interpolator(X, Y, spec['method']), spec['replaced'], (X, Y), spec['method'])
+
+
+def substitute_surrogate(Modules, spec):
+    # The module list with the modules a surrogate spec replaced swapped for the surrogate ({}: unchanged)
+    if not spec:
+        return Modules
+    replaced = {_normalize_name(n) for n in spec['replaced']}
+    missing = replaced - {_normalize_name(m.name) for m in Modules}
+    if missing:
+        raise ValueError('The surrogate replaces modules this process did not load: %s' % ', '.join(sorted(missing)))
+    return [m for m in Modules if _normalize_name(m.name) not in replaced] + [surrogate_from_spec(spec)]
+
+
+def subgraph_interface(Modules, indices):
+    # External inputs (consumed but not produced inside) and all outputs of the subgraph
+    produced = []
+    for i in indices:
+        produced.extend(p for p in Modules[i].output_parameters if p not in produced)
+    inputs = []
+    for i in indices:
+        inputs.extend(p for p in Modules[i].input_parameters if p not in produced and p not in inputs)
+    return inputs, produced
+
+
+def _dependency_graph(Modules):
+    DG = nx.DiGraph()
+    DG.add_nodes_from(range(len(Modules)))
+    DG.add_edges_from((a, b) for b in range(len(Modules)) for ip in Modules[b].input_parameters
+                      for a in range(len(Modules)) if ip in Modules[a].output_parameters)
+    return DG
+
+
+def _is_closed(DG, indices):
+    # A subgraph can be collapsed into one node only if no outside module sits between two of its members
+    inside = set(indices)
+    downstream = set().union(*(nx.descendants(DG, i) for i in inside)) - inside
+    upstream = set().union(*(nx.ancestors(DG, i) for i in inside)) - inside
+    return not (downstream & upstream)
+
+
+def _sample_design(Modules, DG, topsorted, indices, inputs, outputs, n):
+    # Runs the ancestors of the subgraph plus the subgraph itself, recording its inputs and outputs
+    needed = set(indices)
+    for i in indices:
+        needed |= nx.ancestors(DG, i)
+    upstream = [m for m in topsorted if m in needed and m not in indices]
+    chain = [m for m in topsorted if m in indices]
+
+    X = np.empty((n, len(inputs)))
+    Y = np.empty((n, len(outputs)))
+    t_exact = 0.0
+    for k in range(n):
+        for m in upstream:
+            Modules[m].execute()
+        t0 = time.perf_counter()
+        for m in chain:
+            Modules[m].execute()
+        t_exact += time.perf_counter() - t0
+        X[k] = [float(getattr(keyparams, p)) for p in inputs]
+        Y[k] = [float(getattr(keyparams, p)) for p in outputs]
+    return X, Y, t_exact / max(n, 1)
+
+
+def apply_surrogate(Modules, topsorted, section, verbose=True):
+    # Returns the module list to sample with: the original list, or one with the subgraph replaced
+    options = read_surrogate_options(section)
+    if not options['enabled'] or not options['modules']:
+        return Modules
+
+    by_name = {_normalize_name(m.name): i for i, m in enumerate(Modules)}
+    missing = [n for n in options['modules'] if n not in by_name]
+    if missing:
+        print('[Surrogate] Unknown modules %s -- using the exact path' % missing)
+        return Modules
+    indices = [by_name[n] for n in options['modules']]
+    DG = _dependency_graph(Modules)
+    if not _is_closed(DG, indices):
+        print('[Surrogate] Other modules sit between the selected ones -- using the exact path')
+        return Modules
+    inputs, outputs = subgraph_interface(Modules, indices)
+    if not inputs:
+        print('[Surrogate] Subgraph has no external inputs -- using the exact path')
+        return Modules
+
+    try:
+        X, Y, t_exact = _sample_design(Modules, DG, topsorted, indices, inputs, outputs, options['design_points'])
+    except (TypeError, ValueError) as e:
+        print('[Surrogate] Subgraph parameters are not numeric (%s) -- using the exact path' % e)
+        return Modules
+    keep = np.all(np.isfinite(X), axis=1) & np.all(np.isfinite(Y), axis=1)
+    X, Y = X[keep], Y[keep]
+
+    n_holdout = max(1, int(len(X) * options['holdout_fraction']))
+    if len(X) - n_holdout < 2 * (len(inputs) + 1):
+        print('[Surrogate] Too few valid design points (%d) -- using the exact path' % len(X))
+        return Modules
+    order = np.random.permutation(len(X))
+    train, test = order[n_holdout:], order[:n_holdout]
+
+    interpolator = fit_interpolator(X[train], Y[train], options['method'])
+    errors = holdout_error(interpolator(X[test]), Y[test])
+    worst = float(np.max(errors))
+
+    if verbose:
+        for p, e in zip(outputs, errors):
+            print('[Surrogate]   %-24s holdout error %.4f' % (p, e))
+    if worst > options['tolerance']:
+        print('[Surrogate] Holdout error %.4f exceeds tolerance %.4f -- using the exact path'
+              % (worst, options['tolerance']))
+        return Modules
+
+    # Refit on all design points now that the method is validated
+    interpolator = fit_interpolator(X, Y, options['method'])
+    names = [Modules[i].name for i in indices]
+    surrogate = SurrogateModule('Surrogate\n' + ' + '.join(_normalize_name(n) for n in names).title(),
+                                inputs, outputs, interpolator, names, (X, Y), options['method'])
+
+    t0 = time.perf_counter()
+    for _ in range(20):
+        surrogate.execute()
+    t_surrogate = (time.perf_counter() - t0) / 20
+    t0 = time.perf_counter()
+    surrogate.execute_batch({p: X[:, k] for k, p in enumerate(inputs)}, len(X))
+    t_batch = (time.perf_counter() - t0) / len(X)
+    if min(t_surrogate, t_batch) >= t_exact:
+        # Accurate but not worth it: cheap modules are faster than any interpolator call
+        print('[Surrogate] Surrogate is not faster than the exact modules (%.1f us per sample, %.2f us batched, '
+              'exact %.2f us) -- using the exact path' % (t_surrogate * 1e6, t_batch * 1e6, t_exact * 1e6))
+        return Modules
+    if t_surrogate >= t_exact:
+        print('[Surrogate] ⚠️ Per sample the surrogate is slower than the exact modules (%.1f vs %.2f us); '
+              'it only pays off batched, with [Execution] Mode = levels (%.2f us per sample)'
+              % (t_surrogate * 1e6, t_exact * 1e6, t_batch * 1e6))
+    speedup = ('~%.1fx batched' % (t_exact / t_batch) if t_surrogate >= t_exact else
+               '~%.1fx per sample, ~%.1fx batched' % (t_exact / t_surrogate, t_exact / t_batch))
+    print('[Surrogate] Replaced %d modules (holdout error %.4f <= %.4f), faster %s'
+          % (len(indices), worst, options['tolerance'], speedup))
+
+    return [m for i, m in enumerate(Modules) if i not in indices] + [surrogate]
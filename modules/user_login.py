@@ -1,16 +1,23 @@
 # Manages user login, caching, logging, and email notification
+# Logins are kept in an SQLite database (one row per user, updated in place), so concurrent launches on a
+# shared install do not rewrite or clobber each other's entries. The old user_logs.csv is imported once and left
+# untouched; exports go to user_export.csv.
 import os
 import csv
 import json
+import sqlite3
 from datetime import datetime
 from modules.email_sender import send_welcome_email
 
 # Define paths for user log and cache files
 MODULE_DIR = os.path.dirname(__file__)
 LOG_FILE = os.path.join(MODULE_DIR, "user_logs.csv")
-print(f"[DEBUG] Writing to: {LOG_FILE}")
+EXPORT_FILE = os.path.join(MODULE_DIR, "user_export.csv")
+DB_FILE = os.path.join(MODULE_DIR, "user_logs.db")
 CACHE_FILE = os.path.join(MODULE_DIR, ".user_cache.json")
 
+CSV_FIELDS = ["Name", "Email", "Login Count", "Last Access"]
+
 def load_cached_user():
     # Loads user data from local JSON cache
     if os.path.exists(CACHE_FILE):
@@ -23,9 +30,73 @@ def save_user_to_cache(name, email):
     with open(CACHE_FILE, "w") as f:
         json.dump({"name": name, "email": email}, f)
 
+def connect_user_db(db_file=None, legacy_csv=None):
+    # Opens the user database, creating it and importing the old CSV log on first use
+    db = sqlite3.connect(db_file or DB_FILE, timeout=30)
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute(
+        "CREATE TABLE IF NOT EXISTS users ("
+        " name TEXT NOT NULL, email TEXT NOT NULL, login_count INTEGER NOT NULL, last_access TEXT NOT NULL,"
+        " PRIMARY KEY (name, email))"
+    )
+    db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+    migrate_csv_log(db, legacy_csv or LOG_FILE)
+    return db
+
+def migrate_csv_log(db, csv_file):
+    # One-time import of the old user_logs.csv log (exports go to a separate file)
+    with db:
+        db.execute("BEGIN IMMEDIATE")
+        if db.execute("SELECT 1 FROM meta WHERE key = 'csv_migrated'").fetchone():
+            return 0
+        rows = []
+        if os.path.exists(csv_file):
+            with open(csv_file, "r", newline="") as f:
+                for user in csv.DictReader(f):
+                    rows.append((user["Name"], user["Email"], int(user["Login Count"] or 0), user["Last Access"]))
+        # Duplicate rows in the old log are merged into one user
+        db.executemany(
+            "INSERT INTO users VALUES (?, ?, ?, ?) ON CONFLICT(name, email) DO UPDATE SET"
+            " login_count = login_count + excluded.login_count,"
+            " last_access = MAX(last_access, excluded.last_access)",
+            rows,
+        )
+        db.execute("INSERT INTO meta VALUES ('csv_migrated', ?)", (datetime.now().isoformat(timespec="seconds"),))
+    if rows:
+        print(f"📦 Imported {len(rows)} log rows from {os.path.basename(csv_file)}")
+    return len(rows)
+
+def record_login(db, name, email, timestamp):
+    # Upserts one login; returns (login count, whether the user is new)
+    with db:
+        db.execute("BEGIN IMMEDIATE")
+        existing = db.execute("SELECT login_count FROM users WHERE name = ? AND email = ?", (name, email)).fetchone()
+        db.execute(
+            "INSERT INTO users VALUES (?, ?, 1, ?) ON CONFLICT(name, email) DO UPDATE SET"
+            " login_count = login_count + 1, last_access = excluded.last_access",
+            (name, email, timestamp),
+        )
+    return (existing[0] + 1 if existing else 1), existing is None
+
+def export_users_csv(path=None, db_file=None):
+    # Writes all users to a CSV file (same columns as the old log) for notify_users.py; returns the path
+    path = path or EXPORT_FILE
+    db = connect_user_db(db_file)
+    try:
+        rows = db.execute("SELECT name, email, login_count, last_access FROM users ORDER BY name, email").fetchall()
+    finally:
+        db.close()
+    tmp = path + ".tmp"
+    with open(tmp, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(CSV_FIELDS)
+        writer.writerows(rows)
+    os.replace(tmp, path)
+    return path
+
 def get_user_info():
     # Loads user session or asks for input
-    # Logs access in CSV file and sends welcome email if new
+    # Logs access in the user database and sends welcome email if new
     cached_user = load_cached_user()
 
     if cached_user:
@@ -39,42 +110,15 @@ def get_user_info():
         save_user_to_cache(name, email)
 
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    users = []
-    is_new_user = True
-
-    if os.path.exists(LOG_FILE):
-        with open(LOG_FILE, "r", newline="") as f:
-            reader = csv.DictReader(f)
-            users = list(reader)
-
-    for user in users:
-        if user["Name"] == name and user["Email"] == email:
-            user["Login Count"] = str(int(user["Login Count"]) + 1)
-            user["Last Access"] = timestamp
-            is_new_user = False
-            break
-
-    if is_new_user:
-        users.append({
-            "Name": name,
-            "Email": email,
-            "Login Count": "1",
-            "Last Access": timestamp
-        })
-
-        # Send welcome email only to valid, non-anonymous users
-        if email.lower() != "anonymous" and name.lower() != "anonymous":
-            send_welcome_email(email, name)
-
-    with open(LOG_FILE, "w", newline="") as f:
-        writer = csv.DictWriter(f, fieldnames=["Name", "Email", "Login Count", "Last Access"])
-        writer.writeheader()
-        writer.writerows(users)
-
-    current_login_count = next(
-        (u["Login Count"] for u in users if u["Name"] == name and u["Email"] == email),
-        "1"
-    )
+    db = connect_user_db()
+    try:
+        current_login_count, is_new_user = record_login(db, name, email, timestamp)
+    finally:
+        db.close()
+
+    # Send welcome email only to valid, non-anonymous users
+    if is_new_user and email.lower() != "anonymous" and name.lower() != "anonymous":
+        send_welcome_email(email, name)
 
     print(f"📅 Last Access: {timestamp} | Total Logins: {current_login_count}\n")
 
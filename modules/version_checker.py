@@ -1,23 +1,103 @@
 # Checks GitHub for latest software version and compares it to the current version
-import requests
+# The check runs on a background thread and its answer is cached on disk, so the launcher never waits for it.
+# Set QHF_OFFLINE=1 (or pass --offline to the launcher) to skip it; QHF_VERSION_URL points it elsewhere.
+import os
+import json
+import time
+import threading
 
 # Set your current version here
 CURRENT_VERSION = "1.0.0"
 
 # Raw GitHub URL of the latest_version.json file
-VERSION_URL = "https://raw.githubusercontent.com/<your-username>/<your-repo>/main/latest_version.json"
+VERSION_URL = os.getenv("QHF_VERSION_URL",
+                        "https://raw.githubusercontent.com/<your-username>/<your-repo>/main/latest_version.json")
+DOWNLOAD_URL = "https://github.com/<your-username>/<your-repo>/releases/latest"
+
+# Answers younger than this are reused instead of asking the server again
+CACHE_FILE = os.path.join(os.path.dirname(__file__), ".version_cache.json")
+CACHE_TTL = 24 * 3600
+
+def is_offline():
+    return os.getenv("QHF_OFFLINE", "").lower() in ("1", "true", "yes")
+
+def fetch_latest_version(url=None, timeout=5):
+    # Imported here so launcher startup does not pay for requests
+    import requests
+    url = url or VERSION_URL
+    if "<" in url:
+        raise ValueError("VERSION_URL is not configured")
+    response = requests.get(url, timeout=timeout)
+    if response.status_code != 200:
+        raise ValueError(f"server error {response.status_code}")
+    return response.json().get("latest", "")
+
+def load_cached_version(max_age=CACHE_TTL, url=None):
+    # Returns the cached latest version if it is fresh and came from the same URL, else None
+    try:
+        with open(CACHE_FILE, "r") as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if cached.get("url") != (url or VERSION_URL) or time.time() - cached.get("checked", 0) > max_age:
+        return None
+    return cached.get("latest")
+
+def save_cached_version(latest, url=None):
+    try:
+        with open(CACHE_FILE, "w") as f:
+            json.dump({"latest": latest, "url": url or VERSION_URL, "checked": time.time()}, f)
+    except OSError:
+        pass
+
+def get_latest_version(url=None, max_age=CACHE_TTL, timeout=5):
+    latest = load_cached_version(max_age, url)
+    if latest is None:
+        latest = fetch_latest_version(url, timeout)
+        save_cached_version(latest, url)
+    return latest
+
+def format_update_message(latest):
+    if latest and latest != CURRENT_VERSION:
+        return (f"[UPDATE AVAILABLE] A new version ({latest}) is available.\n"
+                f"Download it from: {DOWNLOAD_URL}")
+    return "[Up to date] You are using the latest version."
 
 def check_for_update():
     try:
-        response = requests.get(VERSION_URL, timeout=5)
-        if response.status_code == 200:
-            latest_version = response.json().get("latest", "")
-            if latest_version and latest_version != CURRENT_VERSION:
-                print(f"[UPDATE AVAILABLE] A new version ({latest_version}) is available.")
-                print("Download it from: https://github.com/<your-username>/<your-repo>/releases/latest")
-            else:
-                print("[Up to date] You are using the latest version.")
-        else:
-            print("[Warning] Could not check for updates (server error).")
+        print(format_update_message(get_latest_version()))
     except Exception as e:
         print(f"[Warning] Update check failed: {e}")
+
+class UpdateCheck:
+    # Background update check; report() prints the answer once it is available and never blocks
+
+    def __init__(self, url=None, max_age=CACHE_TTL, timeout=5):
+        self.message = None
+        self.shown = False
+        self.done = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(url, max_age, timeout), daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _run(self, url, max_age, timeout):
+        try:
+            self.message = format_update_message(get_latest_version(url, max_age, timeout))
+        except Exception as e:
+            self.message = f"[Warning] Update check failed: {e}"
+        self.done.set()
+
+    def report(self, wait=0.0):
+        # Prints the result if it is ready (optionally waiting up to `wait` seconds); True once shown
+        if not self.shown and self.done.wait(wait) and self.message:
+            print(self.message)
+            self.shown = True
+        return self.shown
+
+def start_update_check(offline=False):
+    # Returns a running UpdateCheck, or None when offline
+    if offline or is_offline():
+        return None
+    return UpdateCheck().start()
@@ -0,0 +1,133 @@
+# Watch mode: keeps the runner alive and reruns a config whenever it or one of its module files changes
+# Every change first triggers a quick preview (few probes and iterations), then the full run, which is
+# abandoned as soon as another change arrives. Module files are re-imported only when they changed on
+# disk (see ModuleRegistry.load), so editing a Metabolism file does not re-import the Habitat file.
+#
+#   [Watch]
+#   PreviewIterations = 100
+#   PreviewProbes = 3
+
+import os
+import time
+import traceback
+
+import numpy as np
+
+from modules.module_registry import get_registry
+from modules.preflight import preflight, print_preflight
+from modules.config_templates import config_chain, resolve_config
+from modules.qhf_engine import (HABITATS_DIR, METABOLISMS_DIR, ANALYSES_DIR, RESULTS_DIR, CONFIGS_DIR,
+                                read_run_config, load_modules, build_graph, prepare_sampling, run_monte_carlo,
+                                save_results, safe_filename)
+
+POLL_SECONDS = 1.0
+
+
+def read_watch_options(config_path):
+    config = resolve_config(config_path, search_dirs=[CONFIGS_DIR])
+    raw = {k.lower(): v for k, v in (dict(config['Watch']) if config.has_section('Watch') else {}).items()}
+    return {
+        'preview_iterations': max(1, int(raw.get('previewiterations', '100'))),
+        'preview_probes': max(1, int(raw.get('previewprobes', '3'))),
+    }
+
+
+def watched_files(config_path, settings=None):
+    # The config, the bases it extends and the module files it references (only the config if it cannot be read)
+    try:
+        files = config_chain(config_path, [CONFIGS_DIR])
+    except ValueError:
+        files = [os.path.abspath(config_path)]
+    if settings is not None:
+        files += [os.path.join(HABITATS_DIR, settings['HabitatFile'] + '.py'),
+                  os.path.join(METABOLISMS_DIR, settings['MetabolismFile'] + '.py'),
+                  os.path.join(ANALYSES_DIR, settings['VisualizationFile'] + '.py')]
+    return files
+
+
+def _stamps(files):
+    stamps = {}
+    for path in files:
+        try:
+            stat = os.stat(path)
+            stamps[path] = (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            stamps[path] = None
+    return stamps
+
+
+def _run(settings, NumProbes, N_iter, label, should_stop):
+    start = time.perf_counter()
+    Modules, _ = load_modules(settings)
+    _, _, _, topsorted = build_graph(Modules, verbose=False)
+    Modules, topsorted = prepare_sampling(Modules, topsorted, settings, verbose=False)
+    results = run_monte_carlo(Modules, topsorted, NumProbes, N_iter, verbose=False, should_stop=should_stop)
+    suitability = np.asarray(results['Suitability_Distribution'], dtype=float)
+    invalid = sum(results['Collector'].invalid_counts.values())
+    status = 'interrupted by a change' if results['cancelled'] else 'done'
+    print('  %s: %d probes x %d iterations, mean Suitability %.3f, %d invalid values, %.1fs (%s)'
+          % (label, len(results['Suitability_Plot']), N_iter,
+             np.nanmean(suitability) if suitability.size else np.nan, invalid, time.perf_counter() - start, status))
+    return results
+
+
+def watch(config_path):
+    # Runs until Ctrl+C; returns an exit code
+    registry = get_registry()
+    config_path = os.path.abspath(config_path)
+    print('👀 Watching %s and its module files (Ctrl+C to stop)' % os.path.basename(config_path))
+
+    stamps = {}
+    files = watched_files(config_path)
+    try:
+        while True:
+            current = _stamps(files)
+            if current == stamps:
+                time.sleep(POLL_SECONDS)
+                continue
+            if stamps:
+                changed = [os.path.relpath(p) for p in files if current.get(p) != stamps.get(p)]
+                print('\n🔁 Changed: ' + ', '.join(changed))
+            else:
+                print('\n▶️  Initial run')
+            stamps = current
+
+            try:
+                settings = read_run_config(config_path)
+            except Exception as e:
+                print('  ❌ Config cannot be read: %s' % e)
+                files = watched_files(config_path)
+                stamps = _stamps(files)
+                continue
+            files = watched_files(config_path, settings)
+            stamps = _stamps(files)
+
+            report = preflight(settings, registry)
+            if report['errors']:
+                print_preflight(report)
+                continue
+
+            def changed_since_start():
+                return _stamps(files) != stamps
+
+            options = read_watch_options(config_path)
+            preview = (min(options['preview_probes'], int(settings['NumProbes'])),
+                       min(options['preview_iterations'], settings['Niterations']))
+            try:
+                # Small configs skip the preview: it would be the full run again
+                if preview != (int(settings['NumProbes']), settings['Niterations']):
+                    _run(settings, preview[0], preview[1], 'Preview', changed_since_start)
+                    if changed_since_start():
+                        continue
+                results = _run(settings, settings['NumProbes'], settings['Niterations'], 'Full run',
+                               changed_since_start)
+                if not results['cancelled']:
+                    path = save_results(results, os.path.join(RESULTS_DIR, safe_filename(settings['ConfigID']) + '_watch.npz'))
+                    print('  💾 Saved to %s' % os.path.relpath(path))
+            except Exception:
+                # A broken module must not end the session; fix the file and it reruns
+                traceback.print_exc()
+                print('  ❌ Run failed -- waiting for the next change')
+    except KeyboardInterrupt:
+        print('\n👋 Watch mode stopped')
+    return 0
@@ -1,23 +1,29 @@
 # Script to send update emails to all registered (non-anonymous) users
-# Reads from the user_logs.csv and uses send_update_email()
+# Exports the user database to user_export.csv, reads it and sends through the pooled bulk mailer (send_bulk)
 
 import csv
-from modules.email_sender import send_update_email
+from modules.email_sender import send_bulk
+from modules.user_login import export_users_csv
 
-def notify_all_users():
-    sent = 0
-    with open("modules/user_logs.csv", "r") as f:
+def notify_all_users(workers=4, rate=5.0):
+    recipients = []
+    with open(export_users_csv(), "r") as f:
         reader = csv.DictReader(f)
         for row in reader:
             name = row["Name"]
             email = row["Email"]
             if email.lower() != "anonymous":
-                try:
-                    send_update_email(email, name)  # Send email update
-                    sent += 1
-                except Exception as e:
-                    print(f"❌ Failed to email {email}: {e}")
-    print(f"\n📬 Update email sent to {sent} users.")
+                recipients.append((email, name))
+
+    outcomes = send_bulk(recipients, workers=workers, rate=rate)
+    sent = 0
+    for outcome in outcomes:
+        if outcome["status"] == "sent":
+            sent += 1
+        else:
+            print(f"❌ Failed to email {outcome['email']} after {outcome['attempts']} attempt(s): {outcome['error']}")
+    print(f"\n📬 Update email sent to {sent} of {len(outcomes)} users.")
+    return outcomes
 
 if __name__ == "__main__":
     notify_all_users()
@@ -0,0 +1,334 @@
+# Runs many QHF configs in one go without plotting.
+# Config templates (Extends, {a, b} alternatives, see modules/config_templates.py) are expanded into jobs and
+# identical jobs run once. Jobs sharing a Habitat file are run by the same worker process, so each module file
+# is loaded once. Every job runs with its config's [Importance], [Execution], SavedParameters and [Diagnostics]
+# settings, like under QHF.py; Workers is ignored (each job runs in one worker process) and noted in the summary.
+#
+# With --shared-cache, jobs of one habitat and run shape replay the habitat outputs sampled by the first of them
+# from an incremental cache in a temporary directory deleted when the batch ends. Those jobs then see identical
+# habitat samples, so their results are not independent; without the flag every job samples afresh.
+#
+# Usage:
+#   python qhf_batch.py                          (all .cfg files in Configs/)
+#   python qhf_batch.py "Configs/mars_*.cfg" europa.cfg --workers 4 --summary nightly.csv
+#   python qhf_batch.py study.cfg --list         (show the jobs a template expands into)
+#   python qhf_batch.py study.cfg --shared-cache (metabolism study on common habitat samples)
+
+import os
+import sys
+import csv
+import glob
+import time
+import shutil
+import argparse
+import tempfile
+import configparser
+import contextlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from modules.module_registry import get_registry
+from modules.preflight import preflight
+from modules.config_templates import expand_config, dedupe_jobs, duplicate_reason, job_label
+from modules.qhf_engine import (REPO_ROOT, CONFIGS_DIR, RESULTS_DIR, read_run_config, load_modules, build_graph,
+                                prepare_sampling, open_incremental_run, run_monte_carlo)
+from modules.level_executor import LevelExecutor, read_execution_options
+from modules.importance import ImportanceSampler, read_importance_options, weighted_summary
+from modules.cost_estimator import read_resource_options
+from modules.memory_budget import start_memory_monitor
+from modules.diagnostics import read_diagnostics_options, convergence_report, convergence_summary
+
+SUMMARY_FIELDS = ["Config", "ConfigID", "Habitat", "Metabolism", "Probes", "Iterations",
+                  "Samples", "MeanSuitability", "SuitabilitySE", "SuitabilityESS", "SuitabilityRHat",
+                  "SuggestedIterations", "InvalidValues", "Seconds", "Status", "Notes"]
+
+
+def expand_config_paths(patterns):
+    # Resolves file names, paths and glob patterns; bare names are looked up in Configs/
+    paths = []
+    for pattern in patterns or [os.path.join(CONFIGS_DIR, "*.cfg")]:
+        candidates = [pattern]
+        if not os.path.dirname(pattern) and not os.path.exists(pattern):
+            candidates.append(os.path.join(CONFIGS_DIR, pattern))
+        for candidate in candidates:
+            matches = sorted(glob.glob(candidate))
+            if matches:
+                paths.extend(matches)
+                break
+        else:
+            print(f"⚠️  No config matches: {pattern}")
+    # Drop duplicates but keep order
+    seen = set()
+    return [p for p in (os.path.abspath(p) for p in paths) if not (p in seen or seen.add(p))]
+
+
+def expand_configs(config_paths):
+    # Jobs of every config (one per template combination), without duplicates
+    jobs = []
+    for path in config_paths:
+        try:
+            jobs.extend(expand_config(path, [CONFIGS_DIR]))
+        except (ValueError, configparser.Error):
+            # Kept as a plain job: it fails in the worker with the proper message
+            jobs.append({"name": os.path.basename(path), "path": path, "overrides": {}})
+    jobs, duplicates = dedupe_jobs(jobs, [CONFIGS_DIR])
+    for dropped, kept in duplicates:
+        print(f"ℹ️  {job_label(dropped)} dropped: same settings as {job_label(kept)}, "
+              f"because {duplicate_reason(dropped, kept)}")
+    # Rows are matched back to their job by position: names are basenames and need not be unique
+    for i, job in enumerate(jobs):
+        job["index"] = i
+    return jobs
+
+
+def group_jobs(jobs):
+    # Groups jobs by HabitatFile so each group shares the loaded habitat chain; jobs of equal run shape are
+    # kept next to each other, so the first one fills the cache the others replay from
+    groups = {}
+    for job in jobs:
+        try:
+            settings = read_run_config(job["path"], job["overrides"])
+            key, shape = settings["HabitatFile"], (settings["NumProbes"], settings["Niterations"])
+        except Exception:
+            # Unreadable configs get their own group and fail with a proper message in the worker
+            key, shape = ("?", job["name"]), None
+        groups.setdefault(key, []).append((shape, job))
+    return {key: [job for _, job in sorted(members, key=lambda m: str(m[0]))] for key, members in groups.items()}
+
+
+def shared_shapes(jobs):
+    # Run shapes used by more than one job of a group; those jobs share cached habitat outputs
+    counts = {}
+    for job in jobs:
+        try:
+            settings = read_run_config(job["path"], job["overrides"])
+        except Exception:
+            continue
+        shape = (settings["NumProbes"], settings["Niterations"])
+        counts[shape] = counts.get(shape, 0) + 1
+    return {shape for shape, n in counts.items() if n > 1}
+
+
+def run_config(config_path, quiet=True, overrides=None, name=None, cache_dir=None):
+    # Runs one config (or one job of a template) headless in the current process and returns a summary row
+    # cache_dir turns the incremental cache on in that directory, so unchanged upstream modules are replayed
+    # between jobs
+    row = {"Config": name or os.path.basename(config_path), "Status": "ok"}
+    start = time.perf_counter()
+    try:
+        settings = read_run_config(config_path, overrides)
+        row.update({
+            "ConfigID": settings["ConfigID"],
+            "Habitat": settings["HabitatFile"],
+            "Metabolism": settings["MetabolismFile"],
+            "Probes": int(settings["NumProbes"]),
+            "Iterations": settings["Niterations"],
+        })
+        problems = preflight(settings)["errors"]
+        if problems:
+            raise ValueError("pre-flight: " + "; ".join(problems))
+        # Settings the batch cannot honor are noted in the row instead of silently changing the results
+        notes = []
+        resource_options = read_resource_options(settings["Resources"])
+        if resource_options["workers"] > 1:
+            notes.append(f"Workers = {resource_options['workers']} ignored (one process per job)")
+        with open(os.devnull, "w") as sink, contextlib.redirect_stdout(sink if quiet else sys.stdout):
+            Modules, _ = load_modules(settings)
+            _, _, _, topsorted = build_graph(Modules, verbose=False)
+            Modules, topsorted = prepare_sampling(Modules, topsorted, settings, verbose=False)
+
+            importance_options = read_importance_options(settings["Importance"], REPO_ROOT)
+            importance = None
+            if importance_options["enabled"]:
+                importance = ImportanceSampler(Modules, topsorted, importance_options)
+                if importance_options["proposal"]:
+                    importance.load(importance_options["proposal"])
+                else:
+                    importance.tune()
+
+            incremental = open_incremental_run(Modules, topsorted, settings, force=cache_dir is not None,
+                                               directory=cache_dir)
+            if incremental is not None and importance is not None:
+                notes.append("incremental cache off (importance sampling)")
+                incremental = None
+            if incremental is not None:
+                Modules, topsorted = incremental.Modules, incremental.order
+
+            execution_options = read_execution_options(settings["Execution"])
+            executor = None
+            if execution_options["mode"] == "levels":
+                if incremental is not None or importance is not None:
+                    notes.append("serial order instead of Mode = levels (%s)"
+                                 % ("incremental cache" if incremental is not None else "importance sampling"))
+                else:
+                    executor = LevelExecutor(Modules, topsorted, threads=execution_options["threads"],
+                                             jit=execution_options["jit"])
+
+            timings = {}
+            memory = start_memory_monitor(resource_options)
+            try:
+                results = run_monte_carlo(Modules, topsorted, settings["NumProbes"], settings["Niterations"],
+                                          verbose=False, profile=timings, executor=executor, importance=importance,
+                                          memory=memory, saved_parameters=settings["SavedParameters"],
+                                          streams=read_diagnostics_options(settings["Diagnostics"])["streams"])
+            finally:
+                memory.stop()
+                if executor is not None:
+                    executor.close()
+            get_registry().record_profiles(Modules, timings)
+            if incremental is not None:
+                incremental.save()
+        suitability = np.asarray(results["Suitability_Distribution"], dtype=float)
+        row["Samples"] = len(suitability)
+        if importance is not None:
+            # Weighted estimate including the tuning samples, as printed by QHF.py
+            tuning_suitability, tuning_weights = importance.tuning_samples()
+            row["MeanSuitability"] = weighted_summary(
+                np.concatenate([suitability, tuning_suitability]),
+                np.concatenate([np.asarray(results["Weights"], dtype=float), tuning_weights]),
+                importance_options["target"])["mean"]
+        else:
+            row["MeanSuitability"] = float(np.mean(suitability)) if len(suitability) else float("nan")
+        row["InvalidValues"] = sum(results["Collector"].invalid_counts.values())
+        convergence = convergence_summary(convergence_report(
+            results, settings["Niterations"], read_diagnostics_options(settings["Diagnostics"])))
+        row.update({
+            "SuitabilitySE": convergence["suitability_se"],
+            "SuitabilityESS": convergence["suitability_ess"],
+            "SuitabilityRHat": convergence["suitability_rhat"],
+            "SuggestedIterations": convergence["suggested_iterations"],
+        })
+        if notes:
+            row["Notes"] = "; ".join(notes)
+    except Exception as e:
+        row["Status"] = f"failed: {e}"
+    row["Seconds"] = time.perf_counter() - start
+    return row
+
+
+def run_config_group(jobs, quiet=True, cache_dir=None):
+    # Worker entry point: module files are cached per process, so the group pays the import once
+    # Jobs of a shared run shape replay each other's habitat outputs from cache_dir (None: no sharing)
+    shared = shared_shapes(jobs) if cache_dir else set()
+    rows = []
+    for job in jobs:
+        try:
+            settings = read_run_config(job["path"], job["overrides"])
+            share = (settings["NumProbes"], settings["Niterations"]) in shared
+        except Exception:
+            share = False
+        row = run_config(job["path"], quiet=quiet, overrides=job["overrides"], name=job["name"],
+                         cache_dir=cache_dir if share else None)
+        row["Job"] = job["index"]
+        rows.append(row)
+    return rows
+
+
+def print_summary(rows):
+    print("\n" + "=" * 118)
+    print(f"{'Config':<28} {'Habitat':<14} {'Metabolism':<16} {'Samples':>9} {'Suit.':>7} {'±SE':>7} "
+          f"{'R-hat':>6} {'Invalid':>8} {'Sec':>8}  Status")
+    print("-" * 118)
+    for r in rows:
+        suit = r.get("MeanSuitability")
+        suit_txt = f"{suit:7.3f}" if isinstance(suit, float) else f"{'-':>7}"
+        se = r.get("SuitabilitySE")
+        se_txt = f"{se:7.3f}" if isinstance(se, float) else f"{'-':>7}"
+        rhat = r.get("SuitabilityRHat")
+        rhat_txt = f"{rhat:6.3f}" if isinstance(rhat, float) else f"{'-':>6}"
+        print(f"{r['Config'][:28]:<28} {str(r.get('Habitat', '-'))[:14]:<14} "
+              f"{str(r.get('Metabolism', '-'))[:16]:<16} {r.get('Samples', '-'):>9} {suit_txt} {se_txt} "
+              f"{rhat_txt} {r.get('InvalidValues', '-'):>8} {r['Seconds']:8.2f}  {r['Status']}")
+    print("=" * 118)
+    for r in rows:
+        if r.get("Notes"):
+            print(f"⚠️  {r['Config']}: {r['Notes']}")
+    n_ok = sum(r["Status"] == "ok" for r in rows)
+    print(f"{n_ok}/{len(rows)} configs completed")
+
+
+def write_summary(rows, path):
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=SUMMARY_FIELDS, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(rows)
+    print(f"📝 Summary written to {path}")
+
+
+def run_batch(patterns=None, workers=None, summary_path=None, quiet=True, share_cache=False, list_only=False):
+    # Expands, groups and schedules the configs over a process pool; returns the summary rows
+    config_paths = expand_config_paths(patterns)
+    if not config_paths:
+        print("❌ No configs to run.")
+        return []
+    jobs = expand_configs(config_paths)
+
+    groups = group_jobs(jobs)
+    if list_only:
+        for key, members in groups.items():
+            print(f"📦 {key if isinstance(key, str) else key[0]}")
+            for job in members:
+                print(f"   {job['name']}")
+        return []
+    workers = max(1, min(workers or os.cpu_count() or 1, len(groups)))
+    print(f"🚀 Running {len(jobs)} jobs from {len(config_paths)} configs in {len(groups)} module groups "
+          f"on {workers} workers")
+
+    rows = []
+    # Shared habitat outputs live only as long as this batch
+    cache_dir = None
+    if share_cache:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        cache_dir = tempfile.mkdtemp(prefix=".batch_cache_", dir=RESULTS_DIR)
+    try:
+        if workers == 1:
+            for members in groups.values():
+                rows.extend(run_config_group(members, quiet=quiet, cache_dir=cache_dir))
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = {pool.submit(run_config_group, members, quiet, cache_dir): members
+                           for members in groups.values()}
+                for future in as_completed(futures):
+                    try:
+                        group_rows = future.result()
+                    except Exception as e:
+                        # A crashed worker takes its whole group down; report each config instead of aborting
+                        group_rows = [{"Config": job["name"], "Job": job["index"], "Seconds": 0.0,
+                                       "Status": f"failed: {e}"} for job in futures[future]]
+                    for r in group_rows:
+                        print(f"  {'✅' if r['Status'] == 'ok' else '❌'} {r['Config']} ({r['Seconds']:.1f}s)")
+                    rows.extend(group_rows)
+    finally:
+        if cache_dir is not None:
+            shutil.rmtree(cache_dir, ignore_errors=True)
+
+    # Report in the order the jobs were requested
+    rows.sort(key=lambda r: r["Job"])
+    print_summary(rows)
+    if summary_path:
+        write_summary(rows, summary_path)
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run several QHF configs with shared module loading.")
+    parser.add_argument("configs", nargs="*", help="config files or glob patterns (default: Configs/*.cfg)")
+    parser.add_argument("--workers", type=int, default=None, help="maximum number of worker processes")
+    parser.add_argument("--summary", default=None, help="write the summary table to this CSV file")
+    parser.add_argument("--verbose", action="store_true", help="show module output while running")
+    parser.add_argument("--list", action="store_true", help="only list the jobs the configs expand into")
+    parser.add_argument("--shared-cache", action="store_true",
+                        help="replay habitat outputs between jobs of the same habitat and run shape "
+                             "(faster, but those jobs share their habitat samples)")
+    args = parser.parse_args(argv)
+
+    rows = run_batch(args.configs, workers=args.workers, summary_path=args.summary, quiet=not args.verbose,
+                     share_cache=args.shared_cache, list_only=args.list)
+    if args.list:
+        return 0
+    return 0 if rows and all(r["Status"] == "ok" for r in rows) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
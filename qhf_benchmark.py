@@ -0,0 +1,65 @@
+# Performance regression check: runs the reference configs in benchmarks/ with a fixed seed and a small budget
+# (sampled for at least --min-seconds), appends the throughput, startup time and peak memory to the benchmark
+# history and compares them with the baseline.
+# Exits with 1 when a metric regresses beyond the threshold (see modules/benchmark.py).
+#
+# Usage:
+#   python qhf_benchmark.py                          (compare with Results/benchmark_baseline.json)
+#   python qhf_benchmark.py --update-baseline        (accept the current numbers as the new baseline)
+#   python qhf_benchmark.py --configs Configs/mars.cfg --threshold 0.1
+
+import os
+import sys
+import argparse
+
+from modules.qhf_engine import REPO_ROOT, RESULTS_DIR
+from modules.benchmark import (HISTORY_FILE, BASELINE_FILE, MIN_SAMPLING_SECONDS, reference_configs, run_benchmark, print_measurement,
+                               append_history, load_baseline, save_baseline, compare, print_comparison)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark QHF on reference configs and check for regressions.")
+    parser.add_argument("--configs", nargs="*", default=None,
+                        help="config files to benchmark instead of the reference set in benchmarks/")
+    parser.add_argument("--probes", type=int, default=4, help="probes per reference run")
+    parser.add_argument("--iterations", type=int, default=500, help="iterations per probe")
+    parser.add_argument("--seed", type=int, default=12345, help="random seed of every run")
+    parser.add_argument("--min-seconds", type=float, default=MIN_SAMPLING_SECONDS,
+                        help="repeat the probes x iterations budget until sampling took this long")
+    parser.add_argument("--repeats", type=int, default=3, help="fresh-process runs per config (median is kept)")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="relative change of a metric counted as a regression (0.2 = 20%%)")
+    parser.add_argument("--history", default=os.path.join(RESULTS_DIR, HISTORY_FILE), help="history file (JSON lines)")
+    parser.add_argument("--baseline", default=os.path.join(RESULTS_DIR, BASELINE_FILE), help="baseline file")
+    parser.add_argument("--update-baseline", action="store_true", help="store this run as the new baseline")
+    # Internal: every measurement runs in a fresh interpreter started with --measure CONFIG
+    parser.add_argument("--measure", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.measure:
+        print_measurement(args.measure, args.probes, args.iterations, args.seed, args.min_seconds)
+        return 0
+
+    if args.configs:
+        configs = {os.path.splitext(os.path.basename(p))[0]: os.path.abspath(p) for p in args.configs}
+    else:
+        configs = reference_configs()
+    record = run_benchmark(os.path.abspath(__file__), configs, probes=args.probes, iterations=args.iterations, seed=args.seed,
+                           repeats=max(1, args.repeats), repo_root=REPO_ROOT, min_seconds=args.min_seconds)
+    if not record["configs"]:
+        print("❌ No reference config to benchmark.")
+        return 1
+    print(f"📝 Benchmark appended to {append_history(record, args.history)}")
+
+    baseline = load_baseline(args.baseline)
+    if baseline is None or args.update_baseline:
+        reason = "updated" if baseline is not None else "created (no baseline yet)"
+        print(f"📌 Baseline {reason}: {save_baseline(record, args.baseline)}")
+        return 0
+
+    regressions = print_comparison(compare(record, baseline, args.threshold), record, baseline, args.threshold)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
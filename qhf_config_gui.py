@@ -1,14 +1,18 @@
 # qhf_config_gui.py
 
 import os
-import sys
-import subprocess
+import queue
+import threading
+import tempfile
 import configparser
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 
-# to discover modules safely
-import importlib.util
+# to run QHF.py as a managed subprocess with progress events
+from modules.run_manager import QHFRun, format_eta
+
+# to query module files/classes from the cached index instead of importing them
+from modules.module_registry import get_registry, MODULE_KINDS
 
 # to ensure relative paths resolve from repo root
 REPO_ROOT = os.path.dirname(os.path.abspath(__file__))
@@ -19,21 +23,21 @@ ANALYSES_DIR = os.path.join(REPO_ROOT, "Analyses")
 QHF_SCRIPT = os.path.join(REPO_ROOT, "QHF.py")
 LAST_CFG_PATH = os.path.join(REPO_ROOT, ".last_saved_cfg.txt")
 
+# to poll the running QHF process without blocking Tk
+RUN_POLL_MS = 200
+RUN_LOG_MAX_LINES = 500
+
+# to deliver background results (module scans, pre-flight) back to the Tk thread
+JOB_POLL_MS = 100
+
+# to list only names that can fill each field (None: any public class/function)
+NAME_ROLES = {"Habitats": "habitat", "Metabolisms": "module", "Analyses": None}
+
 
 # to make sure expected folders exist
 for _d in [CONFIGS_DIR, HABITATS_DIR, METABOLISMS_DIR, ANALYSES_DIR]:
     os.makedirs(_d, exist_ok=True)
 
-# to list python files without __init__.py
-def _list_py_modules(folder):
-    # to list all .py files except __init__.py
-    files = []
-    for f in os.listdir(folder):
-        if f.endswith(".py") and f != "__init__.py":
-            files.append(os.path.splitext(f)[0])
-    files.sort()
-    return files
-
 # to build default template values
 def default_template():
     # to provide a sensible starter config
@@ -61,6 +65,34 @@ def default_template():
     }
     return cfg
 
+# to list the usable names of every module file from the index (no imports)
+def module_catalog(registry, kinds=MODULE_KINDS):
+    return {kind: {f: registry.names(kind, f, NAME_ROLES[kind]) for f in registry.files(kind)} for kind in kinds}
+
+# to bring the index up to date (imports changed files only) and list it; runs on the worker thread
+def scan_modules(registry, kinds=MODULE_KINDS, force=False):
+    changed = registry.scan(kinds, force=force)
+    return changed, module_catalog(registry, kinds)
+
+# to run the pre-flight (it refreshes the config's files) and list the refreshed index; runs on the worker thread
+def check_config(registry, settings):
+    from modules.preflight import preflight
+    report = preflight(settings, registry)
+    return report, module_catalog(registry)
+
+# to build the pre-flight settings from a config object
+def preflight_settings(cfg):
+    return {
+        "HabitatFile": cfg["Habitat"]["HabitatFile"],
+        "HabitatModule": cfg["Habitat"]["HabitatModule"],
+        "MetabolismFile": cfg["Metabolism"]["MetabolismFile"],
+        "MetabolismModule": cfg["Metabolism"]["MetabolismModule"],
+        "VisualizationFile": cfg["Visualization"]["VisualizationFile"],
+        "VisualizationModule": cfg["Visualization"]["VisualizationModule"],
+        "NumProbes": cfg["Sampling"]["NumProbes"],
+        "Niterations": cfg["Sampling"]["Niterations"],
+    }
+
 class QHFConfigGUI(tk.Tk):
     def __init__(self):
         super().__init__()
@@ -70,10 +102,19 @@ class QHFConfigGUI(tk.Tk):
         # to track current file path
         self.current_cfg_path = None
 
-        # to cache dropdown data
-        self.habitat_files = _list_py_modules(HABITATS_DIR)
-        self.metabolism_files = _list_py_modules(METABOLISMS_DIR)
-        self.analysis_files = _list_py_modules(ANALYSES_DIR)
+        # to track the managed QHF run (if any)
+        self.active_run = None
+        self.run_window = None
+
+        # to fill dropdowns from the saved module index right away; the scan runs in the background
+        self.registry = get_registry()
+        self.module_names = module_catalog(self.registry)
+        self.validating = False
+
+        # to run registry work on one worker thread (the registry is never used from two threads)
+        self._jobs = queue.Queue()
+        self._job_results = queue.Queue()
+        threading.Thread(target=self._job_worker, daemon=True).start()
 
         # to create UI
         self._build_menu()
@@ -84,6 +125,65 @@ class QHFConfigGUI(tk.Tk):
         self.config_obj = default_template()
         self.populate_form_from_config(self.config_obj)
 
+        # to pick up module files changed since the index was written
+        self.after(JOB_POLL_MS, self._poll_jobs)
+        self.rescan_modules()
+
+    # to run queued jobs off the Tk thread; Tk widgets are only touched by the callbacks
+    def _job_worker(self):
+        while True:
+            func, args, on_done = self._jobs.get()
+            try:
+                result, error = func(*args), None
+            except Exception as e:
+                result, error = None, e
+            self._job_results.put((on_done, result, error))
+
+    # to queue func(*args); on_done(result, error) is called later on the Tk thread
+    def run_in_background(self, func, on_done, *args):
+        self._jobs.put((func, args, on_done))
+
+    # to hand finished jobs to their callbacks
+    def _poll_jobs(self):
+        while True:
+            try:
+                on_done, result, error = self._job_results.get_nowait()
+            except queue.Empty:
+                break
+            on_done(result, error)
+        self.after(JOB_POLL_MS, self._poll_jobs)
+
+    # to rescan module folders on demand (force: re-import every file, not just changed ones)
+    def rescan_modules(self, kinds=MODULE_KINDS, force=False):
+        self.lbl_status.config(text="Scanning modules…")
+        self.run_in_background(scan_modules, self._on_modules_scanned, self.registry, kinds, force)
+
+    # to refresh dropdowns once a scan is done
+    def _on_modules_scanned(self, result, error):
+        if error is not None:
+            self.lbl_status.config(text=f"Module scan failed: {error}")
+            return
+        changed, catalog = result
+        self.module_names.update(catalog)
+        self._refresh_dropdowns()
+        if not self.validating:
+            counts = ", ".join(f"{len(self.module_names[k])} {k.lower()}" for k in MODULE_KINDS)
+            self.lbl_status.config(text=f"Modules: {counts}" + (f" ({len(changed)} re-imported)" if changed else ""))
+
+    # to set file and class-name choices from the current catalog
+    def _refresh_dropdowns(self):
+        for kind, (file_combo, name_combo, file_var) in self.module_fields.items():
+            names = self.module_names.get(kind, {})
+            file_combo["values"] = sorted(names)
+            name_combo["values"] = names.get(file_var.get().strip(), [])
+
+    # to wire a file dropdown to its class-name dropdown
+    def _link_module_fields(self, kind, file_combo, name_combo, file_var):
+        self.module_fields[kind] = (file_combo, name_combo, file_var)
+        file_var.trace_add("write", lambda *_: self._refresh_dropdowns())
+        # to re-read the folder when a file is picked, in case it was just edited
+        file_combo.bind("<<ComboboxSelected>>", lambda _e: self.rescan_modules((kind,)))
+
     # to build the menu bar
     def _build_menu(self):
         menubar = tk.Menu(self)
@@ -101,6 +201,11 @@ class QHFConfigGUI(tk.Tk):
         runmenu.add_command(label="Run QHF", command=self.run_qhf)
         menubar.add_cascade(label="Run", menu=runmenu)
 
+        modulesmenu = tk.Menu(menubar, tearoff=False)
+        modulesmenu.add_command(label="Rescan module folders", command=self.rescan_modules)
+        modulesmenu.add_command(label="Re-import all module files", command=lambda: self.rescan_modules(force=True))
+        menubar.add_cascade(label="Modules", menu=modulesmenu)
+
         self.config(menu=menubar)
 
     # to build main tabs and fields
@@ -109,6 +214,9 @@ class QHFConfigGUI(tk.Tk):
         container = ttk.Frame(self, padding=10)
         container.pack(fill="both", expand=True)
 
+        # to map each module kind to its (file dropdown, class dropdown, file variable)
+        self.module_fields = {}
+
         # to create tabs
         self.tabs = ttk.Notebook(container)
         self.tabs.pack(fill="both", expand=True)
@@ -132,6 +240,7 @@ class QHFConfigGUI(tk.Tk):
         self._build_metabolism_tab()
         self._build_visualization_tab()
         self._build_sampling_tab()
+        self._refresh_dropdowns()
 
     # to build bottom buttons
     def _build_footer(self):
@@ -150,6 +259,9 @@ class QHFConfigGUI(tk.Tk):
         btn_saveas = ttk.Button(footer, text="Save As…", command=self.save_as_config)
         btn_saveas.pack(side="right")
 
+        btn_rescan = ttk.Button(footer, text="Rescan modules", command=self.rescan_modules)
+        btn_rescan.pack(side="right", padx=5)
+
     # to quickly place labeled entry
     def _add_labeled_entry(self, parent, label, var, row, col=0, width=60, entry_type="entry"):
         ttk.Label(parent, text=label).grid(row=row, column=col, sticky="w", padx=4, pady=4)
@@ -157,6 +269,8 @@ class QHFConfigGUI(tk.Tk):
             e = ttk.Entry(parent, textvariable=var, width=width)
         elif entry_type == "combo":
             e = ttk.Combobox(parent, textvariable=var, width=width, state="readonly")
+        elif entry_type == "editable_combo":
+            e = ttk.Combobox(parent, textvariable=var, width=width)
         else:
             e = ttk.Entry(parent, textvariable=var, width=width)
 
@@ -195,9 +309,10 @@ class QHFConfigGUI(tk.Tk):
 
         # to choose from discovered habitat files
         e_file = self._add_labeled_entry(self.tab_hab, "HabitatFile (.py without .py)", self.var_HabitatFile, row=0, entry_type="combo")
-        e_file["values"] = self.habitat_files
 
-        self._add_labeled_entry(self.tab_hab, "HabitatModule (class name)", self.var_HabitatModule, row=1)
+        # to offer the classes found in the chosen file (typing another name is still allowed)
+        e_name = self._add_labeled_entry(self.tab_hab, "HabitatModule (class name)", self.var_HabitatModule, row=1, entry_type="editable_combo")
+        self._link_module_fields("Habitats", e_file, e_name, self.var_HabitatFile)
         self._add_labeled_entry(self.tab_hab, "HabitatLogo (path)", self.var_HabitatLogo, row=2)
         self._add_labeled_entry(self.tab_hab, "HabitatShortname", self.var_HabitatShortname, row=3)
 
@@ -217,9 +332,8 @@ class QHFConfigGUI(tk.Tk):
         self.var_MetabolismModule = tk.StringVar()
 
         e_file = self._add_labeled_entry(self.tab_met, "MetabolismFile (.py without .py)", self.var_MetabolismFile, row=0, entry_type="combo")
-        e_file["values"] = self.metabolism_files
-
-        self._add_labeled_entry(self.tab_met, "MetabolismModule (class name)", self.var_MetabolismModule, row=1)
+        e_name = self._add_labeled_entry(self.tab_met, "MetabolismModule (class name)", self.var_MetabolismModule, row=1, entry_type="editable_combo")
+        self._link_module_fields("Metabolisms", e_file, e_name, self.var_MetabolismFile)
 
     # to build "Visualization" tab
     def _build_visualization_tab(self):
@@ -228,9 +342,8 @@ class QHFConfigGUI(tk.Tk):
         self.var_VisualizationModule = tk.StringVar()
 
         e_file = self._add_labeled_entry(self.tab_vis, "VisualizationFile (.py without .py)", self.var_VisualizationFile, row=0, entry_type="combo")
-        e_file["values"] = self.analysis_files
-
-        self._add_labeled_entry(self.tab_vis, "VisualizationModule (callable/class)", self.var_VisualizationModule, row=1)
+        e_name = self._add_labeled_entry(self.tab_vis, "VisualizationModule (callable/class)", self.var_VisualizationModule, row=1, entry_type="editable_combo")
+        self._link_module_fields("Analyses", e_file, e_name, self.var_VisualizationFile)
 
     # to build "Sampling" tab
     def _build_sampling_tab(self):
@@ -241,6 +354,13 @@ class QHFConfigGUI(tk.Tk):
         self._add_labeled_entry(self.tab_sam, "NumProbes", self.var_NumProbes, row=0)
         self._add_labeled_entry(self.tab_sam, "Niterations", self.var_Niterations, row=1)
 
+        # to predict run time/memory from a short calibration batch
+        self.btn_estimate = ttk.Button(self.tab_sam, text="Estimate run time", command=self.estimate_run_time)
+        self.btn_estimate.grid(row=2, column=1, sticky="w", padx=4, pady=8)
+        self.lbl_estimate = ttk.Label(self.tab_sam, text="", justify="left")
+        self.lbl_estimate.grid(row=3, column=0, columnspan=3, sticky="w", padx=4)
+        self.estimate_run = None
+
     # to populate GUI from config object
     def populate_form_from_config(self, cfg):
         # to reset all fields first
@@ -295,8 +415,11 @@ class QHFConfigGUI(tk.Tk):
         }
         return cfg
 
-    # to validate core fields before saving/running
-    def validate(self, cfg):
+    # to validate core fields before saving/running; on_valid() is called once the pre-flight passes
+    # (the cheap checks answer at once, the pre-flight runs on the worker thread)
+    def validate(self, cfg, on_valid):
+        if self.validating:
+            return False
         # to ensure required fields exist
         required = [
             ("Configuration", "ConfigID"),
@@ -338,25 +461,33 @@ class QHFConfigGUI(tk.Tk):
             messagebox.showerror("Validation Error", "NumProbes must be a number and Niterations must be an integer.")
             return False
 
-        # to optionally check module/class loadability (best effort)
-        def _can_load(py_path, class_name):
-            try:
-                spec = importlib.util.spec_from_file_location("modtmp", py_path)
-                mod = importlib.util.module_from_spec(spec)
-                spec.loader.exec_module(mod)  # to import it
-                getattr(mod, class_name)      # to ensure class/function exists
-                return True
-            except Exception:
-                return False
-
-        if not _can_load(hab_py, cfg["Habitat"]["HabitatModule"]):
-            messagebox.showwarning("Module Check", "Could not load HabitatModule from file. Make sure class name matches.")
-        if not _can_load(met_py, cfg["Metabolism"]["MetabolismModule"]):
-            messagebox.showwarning("Module Check", "Could not load MetabolismModule from file. Make sure class name matches.")
-        # Visualization can be class or callable; we skip strict check here
-
+        # to run the static pre-flight (module index only: no instantiation, no sampling)
+        self.validating = True
+        self.lbl_status.config(text="Validating…")
+        self.run_in_background(check_config, lambda result, error: self._on_preflight(result, error, on_valid),
+                               self.registry, preflight_settings(cfg))
         return True
 
+    # to report the pre-flight result and continue the save if it may go ahead
+    def _on_preflight(self, result, error, on_valid):
+        self.validating = False
+        self.lbl_status.config(text="Ready")
+        if error is None:
+            report, catalog = result
+            # to show classes discovered while the pre-flight rescanned the folders
+            self.module_names.update(catalog)
+            self._refresh_dropdowns()
+        if error is not None:
+            if not messagebox.askyesno("Pre-flight Check", f"The pre-flight check failed:\n\n{error}\n\nSave anyway?"):
+                return
+        elif report["errors"]:
+            details = "\n".join("• " + e for e in report["errors"])
+            if not messagebox.askyesno("Pre-flight Check", f"This configuration will not run:\n\n{details}\n\nSave anyway?"):
+                return
+        elif report["warnings"]:
+            messagebox.showwarning("Pre-flight Check", "\n".join("• " + w for w in report["warnings"]))
+        on_valid()
+
     # to update window title
     def _update_title(self):
         name = os.path.basename(self.current_cfg_path) if self.current_cfg_path else "(unsaved)"
@@ -394,10 +525,12 @@ class QHFConfigGUI(tk.Tk):
     # to file → Save
     def save_config(self):
         cfg = self.build_config_from_form()
-        if not self.validate(cfg):
-            return
+        self.validate(cfg, lambda: self._write_config(cfg))
+
+    # to write a validated config to the current path
+    def _write_config(self, cfg):
         if not self.current_cfg_path:
-            return self.save_as_config()
+            return self._write_config_as(cfg)
         try:
             with open(self.current_cfg_path, "w") as f:
                 cfg.write(f)
@@ -412,11 +545,13 @@ class QHFConfigGUI(tk.Tk):
             messagebox.showerror("Save Error", str(e))
 
 
-    # to file → Save As
-    def save_as_config(self):
+    # to file → Save As (on_saved runs once the file is written)
+    def save_as_config(self, on_saved=None):
         cfg = self.build_config_from_form()
-        if not self.validate(cfg):
-            return
+        self.validate(cfg, lambda: self._write_config_as(cfg, on_saved))
+
+    # to ask for a path and write a validated config there
+    def _write_config_as(self, cfg, on_saved=None):
         path = filedialog.asksaveasfilename(
             title="Save QHF .cfg As",
             initialdir=CONFIGS_DIR,
@@ -439,29 +574,193 @@ class QHFConfigGUI(tk.Tk):
             self.lbl_status.config(text=f"Saved: {os.path.basename(path)}")
         except Exception as e:
             messagebox.showerror("Save As Error", str(e))
+            return
+        if on_saved is not None:
+            on_saved()
+
 
+    # to run the calibration batch for the current form (saved to a temporary .cfg)
+    def estimate_run_time(self):
+        if self.estimate_run is not None and self.estimate_run.is_running():
+            return
+        cfg = self.build_config_from_form()
+        try:
+            float(cfg["Sampling"]["NumProbes"])
+            int(cfg["Sampling"]["Niterations"])
+        except ValueError:
+            messagebox.showerror("Estimate", "NumProbes must be a number and Niterations must be an integer.")
+            return
+        fd, tmp_path = tempfile.mkstemp(suffix=".cfg", dir=CONFIGS_DIR, prefix=".estimate_")
+        with os.fdopen(fd, "w") as f:
+            cfg.write(f)
+        self.estimate_cfg_path = tmp_path
+        self.estimate_run = QHFRun(tmp_path, extra_args=["--estimate"]).start()
+        self.btn_estimate.config(state="disabled")
+        self.lbl_estimate.config(text="Calibrating…")
+        self.after(RUN_POLL_MS, self._poll_estimate)
+
+    # to show the estimate event once the calibration finishes
+    def _poll_estimate(self):
+        run = self.estimate_run
+        for kind, payload in run.poll():
+            if kind == "event" and payload.get("event") == "estimate":
+                self.lbl_estimate.config(text=self._format_estimate(payload))
+        if run.is_running():
+            self.after(RUN_POLL_MS, self._poll_estimate)
+            return
+        if run.wait() != 0 or (run.last_event or {}).get("event") != "estimate":
+            self.lbl_estimate.config(text="Estimate failed — run the pre-flight check (Save) for details.")
+        self.btn_estimate.config(state="normal")
+        try:
+            os.remove(self.estimate_cfg_path)
+        except OSError:
+            pass
+
+    # to turn an estimate event into label text
+    def _format_estimate(self, est):
+        from modules.preflight import format_seconds
+        lines = [
+            f"{est['total_samples']:,} samples  •  {format_seconds(est['seconds_per_sample'])} per sample",
+            f"Predicted wall time: {format_seconds(est['wall_seconds'])} on {est['workers']} worker(s)",
+            f"Result memory: {est['memory_mb']:.1f} MB",
+        ]
+        if est.get("clipped"):
+            lines.append("⚠ NumProbes will be clipped to 1e8")
+        return "\n".join(lines)
 
     # to run QHF.py with current/selected config
     def run_qhf(self):
         # to ensure we have a saved file path
         if not self.current_cfg_path:
-            if not messagebox.askyesno("Run QHF", "Config is not saved. Save As now?"):
-                return
-            self.save_as_config()
-            if not self.current_cfg_path:
-                return
+            if messagebox.askyesno("Run QHF", "Config is not saved. Save As now?"):
+                # to start the run once validation and the save have finished
+                self.save_as_config(on_saved=self.run_qhf)
+            return
         if not os.path.isfile(QHF_SCRIPT):
             messagebox.showerror("Run Error", f"QHF.py not found at:\n{QHF_SCRIPT}")
             return
 
-        # to call python QHF.py "<config>"
+        # to allow one managed run at a time
+        if self.active_run is not None and self.active_run.is_running():
+            messagebox.showinfo("QHF", "A QHF run is already in progress.")
+            return
+
+        # to start QHF.py "<config>" with progress events (no shell involved)
         try:
-            cmd = [sys.executable, QHF_SCRIPT, self.current_cfg_path]
-            # to show a small terminal-like popup with output would be nice; keep it simple here
-            subprocess.Popen(cmd, cwd=REPO_ROOT)
-            messagebox.showinfo("QHF", "Started QHF in a separate process.")
+            self.active_run = QHFRun(self.current_cfg_path).start()
         except Exception as e:
             messagebox.showerror("Run Error", str(e))
+            return
+        self._open_run_window()
+        self.lbl_status.config(text=f"Running: {os.path.basename(self.current_cfg_path)}")
+        self.after(RUN_POLL_MS, self._poll_run)
+
+    # to build the live progress panel
+    def _open_run_window(self):
+        if self.run_window is not None and self.run_window.winfo_exists():
+            self.run_window.destroy()
+        win = tk.Toplevel(self)
+        win.title(f"QHF Run — {os.path.basename(self.current_cfg_path)}")
+        win.geometry("640x360")
+        win.protocol("WM_DELETE_WINDOW", self._close_run_window)
+        self.run_window = win
+
+        frame = ttk.Frame(win, padding=10)
+        frame.pack(fill="both", expand=True)
+
+        self.run_progress = ttk.Progressbar(frame, mode="indeterminate")
+        self.run_progress.pack(fill="x")
+        self.run_progress.start(50)
+
+        self.lbl_run_stats = ttk.Label(frame, text="Loading modules…")
+        self.lbl_run_stats.pack(fill="x", pady=(6, 6))
+
+        self.txt_run_log = tk.Text(frame, height=12, state="disabled", wrap="none")
+        self.txt_run_log.pack(fill="both", expand=True)
+
+        self.btn_run_cancel = ttk.Button(frame, text="Cancel", command=self.cancel_run)
+        self.btn_run_cancel.pack(side="right", pady=(6, 0))
+
+    # to append child output to the panel log
+    def _append_run_log(self, lines):
+        self.txt_run_log.config(state="normal")
+        self.txt_run_log.insert("end", "\n".join(lines) + "\n")
+        extra = int(self.txt_run_log.index("end-1c").split(".")[0]) - RUN_LOG_MAX_LINES
+        if extra > 0:
+            self.txt_run_log.delete("1.0", f"{extra + 1}.0")
+        self.txt_run_log.see("end")
+        self.txt_run_log.config(state="disabled")
+
+    # to apply one progress event to the panel
+    def _show_run_event(self, event):
+        kind = event.get("event")
+        if kind == "start":
+            self.run_progress.stop()
+            self.run_progress.config(mode="determinate", maximum=max(1, event["probes_total"]), value=0)
+            self.lbl_run_stats.config(text=f"Sampling {event['probes_total']} probes × {event['iterations']} iterations…")
+        elif kind == "estimate":
+            self.lbl_run_stats.config(text=self._format_estimate(event).replace("\n", "   "))
+        elif kind == "refused":
+            self.lbl_run_stats.config(text=f"Refused: {event['reason']}")
+        elif kind == "progress":
+            self.run_progress.config(value=event["probes_done"])
+            self.lbl_run_stats.config(text=(
+                f"{event['probes_done']}/{event['probes_total']} probes   "
+                f"{event['samples_per_sec']:.0f} samples/s   ETA {format_eta(event['eta_sec'])}   "
+                f"Suitability ≈ {event['suitability']:.3f}"
+            ))
+        elif kind == "done":
+            if event.get("partial"):
+                self.lbl_run_stats.config(text=f"Cancelled — partial result saved to {event['result_path']}")
+            else:
+                self.lbl_run_stats.config(text=f"Sampling finished ({event['samples']} samples), plotting…")
+
+    # to drain the run's messages and reschedule while it is alive
+    def _poll_run(self):
+        run = self.active_run
+        if run is None:
+            return
+        window_open = self.run_window is not None and self.run_window.winfo_exists()
+        lines = []
+        for kind, payload in run.poll():
+            if not window_open:
+                continue
+            if kind == "output":
+                lines.append(payload)
+            else:
+                self._show_run_event(payload)
+        if lines:
+            self._append_run_log(lines)
+
+        if run.is_running():
+            self.after(RUN_POLL_MS, self._poll_run)
+            return
+
+        code = run.wait()
+        self.active_run = None
+        self.lbl_status.config(text="Run finished" if code == 0 else f"Run failed (exit code {code})")
+        if window_open:
+            self.run_progress.stop()
+            self.btn_run_cancel.config(text="Close", command=self._close_run_window)
+            if code != 0:
+                self.lbl_run_stats.config(text=f"QHF exited with code {code} — see log above.")
+
+    # to request cancellation; the child flushes a partial result
+    def cancel_run(self):
+        if self.active_run is not None and self.active_run.is_running():
+            self.active_run.cancel()
+            self.lbl_run_stats.config(text="Cancelling — waiting for partial result…")
+            self.btn_run_cancel.config(state="disabled")
+
+    # to close the panel; a running job is cancelled first
+    def _close_run_window(self):
+        if self.active_run is not None and self.active_run.is_running():
+            if not messagebox.askyesno("QHF", "Cancel the running QHF job?"):
+                return
+            self.active_run.cancel()
+        if self.run_window is not None:
+            self.run_window.destroy()
+            self.run_window = None
 
 if __name__ == "__main__":
     app = QHFConfigGUI()
@@ -0,0 +1,98 @@
+# Runs one QHF config across several worker processes or machines.
+# The coordinator hands out probe ranges; workers need the same checkout (Habitats/, Metabolisms/) and pull tasks.
+# Per-probe summaries are written to Results/<ConfigID>_distributed.npz.
+#
+# Usage:
+#   python qhf_distributed.py coordinator Configs/mars.cfg --local-workers 4
+#   python qhf_distributed.py coordinator Configs/mars.cfg --host 0.0.0.0 --port 5757 --task-probes 20
+#   python qhf_distributed.py worker coordinator-host:5757          (on each worker machine)
+
+import os
+import sys
+import time
+import argparse
+import subprocess
+
+from modules.preflight import preflight, print_preflight
+from modules.distributed import DEFAULT_PORT, Coordinator, assemble, save_summary, run_worker
+
+
+def start_local_workers(n, port):
+    return [subprocess.Popen([sys.executable, os.path.abspath(__file__), "worker", f"127.0.0.1:{port}",
+                              "--name", f"local-{i + 1}"])
+            for i in range(n)]
+
+
+def run_coordinator(args):
+    coordinator = Coordinator(args.config, host=args.host, port=args.port, task_probes=args.task_probes,
+                              seed=args.seed, task_timeout=args.task_timeout)
+    settings = coordinator.settings
+    report = preflight(settings)
+    if report["errors"]:
+        print_preflight(report)
+        coordinator.close()
+        return 1
+
+    host, port = coordinator.address
+    print(f"🚀 {settings['ConfigID']}: {int(settings['NumProbes'])} probes x {settings['Niterations']} iterations "
+          f"in {len(coordinator.tasks)} tasks, listening on {host}:{port}")
+    start = time.perf_counter()
+    local = start_local_workers(args.local_workers, port)
+    try:
+        ok = coordinator.wait(timeout=args.timeout)
+    finally:
+        coordinator.close()
+        for proc in local:
+            try:
+                proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+
+    if not ok:
+        print(f"❌ Distributed run failed: {coordinator.failure}")
+        return 1
+    arrays = assemble(coordinator.probe_summaries())
+    path = save_summary(arrays, settings["ConfigID"])
+    n = int(arrays["Suitability_N"].sum())
+    print(f"✅ {n} samples in {time.perf_counter() - start:.1f}s, mean Suitability "
+          f"{arrays['Suitability_Plot'][-1]:.3f}" if n else "✅ No valid Suitability samples")
+    print(f"📝 Per-probe summaries written to {path}")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run one QHF config on several workers.")
+    sub = parser.add_subparsers(dest="role", required=True)
+
+    coord = sub.add_parser("coordinator", help="hand out probe ranges and collect the summaries")
+    coord.add_argument("config", help="path to the .cfg file")
+    coord.add_argument("--host", default="127.0.0.1", help="interface to listen on (0.0.0.0 for other hosts)")
+    coord.add_argument("--port", type=int, default=DEFAULT_PORT, help="port to listen on (0 picks a free one)")
+    coord.add_argument("--task-probes", type=int, default=10, help="probes per task")
+    coord.add_argument("--local-workers", type=int, default=0, help="worker processes to start on this machine")
+    coord.add_argument("--seed", type=int, default=None, help="seed each probe range for reproducible runs")
+    coord.add_argument("--task-timeout", type=float, default=None,
+                       help="reassign a task when its worker sends no result within this many seconds")
+    coord.add_argument("--timeout", type=float, default=None, help="give up after this many seconds")
+
+    work = sub.add_parser("worker", help="pull tasks from a coordinator")
+    work.add_argument("address", help="coordinator host:port")
+    work.add_argument("--name", default=None, help="name shown by the coordinator")
+    work.add_argument("--verbose", action="store_true", help="show module output while running")
+
+    args = parser.parse_args(argv)
+    if args.role == "coordinator":
+        return run_coordinator(args)
+
+    host, _, port = args.address.rpartition(":")
+    try:
+        tasks = run_worker(host or "127.0.0.1", int(port or DEFAULT_PORT), name=args.name, quiet=not args.verbose)
+    except ConnectionError as e:
+        print(f"❌ Worker stopped: {e}")
+        return 1
+    print(f"Worker finished after {tasks} tasks")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
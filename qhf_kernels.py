@@ -0,0 +1,43 @@
+# Checks the array kernels of a config's modules against their per-sample execute().
+# Inputs come from real samples of the config's module chain; exits with 1 if any kernel disagrees.
+#
+# Usage:
+#   python qhf_kernels.py Configs/mars.cfg --samples 5000 --seed 1
+
+import os
+import sys
+import argparse
+import contextlib
+
+from modules.qhf_engine import read_run_config, load_modules, build_graph
+from modules.kernels import numba, has_kernel, check_kernel, print_kernel_checks
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare module kernels with their execute() outputs.")
+    parser.add_argument("config", help="path to the .cfg file")
+    parser.add_argument("--samples", type=int, default=1000, help="chain samples to compare on")
+    parser.add_argument("--seed", type=int, default=0, help="random seed for the chain samples")
+    args = parser.parse_args(argv)
+
+    settings = read_run_config(args.config)
+    with open(os.devnull, "w") as sink, contextlib.redirect_stdout(sink):
+        Modules, _ = load_modules(settings)
+        _, _, _, topsorted = build_graph(Modules, verbose=False)
+
+    kernel_modules = [m for m in topsorted if has_kernel(Modules[m])]
+    if not kernel_modules:
+        print("ℹ️  No module of this config defines a kernel.")
+        return 0
+    if numba is None:
+        print("ℹ️  Numba is not installed; checking the NumPy kernels only.")
+
+    rows = []
+    for m in kernel_modules:
+        rows.extend(check_kernel(Modules, topsorted, m, n=args.samples, seed=args.seed))
+    print_kernel_checks(rows)
+    return 1 if any(r["Result"] == "MISMATCH" for r in rows) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
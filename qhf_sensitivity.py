@@ -0,0 +1,43 @@
+# Sobol sensitivity analysis of Suitability with respect to the prior modules of a config.
+# Reuses the module graph and sampling setup of QHF.py (including surrogates) instead of hand-editing priors.
+#
+# Usage:
+#   python qhf_sensitivity.py Configs/mars.cfg --samples 1024 --workers 4
+
+import os
+import sys
+import csv
+import argparse
+
+from modules.qhf_engine import RESULTS_DIR, read_run_config
+from modules.sensitivity import run_sensitivity, print_sensitivity
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sobol sensitivity indices of Suitability per prior module.")
+    parser.add_argument("config", help="path to the .cfg file")
+    parser.add_argument("--samples", type=int, default=1024,
+                        help="base sample size N (a power of 2); the model runs N x (factors + 2) times")
+    parser.add_argument("--workers", type=int, default=1, help="worker processes for the model evaluations")
+    parser.add_argument("--bootstrap", type=int, default=100, help="bootstrap resamples for the confidence intervals")
+    parser.add_argument("--seed", type=int, default=None, help="random seed for reproducible indices")
+    parser.add_argument("--output", default=None, help="CSV path (default: Results/<shortname>_sensitivity.csv)")
+    args = parser.parse_args(argv)
+
+    rows = run_sensitivity(args.config, n=args.samples, workers=args.workers,
+                           bootstrap=args.bootstrap, seed=args.seed)
+    print_sensitivity(rows)
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, read_run_config(args.config)['HabitatShortName'] + '_sensitivity.csv')
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()))
+        writer.writeheader()
+        writer.writerows(rows)
+    print(f"📝 Sensitivity indices written to {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,126 @@
+# send_bulk against a local SMTP stand-in: retries, authentication abort and outcome order
+
+import base64
+import threading
+import socketserver
+
+import pytest
+
+from modules import email_sender
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    # Just enough SMTP for smtplib: EHLO, AUTH PLAIN, MAIL, RCPT, DATA, RSET, QUIT
+
+    def reply(self, line):
+        self.wfile.write((line + "\r\n").encode())
+
+    def handle(self):
+        server = self.server
+        self.reply("220 localhost stand-in")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                break
+            command = line.decode().strip()
+            verb = command.split(" ", 1)[0].upper()
+            if verb in ("EHLO", "HELO"):
+                self.reply("250-localhost")
+                self.reply("250 AUTH PLAIN")
+            elif verb == "AUTH":
+                with server.lock:
+                    server.logins.append(base64.b64decode(command.split()[-1]).split(b"\0")[1].decode())
+                self.reply("535 5.7.8 Bad credentials" if server.reject_login else "235 2.7.0 Accepted")
+            elif verb == "RCPT":
+                address = command.split(":", 1)[1].strip(" <>")
+                with server.lock:
+                    flaky = server.flaky.pop(address, 0)
+                    if flaky > 1:
+                        server.flaky[address] = flaky - 1
+                if address in server.refused:
+                    self.reply("550 5.1.1 No such user")
+                elif flaky:
+                    self.reply("451 4.3.0 Try again later")
+                else:
+                    self.reply("250 OK")
+            elif verb == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                to = None
+                for data in iter(self.rfile.readline, b""):
+                    if data == b".\r\n":
+                        break
+                    if data.lower().startswith(b"to:"):
+                        to = data[3:].decode().strip()
+                with server.lock:
+                    server.delivered.append(to)
+                self.reply("250 OK queued")
+            elif verb == "QUIT":
+                self.reply("221 Bye")
+                break
+            else:
+                self.reply("250 OK")
+
+
+@pytest.fixture
+def smtp_server():
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), _SMTPHandler)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.logins, server.delivered = [], []
+    server.flaky, server.refused = {}, set()
+    server.reject_login = False
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _send(server, recipients, **options):
+    options = dict(dict(workers=3, rate=0, backoff=0.0), **options)
+    return email_sender.send_bulk(recipients, host="127.0.0.1", port=server.server_address[1], use_ssl=False,
+                                  **options)
+
+
+RECIPIENTS = [(f"user{i}@example.com", f"User {i}") for i in range(8)]
+
+
+def test_outcomes_follow_input_order(smtp_server):
+    outcomes = _send(smtp_server, RECIPIENTS)
+    assert [(o["email"], o["name"]) for o in outcomes] == RECIPIENTS
+    assert all(o["status"] == "sent" and o["attempts"] == 1 for o in outcomes)
+    assert sorted(smtp_server.delivered) == sorted(email for email, _ in RECIPIENTS)
+
+
+def test_transient_refusal_is_retried(smtp_server):
+    smtp_server.flaky["user2@example.com"] = 2
+    outcomes = _send(smtp_server, RECIPIENTS)
+    assert outcomes[2]["status"] == "sent" and outcomes[2]["attempts"] == 3
+    assert all(o["attempts"] == 1 for i, o in enumerate(outcomes) if i != 2)
+    assert len(smtp_server.delivered) == len(RECIPIENTS)
+
+
+def test_retries_are_bounded(smtp_server):
+    smtp_server.flaky["user2@example.com"] = 10
+    outcomes = _send(smtp_server, RECIPIENTS, retries=2)
+    assert outcomes[2]["status"] == "failed" and outcomes[2]["attempts"] == 3
+    assert "451" in outcomes[2]["error"]
+
+
+def test_permanent_refusal_is_not_retried(smtp_server):
+    smtp_server.refused.add("user5@example.com")
+    outcomes = _send(smtp_server, RECIPIENTS)
+    assert outcomes[5]["status"] == "failed" and outcomes[5]["attempts"] == 1
+    assert "550" in outcomes[5]["error"]
+    assert sum(o["status"] == "sent" for o in outcomes) == len(RECIPIENTS) - 1
+
+
+def test_authentication_failure_aborts_the_batch(smtp_server, monkeypatch):
+    monkeypatch.setattr(email_sender, "SENDER_EMAIL", "qhf@example.com")
+    monkeypatch.setattr(email_sender, "APP_PASSWORD", "wrong")
+    smtp_server.reject_login = True
+    outcomes = _send(smtp_server, RECIPIENTS, workers=1)
+    assert smtp_server.logins == ["qhf@example.com"]
+    assert smtp_server.delivered == []
+    assert "SMTPAuthenticationError" in outcomes[0]["error"] and outcomes[0]["attempts"] == 1
+    assert all(o["status"] == "failed" and o["error"].startswith("not attempted") for o in outcomes[1:])
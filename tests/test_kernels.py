@@ -0,0 +1,64 @@
+# Array kernels must reproduce their module's per-sample execute()
+
+import numpy as np
+
+import keyparams
+from mcmodules import Module
+from Synthetic import SyntheticHabitat
+from modules.qhf_engine import build_graph
+from modules.kernels import Kernel, KernelModule, check_kernel, run_kernel
+
+
+class WindowMetabolism(Module):
+    def __init__(self, centre=290.0):
+        super().__init__()
+        self.name = 'Window'
+        self.input_parameters = ['Temperature', 'Pressure']
+        self.output_parameters = ['Suitability']
+        self.centre = centre
+    def execute(self):
+        T = keyparams.Temperature
+        keyparams.Suitability = float(np.exp(-((T - 290.0) / 30.0) ** 2)) if keyparams.Pressure > 0.1 else 0.0
+    def kernel(self, Temperature, Pressure):
+        return np.where(Pressure > 0.1, np.exp(-((Temperature - self.centre) / 30.0) ** 2), 0.0)
+
+
+def _chain(metabolism):
+    Modules = SyntheticHabitat() + [metabolism]
+    _, _, _, topsorted = build_graph(Modules, verbose=False)
+    return Modules, topsorted
+
+
+def test_kernel_matches_execute():
+    Modules, topsorted = _chain(WindowMetabolism())
+    rows = check_kernel(Modules, topsorted, len(Modules) - 1, n=500, seed=1)
+    assert rows
+    assert all(r['Result'] in ('identical', 'close') for r in rows)
+
+
+def test_diverging_kernel_is_reported():
+    Modules, topsorted = _chain(WindowMetabolism(centre=250.0))
+    rows = check_kernel(Modules, topsorted, len(Modules) - 1, n=500, seed=1)
+    assert all(r['Result'] == 'MISMATCH' and r['MaxAbsDiff'] > 0 for r in rows)
+
+
+def test_kernel_module_batch_equals_execute_per_sample():
+    metabolism = WindowMetabolism()
+    inputs = {'Temperature': np.linspace(200.0, 380.0, 50), 'Pressure': np.tile([0.05, 1.0], 25)}
+    batch = KernelModule(metabolism, jit=False).execute_batch(inputs, 50)['Suitability']
+    expected = []
+    for T, P in zip(inputs['Temperature'], inputs['Pressure']):
+        keyparams.Temperature, keyparams.Pressure = T, P
+        metabolism.execute()
+        expected.append(keyparams.Suitability)
+    np.testing.assert_allclose(batch, expected, rtol=1e-12, atol=0.0)
+
+
+def test_run_kernel_broadcasts_scalar_outputs():
+    module = Module()
+    module.input_parameters = ['Pressure']
+    module.output_parameters = ['Depth', 'Suitability']
+    outputs = run_kernel(Kernel(lambda Pressure: (Pressure * 2.0, 1.0), jit=False), module,
+                         {'Pressure': np.arange(4.0)}, 4)
+    np.testing.assert_array_equal(outputs['Depth'], [0.0, 2.0, 4.0, 6.0])
+    np.testing.assert_array_equal(outputs['Suitability'], np.ones(4))
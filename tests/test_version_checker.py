@@ -0,0 +1,95 @@
+# UpdateCheck against a local http.server: TTL cache and offline mode
+
+import json
+import threading
+import http.server
+
+import pytest
+
+from modules import version_checker
+
+
+class _VersionHandler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.server.requests += 1
+        if self.server.status != 200:
+            self.send_error(self.server.status)
+            return
+        body = json.dumps({"latest": self.server.latest}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def version_server():
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _VersionHandler)
+    server.requests, server.latest, server.status = 0, "9.9.9", 200
+    server.url = "http://127.0.0.1:%d/latest_version.json" % server.server_address[1]
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(autouse=True)
+def cache_file(tmp_path, monkeypatch):
+    path = tmp_path / "version_cache.json"
+    monkeypatch.setattr(version_checker, "CACHE_FILE", str(path))
+    monkeypatch.delenv("QHF_OFFLINE", raising=False)
+    return path
+
+
+def _check(url, **options):
+    check = version_checker.UpdateCheck(url, **options).start()
+    assert check.done.wait(10)
+    return check
+
+
+def test_answer_is_cached_within_ttl(version_server, cache_file, capsys):
+    first = _check(version_server.url)
+    assert first.report() and "9.9.9" in capsys.readouterr().out
+    assert json.loads(cache_file.read_text())["latest"] == "9.9.9"
+    version_server.latest = "10.0.0"
+    assert "9.9.9" in _check(version_server.url).message
+    assert version_server.requests == 1
+
+
+def test_expired_or_foreign_cache_is_refreshed(version_server):
+    _check(version_server.url)
+    version_server.latest = "10.0.0"
+    assert "10.0.0" in _check(version_server.url, max_age=-1).message
+    assert version_server.requests == 2
+    # An answer cached for another URL is not reused
+    version_checker.save_cached_version("1.0.0", url="http://example.invalid/latest_version.json")
+    assert "10.0.0" in _check(version_server.url).message
+    assert version_server.requests == 3
+
+
+def test_failed_check_is_reported_and_not_cached(version_server, cache_file):
+    version_server.status = 500
+    check = _check(version_server.url)
+    assert check.message.startswith("[Warning] Update check failed")
+    assert not cache_file.exists()
+
+
+def test_offline_mode_skips_the_check(version_server, monkeypatch):
+    assert version_checker.start_update_check(offline=True) is None
+    monkeypatch.setenv("QHF_OFFLINE", "1")
+    assert version_checker.start_update_check() is None
+    assert version_server.requests == 0
+
+
+def test_report_does_not_block(monkeypatch):
+    release = threading.Event()
+    monkeypatch.setattr(version_checker, "get_latest_version", lambda *args: release.wait(10) and "9.9.9")
+    check = version_checker.UpdateCheck().start()
+    assert check.report() is False
+    release.set()
+    assert check.report(wait=10) is True